@@ -241,6 +241,10 @@ def after_all(context):
     for scenario, device in context.scenario_to_device_map.items():
         logging.info(f"{scenario}: {device}")
 
+    from shared.remote_write_client import log_connection_stats
+
+    log_connection_stats()
+
 
 def get_gcm_remote_write_config():
     gcm_stack_config = get(get_endpoints().TENANT_GCM_STACK_CONFIG_URL)
@@ -6,13 +6,14 @@ from features.model import Device
 from datetime import timedelta, datetime, timezone
 
 from features.steps.metrics import instant_remote_write
+from shared.tick_scheduler import run_ticks
 from features.steps.time_series_generator import (
-    generate_timeseries,
+    generate_timeseries_arrays,
     TimeConfig,
     SeriesConfig,
     TransitionConfig,
-    generate_spikes,
 )
+from features.steps.anomaly_injection import inject_spikes
 from features.steps.utils import is_data_present, get_common_labels
 
 
@@ -46,7 +47,7 @@ def step_impl(context, duration):
         context, timedelta(days=14)
     )
     now = datetime.now(timezone.utc)
-    live_data = generate_timeseries(
+    _, live_values = generate_timeseries_arrays(
         time_config=TimeConfig(
             series_config=SeriesConfig(
                 start_time=now,
@@ -61,14 +62,15 @@ def step_impl(context, duration):
         ),
     )
 
-    live_data["y"] = generate_spikes(
-        spike_pattern=[0, 1, 1, 0, 0], spike_multiplier=5, ts_values=live_data["y"]
-    )
-
-    live_data_list = live_data["y"].tolist()
+    live_data_list = inject_spikes(
+        live_values, pattern=[0, 1, 1, 0, 0], multiplier=5
+    ).tolist()
 
-    for i in range(int(duration)):
-        instant_remote_write("conn_stats", labels, live_data_list[i])
-        time.sleep(60)
+    context.live_ticks = run_ticks(
+        int(duration),
+        lambda i, scheduled: instant_remote_write(
+            "conn_stats", labels, live_data_list[i], scheduled
+        ),
+    )
 
     pass
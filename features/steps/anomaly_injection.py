@@ -0,0 +1,143 @@
+"""Vectorized anomaly injection for generated time series.
+
+Every injector takes a ``values`` array of shape ``(T,)`` or ``(N, T)`` and
+returns a new float64 array of the same shape, so injectors compose by
+chaining. Scalar parameters apply to every series; ``(N,)`` arrays give each
+series its own setting. Positions, durations and periods are counted in
+samples along the last axis.
+
+Random injectors draw from ``rng`` when given, otherwise from the global
+``np.random`` state, like the rest of time_series_generator.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def _as_values(values) -> np.ndarray:
+    return np.array(values, dtype=np.float64)
+
+
+def _per_series(param) -> np.ndarray:
+    """Reshape an (N,) parameter to (N, 1) so it broadcasts against (N, T)."""
+    param = np.asarray(param)
+    return param[..., None] if param.ndim else param
+
+
+def _random_sample(shape, rng: Optional[np.random.Generator]) -> np.ndarray:
+    if rng is None:
+        return np.random.random_sample(shape)
+    return rng.random(shape)
+
+
+def cyclic_mask(pattern: Sequence, length: int) -> np.ndarray:
+    """Repeat ``pattern`` (truthy = active) cyclically to ``length`` samples."""
+    return np.resize(np.asarray(pattern, dtype=bool), length)
+
+
+def window_mask(length: int, start, duration) -> np.ndarray:
+    """Boolean mask that is True for samples in ``[start, start + duration)``."""
+    index = np.arange(length)
+    start = _per_series(start)
+    return (index >= start) & (index < start + _per_series(duration))
+
+
+def inject_spikes(values, pattern: Sequence, multiplier) -> np.ndarray:
+    """Multiply the samples selected by the cyclic ``pattern`` by ``multiplier``."""
+    values = _as_values(values)
+    mask = cyclic_mask(pattern, values.shape[-1])
+    return np.where(mask, values * _per_series(multiplier), values)
+
+
+def inject_level_shift(values, start, shift) -> np.ndarray:
+    """Add ``shift`` to every sample from index ``start`` onwards."""
+    values = _as_values(values)
+    index = np.arange(values.shape[-1])
+    return values + np.where(index >= _per_series(start), _per_series(shift), 0.0)
+
+
+def inject_ramp(values, start, duration, delta, hold: bool = True) -> np.ndarray:
+    """Add an offset that grows linearly from 0 to ``delta`` over ``duration`` samples.
+
+    With ``hold`` the offset stays at ``delta`` after the ramp, otherwise it
+    drops back to 0.
+    """
+    values = _as_values(values)
+    index = np.arange(values.shape[-1])
+    start = _per_series(start)
+    duration = _per_series(duration)
+    progress = np.clip((index - start + 1) / np.maximum(duration, 1), 0.0, 1.0)
+    if not hold:
+        progress = np.where(index >= start + duration, 0.0, progress)
+    return values + progress * _per_series(delta)
+
+
+def inject_square_wave(
+    values, period, duty_cycle: float, amplitude, start=0
+) -> np.ndarray:
+    """Add ``amplitude`` during the first ``duty_cycle`` fraction of every period.
+
+    Bursts repeat every ``period`` samples starting at ``start``.
+    """
+    values = _as_values(values)
+    index = np.arange(values.shape[-1])
+    start = _per_series(start)
+    period = _per_series(period)
+    phase = np.mod(index - start, period)
+    active = (index >= start) & (phase < _per_series(duty_cycle) * period)
+    return values + np.where(active, _per_series(amplitude), 0.0)
+
+
+def inject_dropouts(
+    values,
+    probability: float,
+    fill_value: float = np.nan,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Replace each sample with ``fill_value`` with the given probability."""
+    values = _as_values(values)
+    dropped = _random_sample(values.shape, rng) < _per_series(probability)
+    values[dropped] = fill_value
+    return values
+
+
+def random_burst_mask(
+    shape,
+    rate: float,
+    mean_duration: float,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Mask of bursts that start with probability ``rate`` at every sample.
+
+    Burst lengths are geometric with mean ``mean_duration`` samples; overlapping
+    bursts merge.
+    """
+    shape = tuple(np.atleast_1d(shape))
+    length = shape[-1]
+    starts = np.flatnonzero(_random_sample(shape, rng) < rate)
+    if rng is None:
+        durations = np.random.geometric(1.0 / mean_duration, starts.size)
+    else:
+        durations = rng.geometric(1.0 / mean_duration, starts.size)
+
+    # +1 at each burst start and -1 just past its end (clipped to the row),
+    # a running sum over each row is then positive inside a burst
+    rows, columns = np.divmod(starts, length)
+    edges = np.zeros((int(np.prod(shape[:-1])), length + 1), dtype=np.int64)
+    np.add.at(edges, (rows, columns), 1)
+    np.add.at(edges, (rows, np.minimum(columns + durations, length)), -1)
+    return (np.cumsum(edges[:, :length], axis=1) > 0).reshape(shape)
+
+
+def inject_random_bursts(
+    values,
+    rate: float,
+    mean_duration: float,
+    amplitude,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Add ``amplitude`` during randomly placed bursts, see random_burst_mask."""
+    values = _as_values(values)
+    mask = random_burst_mask(values.shape, rate, mean_duration, rng=rng)
+    return values + np.where(mask, _per_series(amplitude), 0.0)
@@ -2,18 +2,15 @@ import json
 import os
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import TYPE_CHECKING
 
 import requests
-from opentelemetry.exporter.prometheus_remote_write import (
-    PrometheusRemoteWriteMetricsExporter,
-)
-from opentelemetry.sdk.metrics.export import MetricsData, MetricExportResult
 from features.steps.env import get_endpoints
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
-endpoints = get_endpoints()
+if TYPE_CHECKING:
+    from opentelemetry.sdk.metrics.export import MetricsData
 
 
 def _create_session():
@@ -36,7 +33,7 @@ def _create_session():
 
 
 def get_insights(query_params=None, fields=None):
-    url = endpoints.INSIGHTS_URL
+    url = get_endpoints().INSIGHTS_URL
 
     # Build query parameters
     params = []
@@ -60,13 +57,13 @@ def get_insights(query_params=None, fields=None):
 
 def delete_insight_by_uid(uid):
     """Delete a specific insight by its UID"""
-    url = f"{endpoints.INSIGHTS_URL}/{uid}"
+    url = f"{get_endpoints().INSIGHTS_URL}/{uid}"
     logging.info(f"Deleting insight with UID: {uid}")
     delete(url)
 
 
 def delete_insights(limit=200, offset=0):
-    url = endpoints.INSIGHTS_URL
+    url = get_endpoints().INSIGHTS_URL
     params = [f"limit={limit}", f"offset={offset}"]
     url += "?" + "&".join(params)
     delete(url)
@@ -94,33 +91,15 @@ def delete_all_insights():
     logging.info(f"Successfully deleted all {total_count} insights.")
 
 
-class _DebugRemoteWriteExporter(PrometheusRemoteWriteMetricsExporter):
-    """Subclass that logs the response body on failure for debugging."""
+def remote_write(metrics_data: "MetricsData"):
+    # The OpenTelemetry SDK is only needed once something is exported
+    from opentelemetry.sdk.metrics.export import MetricExportResult
+    from shared.otel_remote_write import get_exporter
 
-    def _send_message(self, message: bytes, headers: Dict) -> MetricExportResult:
-        try:
-            response = requests.post(
-                self.endpoint,
-                data=message,
-                headers=headers,
-                timeout=self.timeout,
-            )
-            if not response.ok:
-                logging.error(
-                    f"Remote write failed: status={response.status_code}, "
-                    f"body={response.text[:1000]}"
-                )
-                response.raise_for_status()
-        except requests.exceptions.RequestException as err:
-            logging.error(f"Export POST request failed: {err}")
-            return MetricExportResult.FAILURE
-        return MetricExportResult.SUCCESS
-
-
-def remote_write(metrics_data: MetricsData):
-    exporter = _DebugRemoteWriteExporter(
-        endpoint=get_endpoints().DATA_INGEST_URL,
-        headers={"Authorization": "Bearer " + os.getenv("CDO_TOKEN")},
+    # One exporter per endpoint, so every tick reuses its open connections
+    exporter = get_exporter(
+        get_endpoints().DATA_INGEST_URL,
+        {"Authorization": "Bearer " + os.getenv("CDO_TOKEN")},
     )
 
     result = exporter.export(metrics_data)
@@ -133,6 +112,16 @@ def remote_write(metrics_data: MetricsData):
         )
 
 
+def remote_write_sender():
+    """Posts WriteRequests encoded by shared.remote_write to the ingest endpoint."""
+    from shared.remote_write_client import get_client
+
+    return get_client(
+        get_endpoints().DATA_INGEST_URL,
+        {"Authorization": "Bearer " + os.getenv("CDO_TOKEN")},
+    )
+
+
 def verify_insight_type_and_state(context, insight_type, state):
     # Use field projections to get only the fields we need for initial filtering (including uid for later query)
     insights = get_insights(fields="insightType,impactedResources,insightState,uid")
@@ -186,16 +175,16 @@ def verify_insight_type_and_state(context, insight_type, state):
 
 
 def post_onboard_action():
-    return post(endpoints.TENANT_ONBOARD_V2_URL, expected_return_code=202)
+    return post(get_endpoints().TENANT_ONBOARD_V2_URL, expected_return_code=202)
 
 
 def post_offboard_action():
     payload = {"cleanupType": "SHALLOW"}
-    return post(endpoints.TENANT_OFFBOARD_V2_URL, json.dumps(payload), 202)
+    return post(get_endpoints().TENANT_OFFBOARD_V2_URL, json.dumps(payload), 202)
 
 
 def get_onboard_status():
-    return get(endpoints.TENANT_STATUS_V2_URL, print_body=True)
+    return get(get_endpoints().TENANT_STATUS_V2_URL, print_body=True)
 
 
 def update_device_data(device_uid, device_record_uid):
@@ -205,7 +194,9 @@ def update_device_data(device_uid, device_record_uid):
         "device_record_uid": device_record_uid,
         "max_vpn_sessions": 250,
     }
-    return post(endpoints.CAPACITY_ANALYTICS_DEVICE_DATA_URL, json.dumps(payload), 201)
+    return post(
+        get_endpoints().CAPACITY_ANALYTICS_DEVICE_DATA_URL, json.dumps(payload), 201
+    )
 
 
 def get(endpoint, print_body=True):
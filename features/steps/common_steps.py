@@ -1,5 +1,6 @@
 import json
 import os
+import shutil
 import subprocess
 import time
 from typing import List
@@ -7,7 +8,6 @@ import logging
 
 from behave import *
 from hamcrest import assert_that
-from jinja2 import Template
 
 from features.steps.utils import (
     check_if_data_present,
@@ -15,7 +15,21 @@ from features.steps.utils import (
 )
 from model import ScenarioEnum
 from features.steps.env import Path, get_endpoints
-from features.steps.metrics import batch_remote_write
+from shared.openmetrics import (
+    OpenMetricsFamily,
+    OpenMetricsSeries,
+    write_openmetrics_file,
+)
+from shared.block_uploader import make_backend, upload_blocks
+from shared.tsdb_blocks import BlockSeries, write_blocks
+from shared.openmetrics_validator import (
+    expected_sample_counts,
+    validate_families,
+    validate_openmetrics_file,
+)
+from shared.promtool_blocks import DEFAULT_PROMTOOL_WORKERS, create_blocks_streamed
+from shared.ingestion_planner import log_outcome, log_plan, plan_ingestion
+from features.steps.metrics import batch_remote_write_all
 from features.steps.cdo_apis import (
     delete_all_insights,
     delete_insight_by_uid,
@@ -24,20 +38,21 @@ from features.steps.cdo_apis import (
     get_insights,
 )
 from datetime import timedelta, datetime, timezone
-from features.steps.metrics import instant_remote_write
+from features.steps.metrics import instant_remote_write_all
+from shared.tick_scheduler import run_ticks
 from features.steps.utils import (
-    generate_synthesized_ts_obj,
+    generate_synthesized_ts_objs,
     split_data_for_batch_and_live_ingestion,
     GeneratedData,
     get_label_map,
+    intern_labels,
     write_timeseries_yaml,
 )
 from time_series_generator import (
-    generate_timeseries,
+    generate_timeseries_parallel,
     NoiseConfig,
-    TimeConfig,
     SeasonalityConfig,
-    SeriesConfig,
+    SeriesRowConfig,
     TransitionConfig,
 )
 
@@ -133,78 +148,61 @@ def step_impl(context, duration, unit):
     "push timeseries for {duration} minute(s) of which send last {live_duration} minute(s) of timeseries in live mode"
 )
 def step_impl(context, duration, live_duration):
-    synthesized_ts_list = []
     duration = int(duration)
     live_duration = int(live_duration)
+    specs = []
     for row in context.table:
-        start_value = float(row["start_value"])
-        end_value = float(row.get("end_value", 0))
-        start_spike_minute = int(row["start_spike_minute"])
-        spike_duration_minutes = int(row["spike_duration_minutes"])
-        label_string = row["label_values"]
-        metric_name = row["metric_name"]
-        metric_type = (
-            row["metric_type"] if "metric_type" in context.table.headings else "gauge"
-        )
-        noise = (
-            row["noise"].lower() == "true"
-            if "noise" in context.table.headings
-            else None
-        )
-        synthesized_ts_obj = generate_synthesized_ts_obj(
-            context=context,
-            metric_name=metric_name,
-            label_string=label_string,
-            start_value=start_value,
-            end_value=end_value,
-            start_spike_minute=start_spike_minute,
-            spike_duration_minutes=spike_duration_minutes,
-            time_offset=timedelta(minutes=live_duration),
-            duration=duration,
-            metric_type=metric_type,
-            noise=noise,
+        specs.append(
+            {
+                "metric_name": row["metric_name"],
+                "label_string": row["label_values"],
+                "start_value": float(row["start_value"]),
+                "end_value": float(row.get("end_value", 0)),
+                "start_spike_minute": int(row["start_spike_minute"]),
+                "spike_duration_minutes": int(row["spike_duration_minutes"]),
+                "metric_type": (
+                    row["metric_type"]
+                    if "metric_type" in context.table.headings
+                    else "gauge"
+                ),
+                "noise": (
+                    row["noise"].lower() == "true"
+                    if "noise" in context.table.headings
+                    else None
+                ),
+            }
         )
-        synthesized_ts_list.append(synthesized_ts_obj)
+    synthesized_ts_list = generate_synthesized_ts_objs(
+        context=context,
+        specs=specs,
+        duration=duration,
+        time_offset=timedelta(minutes=live_duration),
+    )
 
     [
         synthesized_ts_list_for_batch_fill,
         synthesized_ts_list_for_live_fill,
     ] = split_data_for_batch_and_live_ingestion(synthesized_ts_list, live_duration)
     # batch data fill
-    for synthesized_data in synthesized_ts_list_for_batch_fill:
-        batch_remote_write(synthesized_data, timedelta(minutes=1))
+    batch_remote_write_all(synthesized_ts_list_for_batch_fill)
 
     # Live data generation
-    live_ingest_datapoints_count = len(synthesized_ts_list_for_live_fill[0].values)
+    live_ingest_datapoints_count = len(synthesized_ts_list_for_live_fill[0])
     logging.info(
         f"Pushing {live_ingest_datapoints_count} datapoints through live ingestion "
     )
-    for i in range(live_ingest_datapoints_count):
-        data_for_current_instant = []
-        for value_dict in synthesized_ts_list_for_live_fill:
-            data_for_current_instant.append(
-                {
-                    "metric_name": value_dict.metric_name,
-                    "value": value_dict.values.iloc[i]["y"],
-                    "labels": value_dict.labels,
-                }
-            )
-
-        for data in data_for_current_instant:
-            instant_remote_write(data["metric_name"], data["labels"], data["value"])
-        time.sleep(60)
 
+    # Every series due in a tick goes out in one request, on drift-free deadlines
+    def tick(i, scheduled):
+        instant_remote_write_all(
+            [
+                (value_dict.metric_name, value_dict.labels, value_dict.values[i])
+                for value_dict in synthesized_ts_list_for_live_fill
+            ],
+            timestamp=scheduled,
+        )
 
-t = Template(
-    """{%- for backfill_data in backfill_data_list %}
-# HELP {{backfill_data.metric_name}} {{backfill_data.description}}
-# TYPE {{backfill_data.metric_name}} gauge
-{% for series in backfill_data.series %}
-{{backfill_data.metric_name}}{{ "{" }}{{  series.labels }}{{ "}" }} {{ series.value[index] }} {{ series.timestamp[index] }}
-{%- endfor -%}
-{% endfor %}
-"""
-)
+    context.live_ticks = run_ticks(live_ingest_datapoints_count, tick)
 
 
 module_name_to_subscriber = {
@@ -274,7 +272,7 @@ def step_impl(context, scenario, duration):
 # TODO: Check if this step is required
 @step("start backfill")
 def step_impl(context):
-    backfill_generated_data(context, context.generated_data_list)
+    ingest_generated_data(context, context.generated_data_list)
     assert check_if_backfilled_data_present(context.generated_data_list)
 
 
@@ -283,7 +281,7 @@ def step_impl(context, duration):
     duration_delta = timedelta(hours=int(duration))
     generated_data_list = generate_data_for_input(context, duration_delta)
     backfill_start = time.time()
-    backfill_generated_data(context, generated_data_list)
+    ingest_generated_data(context, generated_data_list)
     backfill_elapsed = time.time() - backfill_start
     logging.info(f"Backfill completed in {backfill_elapsed / 60:.1f} minutes")
     assert check_if_backfilled_data_present(generated_data_list)
@@ -293,8 +291,8 @@ def step_impl(context, duration):
 
 def check_if_backfilled_data_present(generated_data_list: List[GeneratedData]):
     for generated_data in generated_data_list:
-        start = generated_data.values["ds"].iloc[0]
-        end = generated_data.values["ds"].iloc[-1]
+        start = generated_data.timestamps[0]
+        end = generated_data.timestamps[-1]
         duration_hours = (end - start) / 3600
 
         if not check_if_data_present(
@@ -306,29 +304,148 @@ def check_if_backfilled_data_present(generated_data_list: List[GeneratedData]):
     return True
 
 
+def ingest_generated_data(context, generated_data_list: List[GeneratedData]):
+    """Ingest through remote write, block backfill or both, whichever is cheaper.
+
+    INGESTION_METHOD forces "remote-write" or "blocks" for every series, and
+    INGESTION_OOO_WINDOW_MINUTES is the tenant's out-of-order window.
+    """
+    plan = plan_ingestion(
+        [generated_data.timestamps for generated_data in generated_data_list],
+        now=time.time(),
+        out_of_order_window=timedelta(
+            minutes=float(os.getenv("INGESTION_OOO_WINDOW_MINUTES", "0"))
+        ),
+        method=os.getenv("INGESTION_METHOD") or None,
+    )
+    log_plan(plan)
+
+    # Remote write first: the recent samples must arrive inside the window
+    remote_write_start = time.perf_counter()
+    batch_remote_write_all(
+        [
+            generated_data[series_plan.split :]
+            for generated_data, series_plan in zip(generated_data_list, plan.series)
+            if series_plan.split < series_plan.samples
+        ],
+        max_samples=plan.batch_size,
+    )
+    remote_write_seconds = time.perf_counter() - remote_write_start
+
+    block_start = time.perf_counter()
+    block_data_list = [
+        generated_data[: series_plan.split]
+        for generated_data, series_plan in zip(generated_data_list, plan.series)
+        if series_plan.split
+    ]
+    if block_data_list:
+        backfill_generated_data(context, block_data_list)
+    block_seconds = time.perf_counter() - block_start
+
+    log_outcome(plan, remote_write_seconds, block_seconds)
+
+
 def backfill_generated_data(context, generated_data_list: List[GeneratedData]):
-    historical_data_file = "{}_historical_data.txt".format(context.scenario)
+    # "promtool" goes through an OpenMetrics text file and promtool tsdb
+    # create-blocks-from, "promtool-stream" feeds promtool time-sharded files
+    # while writing them, and "native" (opt-in until its blocks have been
+    # checked against promtool or Mimir) writes TSDB blocks directly
+    block_writer = os.getenv("BACKFILL_BLOCK_WRITER", "promtool")
+    if block_writer == "promtool":
+        backfill_generated_data_with_promtool(context, generated_data_list)
+        return
+
+    # Fail here rather than after block creation and the upload
+    families = openmetrics_families(generated_data_list)
+    validate_families(families)
+
     data_block_directory = "/{}_data/".format(context.scenario)
+    block_dir = Path.PYTHON_UTILS_ROOT + data_block_directory
+    # This path does not resume uploads: the data is generated relative to
+    # now and every run writes blocks with new ULIDs, so the blocks and the
+    # upload-progress.txt of an earlier run are of no use
+    shutil.rmtree(block_dir, ignore_errors=True)
+    if block_writer == "promtool-stream":
+        create_blocks_streamed(
+            os.path.join(Path.PYTHON_UTILS_ROOT, "promtool"),
+            families,
+            block_dir,
+            work_dir=Path.PYTHON_UTILS_ROOT,
+            workers=int(
+                os.getenv("BACKFILL_PROMTOOL_WORKERS", DEFAULT_PROMTOOL_WORKERS)
+            ),
+        )
+    else:
+        write_blocks(
+            block_dir,
+            [
+                BlockSeries(
+                    labels={
+                        "__name__": generated_data.metric_name,
+                        **generated_data.labels,
+                    },
+                    timestamps=generated_data.timestamps * 1000,
+                    values=generated_data.values,
+                )
+                for generated_data in generated_data_list
+            ],
+        )
 
+    remote_write_config = context.remote_write_config
+    summary = upload_blocks(
+        block_dir,
+        make_backend(
+            os.getenv("BLOCK_UPLOAD_BACKEND", "mimirtool"),
+            remote_write_config["url"].removesuffix("/api/prom/push"),
+            remote_write_config["username"],
+            remote_write_config["password"],
+            os.path.join(Path.PYTHON_UTILS_ROOT, "mimirtool"),
+        ),
+    )
+    if not summary.ok:
+        # Fail now instead of in the hour-long check for the backfilled data
+        raise Exception(f"{len(summary.failed)} blocks in {block_dir} failed to upload")
+    shutil.rmtree(block_dir, ignore_errors=True)
+
+
+def openmetrics_families(
+    generated_data_list: List[GeneratedData],
+) -> List[OpenMetricsFamily]:
     # At this point we can have same metrics as multiple objects
     # we need to combine same metric name to a single object (single block)
     # each unique label tuple should have seprate entry in block
     backfill_data_list = convert_to_backfill_data(generated_data_list)
-    file_text = ""
-    with open(os.path.join(Path.PYTHON_UTILS_ROOT, historical_data_file), "w") as file:
-        for i in range(len(backfill_data_list[0].series[0].value)):
-            multiline_text = t.render(backfill_data_list=backfill_data_list, index=i)
-            file_text += multiline_text
+    return [
+        OpenMetricsFamily(
+            metric_name=backfill_data.metric_name,
+            description=backfill_data.description,
+            series=[
+                OpenMetricsSeries(series.labels, series.timestamp, series.value)
+                for series in backfill_data.series
+            ],
+        )
+        for backfill_data in backfill_data_list
+    ]
 
-        # remove all empty lines
-        output_lines = [line for line in file_text.splitlines() if line.strip()]
-        file_text = "\n".join(output_lines)
 
-        file.write(file_text)
-        file.write("\n# EOF")
+def backfill_generated_data_with_promtool(
+    context, generated_data_list: List[GeneratedData]
+):
+    historical_data_file = "{}_historical_data.txt".format(context.scenario)
+    data_block_directory = "/{}_data/".format(context.scenario)
+
+    families = openmetrics_families(generated_data_list)
+    write_openmetrics_file(
+        os.path.join(Path.PYTHON_UTILS_ROOT, historical_data_file), families
+    )
+    # Fail here rather than after promtool and the upload
+    validate_openmetrics_file(
+        os.path.join(Path.PYTHON_UTILS_ROOT, historical_data_file),
+        expected_sample_counts(families),
+    )
 
     remote_write_config = context.remote_write_config
-    subprocess.run(
+    result = subprocess.run(
         [
             os.path.join(Path.PYTHON_UTILS_ROOT, "backfill.sh"),
             remote_write_config["url"].removesuffix("/api/prom/push"),
@@ -339,6 +456,9 @@ def backfill_generated_data(context, generated_data_list: List[GeneratedData]):
             historical_data_file,
         ],
     )
+    if result.returncode != 0:
+        # Fail now instead of in the hour-long check for the backfilled data
+        raise Exception(f"backfill.sh failed with return code {result.returncode}")
 
 
 def generate_data_for_input(context, duration_delta: timedelta) -> List[GeneratedData]:
@@ -346,48 +466,78 @@ def generate_data_for_input(context, duration_delta: timedelta) -> List[Generate
         logging.info("Remote write config not found. Skipping backfill.")
         assert False
 
-    generated_data_list: List[GeneratedData] = []
+    start_time = datetime.now(timezone.utc) - duration_delta
+    rows = []
+    row_configs = []
     for row in context.table:
-        start_value = float(row["start_value"])
-        end_value = float(row["end_value"])
-        start_spike_minute = int(row["start_spike_minute"])
-        spike_duration_minutes = int(row["spike_duration_minutes"])
-        label_string = row["label_values"]
-        seasonality_period_hours = int(row["seasonality_period_hours"])
-        metric_name = row["metric_name"]
-        metric_type = (
-            row["metric_type"] if "metric_type" in context.table.headings else "gauge"
-        )
-        amplitude = (
-            float(row["amplitude"]) if "amplitude" in context.table.headings else 20
-        )
-
-        start_time = datetime.now(timezone.utc) - duration_delta
-        generated_data = generate_timeseries(
-            time_config=TimeConfig(
-                series_config=SeriesConfig(
-                    start_value=start_value,
-                    end_value=end_value,
-                    start_time=start_time,
-                    duration=duration_delta,
-                ),
-                transition_config=TransitionConfig(
-                    start_time=start_time + timedelta(minutes=start_spike_minute),
-                    transition_window=timedelta(minutes=spike_duration_minutes),
-                ),
+        row_config = {
+            "start_value": float(row["start_value"]),
+            "end_value": float(row["end_value"]),
+            "start_spike_minute": int(row["start_spike_minute"]),
+            "spike_duration_minutes": int(row["spike_duration_minutes"]),
+            "label_string": row["label_values"],
+            "seasonality_period_hours": int(row["seasonality_period_hours"]),
+            "metric_name": row["metric_name"],
+            "metric_type": (
+                row["metric_type"]
+                if "metric_type" in context.table.headings
+                else "gauge"
             ),
-            seasonality_config=SeasonalityConfig(
-                enable=True,
-                amplitude=amplitude,
-                period=timedelta(hours=seasonality_period_hours),
+            "amplitude": (
+                float(row["amplitude"]) if "amplitude" in context.table.headings else 20
             ),
-            noise_config=NoiseConfig(enable=False),
+        }
+        row_configs.append(row_config)
+        rows.append(
+            SeriesRowConfig(
+                start_value=row_config["start_value"],
+                end_value=row_config["end_value"],
+                transition_config=TransitionConfig(
+                    start_time=start_time
+                    + timedelta(minutes=row_config["start_spike_minute"]),
+                    transition_window=timedelta(
+                        minutes=row_config["spike_duration_minutes"]
+                    ),
+                ),
+                seasonality_config=SeasonalityConfig(
+                    enable=True,
+                    amplitude=row_config["amplitude"],
+                    period=timedelta(hours=row_config["seasonality_period_hours"]),
+                ),
+                noise_config=NoiseConfig(enable=False),
+            )
         )
 
-        if metric_type == "counter":
-            generated_data["y"] = generated_data["y"].cumsum()
+    # All rows share start, duration and step; large tables (e.g. 90 days of
+    # several capacity metrics) are spread over a process pool
+    timestamps, values = generate_timeseries_parallel(
+        start_time=start_time,
+        duration=duration_delta,
+        step=timedelta(minutes=1),
+        rows=rows,
+    )
 
-        label_map = get_label_map(context, label_string, duration_delta)
+    generated_data_list: List[GeneratedData] = []
+    interned_labels = {}
+    for row_config, row_values in zip(row_configs, values):
+        start_value = row_config["start_value"]
+        end_value = row_config["end_value"]
+        start_spike_minute = row_config["start_spike_minute"]
+        spike_duration_minutes = row_config["spike_duration_minutes"]
+        seasonality_period_hours = row_config["seasonality_period_hours"]
+        metric_name = row_config["metric_name"]
+        amplitude = row_config["amplitude"]
+
+        if row_config["metric_type"] == "counter":
+            row_values = row_values.cumsum()
+
+        label_map = get_label_map(context, row_config["label_string"], duration_delta)
+        generated_data = GeneratedData(
+            metric_name=metric_name,
+            timestamps=timestamps,
+            values=row_values,
+            labels=intern_labels(label_map, interned_labels),
+        )
 
         write_timeseries_yaml(
             context=context,
@@ -405,11 +555,5 @@ def generate_data_for_input(context, duration_delta: timedelta) -> List[Generate
             },
         )
 
-        generated_data_list.append(
-            GeneratedData(
-                metric_name=metric_name,
-                values=generated_data,
-                labels=label_map,
-            )
-        )
+        generated_data_list.append(generated_data)
     return generated_data_list
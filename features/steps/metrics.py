@@ -1,35 +1,52 @@
+import os
 import time
 import logging
 from datetime import timedelta
+from typing import List, Sequence, Tuple
 
 import numpy as np
 from behave import *
-from opentelemetry import metrics
-from cdo_apis import remote_write
+from cdo_apis import remote_write, remote_write_sender
 from features.steps.utils import GeneratedData, get_label_map, convert_str_list_to_dict
-from opentelemetry.sdk.metrics._internal.point import (
-    ResourceMetrics,
-    ScopeMetrics,
-    Metric,
-    Gauge,
-    NumberDataPoint,
+from shared.remote_write import (
+    RemoteWriteSeries,
+    build_instant_write_request,
+    prometheus_labels,
 )
-from opentelemetry.sdk.util.instrumentation import InstrumentationScope
-from opentelemetry.sdk.metrics.export import MetricsData
-from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.sdk.metrics._internal.export import InMemoryMetricReader
-from opentelemetry.sdk.resources import Resource
-
-memory_reader = InMemoryMetricReader()
-meter_provider = MeterProvider(
-    metric_readers=[memory_reader], resource=Resource.get_empty()
+from shared.remote_write_batches import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_SAMPLES,
+    send_series,
 )
-metrics.set_meter_provider(meter_provider)
-meter = metrics.get_meter(__name__)
+from shared.remote_write_client import RemoteWriteError
+from shared.retry import DEFAULT_MAX_WORKERS
+from shared.tick_scheduler import run_ticks
+
+# The OpenTelemetry SDK is imported and the MeterProvider built on first use,
+# so that loading the step modules does not pay for it
+memory_reader = None
+meter = None
+
+
+def get_meter():
+    global memory_reader, meter
+    if meter is None:
+        from opentelemetry import metrics
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics._internal.export import InMemoryMetricReader
+        from opentelemetry.sdk.resources import Resource
+
+        memory_reader = InMemoryMetricReader()
+        meter_provider = MeterProvider(
+            metric_readers=[memory_reader], resource=Resource.get_empty()
+        )
+        metrics.set_meter_provider(meter_provider)
+        meter = metrics.get_meter(__name__)
+    return meter
 
 
 def create_gauge(name: str, description: str):
-    gauge = meter.create_gauge(
+    gauge = get_meter().create_gauge(
         name=name,
         description=description,
     )
@@ -42,30 +59,107 @@ active_metrics = {}
 
 
 def batch_remote_write(synthesized_ts: GeneratedData, step: timedelta):
-    values = synthesized_ts.values
-    labels = synthesized_ts.labels
-
-    # Guard against NaN/Inf values that would cause a 400 from the ingest endpoint
-    bad_mask = np.isnan(values["y"]) | np.isinf(values["y"])
-    if bad_mask.any():
-        bad_count = bad_mask.sum()
-        logging.warning(
-            f"Dropping {bad_count} NaN/Inf value(s) from {synthesized_ts.metric_name} before remote write"
+    batch_remote_write_all([synthesized_ts])
+
+
+def batch_remote_write_all(
+    synthesized_ts_list: List[GeneratedData],
+    max_samples: int = DEFAULT_MAX_SAMPLES,
+):
+    """Remote write whole backlogs in bounded chunks, series concurrently.
+
+    REMOTE_WRITE_MAX_SAMPLES, REMOTE_WRITE_MAX_BYTES and REMOTE_WRITE_WORKERS
+    override the request limits and the number of requests in flight.
+    """
+    series = []
+    for synthesized_ts in synthesized_ts_list:
+        timestamps = synthesized_ts.timestamps
+        values = synthesized_ts.values
+        labels = synthesized_ts.labels
+
+        # Guard against NaN/Inf values that would cause a 400 from the ingest endpoint
+        bad_mask = ~np.isfinite(values)
+        if bad_mask.any():
+            bad_count = bad_mask.sum()
+            logging.warning(
+                f"Dropping {bad_count} NaN/Inf value(s) from {synthesized_ts.metric_name} before remote write"
+            )
+            timestamps = timestamps[~bad_mask]
+            values = values[~bad_mask]
+
+        # Log payload details for debugging remote write failures
+        ts_range = (
+            f"{timestamps[0] * 1_000_000_000} -> {timestamps[-1] * 1_000_000_000}"
+            if len(timestamps)
+            else "empty"
         )
-        values = values[~bad_mask].reset_index(drop=True)
-
-    data_points = []
-    for i, value in values.iterrows():
-        timestamp = int(value["ds"] * 1e9)
-        data_points.append(
-            NumberDataPoint(
-                time_unix_nano=timestamp,
-                start_time_unix_nano=timestamp,
-                value=float(value["y"]),
-                attributes=labels,
+        val_sample = values[:3].tolist()
+        logging.info(
+            f"batch_remote_write: metric={synthesized_ts.metric_name}, "
+            f"points={len(timestamps)}, labels={list(labels.keys())}, "
+            f"ts_range_ns=[{ts_range}], sample_values={val_sample}"
+        )
+
+        # "native" encodes the WriteRequest straight from the arrays, "otel" goes
+        # through OpenTelemetry data points and the remote-write exporter
+        if os.getenv("REMOTE_WRITE_ENCODER", "native") == "otel":
+            otel_batch_remote_write(
+                synthesized_ts.metric_name, labels, timestamps, values
+            )
+            continue
+
+        if not len(timestamps):
+            # The exporter refuses to send a request without samples as well
+            logging.error("No samples to export")
+            raise Exception("Failed to export metric data")
+        series.append(
+            RemoteWriteSeries(
+                prometheus_labels(synthesized_ts.metric_name, labels),
+                timestamps * 1000,
+                values,
             )
         )
 
+    if not series:
+        return
+    summary = send_series(
+        series,
+        remote_write_sender(),
+        max_samples=int(os.getenv("REMOTE_WRITE_MAX_SAMPLES", max_samples)),
+        max_bytes=int(os.getenv("REMOTE_WRITE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        max_workers=int(os.getenv("REMOTE_WRITE_WORKERS", DEFAULT_MAX_WORKERS)),
+    )
+    if not summary.ok:
+        logging.error("Failed to export metric data")
+        raise Exception("Failed to export metric data")
+
+
+def otel_batch_remote_write(
+    metric_name: str, labels: dict, timestamps: np.ndarray, values: np.ndarray
+):
+    from opentelemetry.sdk.metrics._internal.point import (
+        ResourceMetrics,
+        ScopeMetrics,
+        Metric,
+        Gauge,
+        NumberDataPoint,
+    )
+    from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+    from opentelemetry.sdk.metrics.export import MetricsData
+    from opentelemetry.sdk.resources import Resource
+
+    data_points = [
+        NumberDataPoint(
+            time_unix_nano=timestamp,
+            start_time_unix_nano=timestamp,
+            value=value,
+            attributes=labels,
+        )
+        for timestamp, value in zip(
+            (timestamps * 1_000_000_000).tolist(), values.tolist()
+        )
+    ]
+
     resource_metric = ResourceMetrics(
         resource=Resource.get_empty(),
         schema_url="",
@@ -74,7 +168,7 @@ def batch_remote_write(synthesized_ts: GeneratedData, step: timedelta):
                 scope=InstrumentationScope(name="sample_scope"),
                 metrics=[
                     Metric(
-                        name=synthesized_ts.metric_name,
+                        name=metric_name,
                         description="",
                         data=Gauge(data_points=data_points),
                         unit="",
@@ -86,57 +180,90 @@ def batch_remote_write(synthesized_ts: GeneratedData, step: timedelta):
     )
 
     metrics_data_now = MetricsData(resource_metrics=[resource_metric])
+    remote_write(metrics_data=metrics_data_now)
 
-    # Log payload details for debugging remote write failures
-    ts_range = (
-        f"{data_points[0].time_unix_nano} -> {data_points[-1].time_unix_nano}"
-        if data_points
-        else "empty"
-    )
-    val_sample = [dp.value for dp in data_points[:3]]
-    logging.info(
-        f"batch_remote_write: metric={synthesized_ts.metric_name}, "
-        f"points={len(data_points)}, labels={list(labels.keys())}, "
-        f"ts_range_ns=[{ts_range}], sample_values={val_sample}"
-    )
 
-    remote_write(metrics_data=metrics_data_now)
+def instant_remote_write(
+    metric_name: str, labels: dict[str, str], value: float, timestamp: float = None
+):
+    instant_remote_write_all([(metric_name, labels, value)], timestamp)
 
 
-def instant_remote_write(metric_name: str, labels: dict[str, str], value: float):
-    if metric_name not in active_metrics:
-        create_gauge(metric_name, "Gauge metric")
+def instant_remote_write_all(
+    samples: Sequence[Tuple[str, dict[str, str], float]], timestamp: float = None
+):
+    """Remote write one sample per (metric_name, labels, value) in one request.
 
-    active_metrics[metric_name].set(float(value), labels)
+    Only these series are sent, at ``timestamp`` (epoch seconds, default now),
+    so the payload does not grow with every series touched earlier in the run.
+    REMOTE_WRITE_ENCODER=otel sets OpenTelemetry gauges and exports the whole
+    reader state instead.
+    """
+    if os.getenv("REMOTE_WRITE_ENCODER", "native") == "otel":
+        otel_instant_remote_write_all(samples)
+        return
+
+    logging.debug(f"Live samples: {samples}")
+    timestamp_ms = round((time.time() if timestamp is None else timestamp) * 1000)
+    body, series = build_instant_write_request(samples, timestamp_ms)
+    if not series:
+        logging.error(f"None of the {len(samples)} live samples is finite")
+        return
+    try:
+        remote_write_sender().send(body)
+    except RemoteWriteError as e:
+        logging.error(f"Failed to export {series} live samples: {e}")
+        return
+    logging.info(f"Exported {series} live samples ({len(body)} bytes) successfully")
+
+
+def otel_instant_remote_write_all(samples: Sequence[Tuple[str, dict[str, str], float]]):
+    logging.debug(f"Live samples: {samples}")
+    for metric_name, labels, value in samples:
+        if metric_name not in active_metrics:
+            create_gauge(metric_name, "Gauge metric")
+        active_metrics[metric_name].set(float(value), labels)
 
     metrics_data = memory_reader.get_metrics_data()
     try:
         remote_write(metrics_data=metrics_data)
     except Exception:
-        logging.error(
-            f"Failed to export metric {metric_name} with labels {labels} and value {value}"
-        )
+        logging.error(f"Failed to export {len(samples)} live samples")
         return
-    logging.info(
-        f"Exported metric {metric_name} with labels {labels} and value {value} succesfully"
-    )
+    logging.info(f"Exported {len(samples)} live samples successfully")
 
 
 @step("ingest the following metrics for {duration} minutes")
 def step_impl(context, duration):
-    for i in range(int(duration)):
-        for row in context.table:
-            labels = {}
-            increment_params = {}
-            if row["labels"] != "":
-                labels = get_label_map(context, row["labels"])
-            if row["increment_params"] != "":
-                increment_params = convert_str_list_to_dict(row["increment_params"])
-            current_value = calculate_current_value(
-                float(row["start_value"]), row["increment_type"], increment_params, i
-            )
-            instant_remote_write(row["metric_name"], labels, current_value)
-        time.sleep(60)
+    rows = []
+    for row in context.table:
+        labels = {}
+        increment_params = {}
+        if row["labels"] != "":
+            labels = get_label_map(context, row["labels"])
+        if row["increment_params"] != "":
+            increment_params = convert_str_list_to_dict(row["increment_params"])
+        rows.append((row, labels, increment_params))
+
+    def tick(i, scheduled):
+        instant_remote_write_all(
+            [
+                (
+                    row["metric_name"],
+                    labels,
+                    calculate_current_value(
+                        float(row["start_value"]),
+                        row["increment_type"],
+                        increment_params,
+                        i,
+                    ),
+                )
+                for row, labels, increment_params in rows
+            ],
+            timestamp=scheduled,
+        )
+
+    context.live_ticks = run_ticks(int(duration), tick)
 
 
 def calculate_current_value(
@@ -1,18 +1,19 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta, datetime, timezone
+from multiprocessing import shared_memory
 
 import numpy as np
-import pandas as pd
 
-from darts.utils.timeseries_generation import (
-    constant_timeseries,
-    gaussian_timeseries,
-    linear_timeseries,
-    sine_timeseries,
-)
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 
 from pydantic import BaseModel
 
+from shared.signal_components import linear_ramp, sine_wave
+
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class SeriesConfig(BaseModel, arbitrary_types_allowed=True):
     start_value: float
@@ -47,7 +48,8 @@ class SeasonalityConfig(BaseModel, arbitrary_types_allowed=True):
 class MissingDataConfig(BaseModel, arbitrary_types_allowed=True):
     start_time: datetime
     duration: timedelta
-    miss_probability: float  # Probability of a value being missing (0)
+    # Probability of a value being missing; 1.0 is a fixed-length outage
+    miss_probability: float = 1.0
 
 
 default_noise = NoiseConfig(enable=True, mean=0, std=2)
@@ -56,204 +58,449 @@ default_seasonality = SeasonalityConfig(
 )
 
 
-_COMPONENT_NAME = "value"
+_EPOCH = datetime(1970, 1, 1)
+
+# One week of 1-minute samples per chunk when streaming
+DEFAULT_CHUNK_SIZE = 7 * 24 * 60
+
+# Below this many samples (rows x points) a process pool costs more than it saves
+PARALLEL_MIN_SAMPLES = 2_000_000
 
 
-def _darts_ts_to_dataframe(darts_ts) -> pd.DataFrame:
-    """Convert a Darts TimeSeries to a pd.DataFrame with 'ds' (epoch) and 'y' columns."""
-    pdf = darts_ts.pd_dataframe()
-    timestamps = [t.timestamp() for t in pdf.index]
-    values = pdf.iloc[:, 0].values
-    return pd.DataFrame({"ds": timestamps, "y": values})
+def _as_naive_utc(dt: datetime) -> datetime:
+    """Return ``dt`` as a naive UTC datetime; naive inputs are assumed to be UTC."""
+    if dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
 
 
-def _build_piecewise_signal(
-    series_config: SeriesConfig,
-    transition_config: Optional[TransitionConfig],
-) -> Any:
-    """Build a piecewise signal: flat(start_value) → linear transition → flat(end_value).
+def _epoch_seconds(dt: datetime) -> int:
+    """Whole epoch seconds for ``dt`` (floored, matching ``int(dt.timestamp())``)."""
+    return (_as_naive_utc(dt) - _EPOCH) // timedelta(seconds=1)
 
-    Uses Darts linear_timeseries and constant_timeseries, then concatenates.
+
+class SeriesRowConfig(BaseModel, arbitrary_types_allowed=True):
+    """Per-series settings for generate_timeseries_batch.
+
+    Start time, duration and step are shared by every row of a batch.
     """
-    # Strip tz for darts (xarray doesn't support tz-aware timestamps)
-    start_time = pd.Timestamp(series_config.start_time).tz_localize(None)
-    end_time = start_time + series_config.duration
-    freq_str = f"{int(series_config.step.total_seconds())}s"
-    total_points = int(series_config.duration / series_config.step)
-
-    if transition_config is None:
-        # Instant switch at start_time
-        return constant_timeseries(
-            value=series_config.end_value,
-            start=start_time,
-            length=total_points,
-            freq=freq_str,
-            column_name=_COMPONENT_NAME,
-        )
 
-    transition_start = pd.Timestamp(transition_config.start_time).tz_localize(None)
-    transition_end = transition_start + transition_config.transition_window
+    start_value: float
+    end_value: float
+    transition_config: Optional[TransitionConfig] = None
+    noise_config: NoiseConfig = default_noise
+    seasonality_config: SeasonalityConfig = default_seasonality
+
+
+def _build_piecewise_signals(
+    rows: List[SeriesRowConfig],
+    start_time: datetime,
+    step: timedelta,
+    index: np.ndarray,
+) -> np.ndarray:
+    """Build flat(start_value) → linear transition → flat(end_value) for every row.
+
+    Returns an N×len(index) array. The ramp reproduces ``np.linspace`` element for
+    element (``k * step + start`` with the last point pinned to ``end_value``),
+    which is what Darts' ``linear_timeseries`` used, so the values are identical
+    to the former per-series Darts implementation.
+    """
+    start_values = np.array([row.start_value for row in rows], dtype=np.float64)
+    end_values = np.array([row.end_value for row in rows], dtype=np.float64)
+    pre_points = np.zeros(len(rows), dtype=np.int64)
+    transition_points = np.zeros(len(rows), dtype=np.int64)
+
+    start_time = _as_naive_utc(start_time)
+    for i, row in enumerate(rows):
+        # No transition config means an instant switch to end_value at start_time
+        if row.transition_config is not None:
+            transition_start = _as_naive_utc(row.transition_config.start_time)
+            pre_points[i] = max(0, int((transition_start - start_time) / step))
+            transition_points[i] = max(
+                1, int(row.transition_config.transition_window / step)
+            )
+
+    # Position of each sample inside its row's ramp
+    k = index[np.newaxis, :] - pre_points[:, np.newaxis]
+    ramp = linear_ramp(
+        k,
+        start_values[:, np.newaxis],
+        end_values[:, np.newaxis],
+        transition_points[:, np.newaxis],
+    )
 
-    # Calculate point counts for each segment
-    pre_points = max(0, int((transition_start - start_time) / series_config.step))
-    transition_points = max(
-        1, int(transition_config.transition_window / series_config.step)
+    return np.where(
+        k < 0,
+        start_values[:, np.newaxis],
+        np.where(k < transition_points[:, np.newaxis], ramp, end_values[:, np.newaxis]),
     )
-    post_points = max(0, total_points - pre_points - transition_points)
-
-    segments = []
-
-    # Pre-transition flat segment
-    if pre_points > 0:
-        segments.append(
-            constant_timeseries(
-                value=series_config.start_value,
-                start=start_time,
-                length=pre_points,
-                freq=freq_str,
-                column_name=_COMPONENT_NAME,
-            )
-        )
 
-    # Transition segment (linear ramp)
-    trans_start_ts = start_time + pre_points * series_config.step
-    if transition_points > 0:
-        segments.append(
-            linear_timeseries(
-                start_value=series_config.start_value,
-                end_value=series_config.end_value,
-                start=trans_start_ts,
-                length=transition_points,
-                freq=freq_str,
-                column_name=_COMPONENT_NAME,
-            )
+
+def _add_seasonality_and_noise(
+    values: np.ndarray,
+    rows: List[SeriesRowConfig],
+    step: timedelta,
+    index: np.ndarray,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Add each row's seasonality and noise to the N×len(index) ``values`` in place.
+
+    Noise comes from ``rng`` when given, otherwise from the global ``np.random`` state.
+    """
+    seasonal_rows = [i for i, row in enumerate(rows) if row.seasonality_config.enable]
+    if seasonal_rows:
+        amplitudes = np.array(
+            [rows[i].seasonality_config.amplitude for i in seasonal_rows]
+        )
+        period_steps = np.array(
+            [rows[i].seasonality_config.period / step for i in seasonal_rows]
+        )
+        values[seasonal_rows] += sine_wave(
+            index[np.newaxis, :], period_steps[:, np.newaxis], amplitudes[:, np.newaxis]
         )
 
-    # Post-transition flat segment
-    if post_points > 0:
-        post_start_ts = trans_start_ts + transition_points * series_config.step
-        segments.append(
-            constant_timeseries(
-                value=series_config.end_value,
-                start=post_start_ts,
-                length=post_points,
-                freq=freq_str,
-                column_name=_COMPONENT_NAME,
-            )
+    noisy_rows = [i for i, row in enumerate(rows) if row.noise_config.enable]
+    if noisy_rows:
+        means = np.array([rows[i].noise_config.mean for i in noisy_rows])
+        stds = np.array([rows[i].noise_config.std for i in noisy_rows])
+        # Row-major draws, i.e. the same sequence as one
+        # np.random.normal(mean, std, size=T) call per noisy row
+        standard_normal = (
+            np.random.standard_normal if rng is None else rng.standard_normal
         )
+        draws = standard_normal((len(noisy_rows), len(index)))
+        values[noisy_rows] += means[:, np.newaxis] + stds[:, np.newaxis] * draws
 
-    # Concatenate all segments
-    if len(segments) == 1:
-        return segments[0]
+    return values
 
-    result = segments[0]
-    for seg in segments[1:]:
-        result = result.concatenate(seg, ignore_time_axis=True)
-    return result
 
+def _closest_indices(timestamps: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Index of the timestamp closest to each target (first one on ties).
 
-def generate_missing_data(config: MissingDataConfig, frequency: timedelta):
-    """Generate a list of 0s (missing) and 1s (present) based on the miss_probability.
+    ``timestamps`` must be sorted ascending; all targets are resolved with a
+    single ``np.searchsorted`` instead of an argmin over the whole series each.
+    """
+    right = np.clip(np.searchsorted(timestamps, targets), 0, len(timestamps) - 1)
+    left = np.clip(right - 1, 0, len(timestamps) - 1)
+    use_left = np.abs(timestamps[left] - targets) <= np.abs(timestamps[right] - targets)
+    return np.where(use_left, left, right)
+
+
+def build_missing_mask(
+    timestamps: np.ndarray,
+    missing_data_configs: List[MissingDataConfig],
+    step: timedelta,
+) -> np.ndarray:
+    """Build a boolean mask (True = missing) for all gap windows in one pass.
+
+    Each window starts at the sample closest to its ``start_time`` and covers
+    ``duration / step`` samples; windows may overlap and are OR-ed together.
+    Windows with ``miss_probability < 1`` drop samples at random (one uniform
+    draw per sample, taken from the global ``np.random`` state in config order),
+    windows with ``miss_probability == 1`` are deterministic outages and consume
+    no randomness.
 
     Args:
-        config (MissingDataConfig): Configuration containing start time, duration, and miss probability.
-        frequency (timedelta): The interval at which to generate values (e.g., 1 second, 1 minute).
+        timestamps (np.ndarray): Ascending epoch-second timestamps of the series.
+        missing_data_configs (List[MissingDataConfig]): Gap windows to apply.
+        step (timedelta): Sampling interval of the series.
 
     Returns:
-        list: A list of 0s (missing) and 1s (present).
+        np.ndarray: Boolean mask with the same length as ``timestamps``.
     """
-    num_samples = int(config.duration.total_seconds() / frequency.total_seconds())
-    data = np.random.choice(
-        [1, 0],
-        size=num_samples,
-        p=[1 - config.miss_probability, config.miss_probability],
+    mask = np.zeros(len(timestamps), dtype=bool)
+    if len(timestamps) == 0 or not missing_data_configs:
+        return mask
+
+    lengths = np.array(
+        [int(config.duration / step) for config in missing_data_configs],
+        dtype=np.int64,
+    )
+    probabilities = np.array(
+        [config.miss_probability for config in missing_data_configs]
+    )
+    targets = np.array(
+        [
+            (_as_naive_utc(config.start_time) - _EPOCH).total_seconds()
+            for config in missing_data_configs
+        ]
+    )
+    starts = _closest_indices(timestamps, targets)
+
+    # Absolute sample position of every slot in every window, flattened
+    window_of_slot = np.repeat(np.arange(len(lengths)), lengths)
+    window_offsets = np.cumsum(lengths) - lengths
+    positions = (
+        np.arange(lengths.sum(), dtype=np.int64)
+        - window_offsets[window_of_slot]
+        + starts[window_of_slot]
     )
-    return list(data)
 
+    missing = probabilities[window_of_slot] >= 1.0
+    random_slots = ~missing
+    if random_slots.any():
+        draws = np.random.random_sample(int(random_slots.sum()))
+        missing[random_slots] = (
+            draws >= 1.0 - probabilities[window_of_slot][random_slots]
+        )
 
-def find_closest_index(time_points, target_time):
-    time_array = np.array(
-        time_points, dtype="datetime64[ns]"
-    )  # Convert list to numpy datetime64
-    return np.abs(time_array - np.datetime64(target_time)).argmin()
+    positions = positions[missing]
+    mask[positions[positions < len(mask)]] = True
+    return mask
 
 
-def generate_timeseries(
-    time_config: TimeConfig,
-    noise_config: NoiseConfig = default_noise,
-    seasonality_config: SeasonalityConfig = default_seasonality,
-    missing_data_configs: List[MissingDataConfig] | None = None,
-) -> pd.DataFrame:
-    # Strip tz for darts; re-localize to UTC after extraction for correct epoch conversion
-    start_time = pd.Timestamp(time_config.series_config.start_time).tz_localize(None)
-    freq_str = f"{int(time_config.series_config.step.total_seconds())}s"
-    total_points = int(
-        time_config.series_config.duration / time_config.series_config.step
-    )
+def generate_timeseries_batch(
+    start_time: datetime,
+    duration: timedelta,
+    step: timedelta,
+    rows: List[SeriesRowConfig],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate N series that share start time, duration and step in one pass.
+
+    Args:
+        start_time (datetime): Start of every series.
+        duration (timedelta): Length of every series.
+        step (timedelta): Sampling interval of every series.
+        rows (List[SeriesRowConfig]): Per-series values, transition, noise and seasonality.
+
+    Returns:
+        tuple: ``(timestamps, values)`` where ``timestamps`` is the shared int64
+        array of T epoch seconds and ``values`` a float64 N×T array, one row per
+        entry of ``rows``.
+
+    Row ``i`` is identical to ``generate_timeseries_arrays`` for that row's
+    settings, including the noise drawn from the global ``np.random`` state.
+    """
+    index = np.arange(int(duration / step), dtype=np.int64)
+    timestamps = _epoch_seconds(start_time) + index * int(step.total_seconds())
+
+    values = _build_piecewise_signals(rows, start_time, step, index)
+    values = _add_seasonality_and_noise(values, rows, step, index)
+    return timestamps, values
+
+
+def generate_timeseries_chunk(
+    start_time: datetime,
+    duration: timedelta,
+    step: timedelta,
+    rows: List[SeriesRowConfig],
+    chunk_index: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate chunk ``chunk_index`` of a batch without generating the chunks before it.
+
+    Chunk k covers samples ``[k * chunk_size, (k + 1) * chunk_size)`` (the last
+    chunk may be shorter). The signal is a pure function of the sample index and
+    the noise of chunk k comes from its own generator seeded with
+    ``SeedSequence(seed, spawn_key=(k,))``, so a chunk is identical whether it is
+    produced alone or as part of iter_timeseries_chunks.
+
+    Gaps are not supported: SeriesRowConfig has no MissingDataConfig, because
+    its random draws depend on the whole series. Use generate_timeseries_arrays
+    for series with missing data.
 
-    # Build the base piecewise signal
-    base_signal = _build_piecewise_signal(
-        time_config.series_config, time_config.transition_config
+    Returns:
+        tuple: ``(timestamps, values)`` with shapes ``(C,)`` and ``(N, C)``.
+    """
+    total_points = int(duration / step)
+    index = np.arange(
+        chunk_index * chunk_size,
+        min((chunk_index + 1) * chunk_size, total_points),
+        dtype=np.int64,
+    )
+    timestamps = _epoch_seconds(start_time) + index * int(step.total_seconds())
+    rng = np.random.Generator(
+        np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
     )
 
-    # Extract time index and values as numpy arrays to avoid xarray
-    # component-name alignment issues (FutureWarning + potential NaN)
-    # Re-localize to UTC so .timestamp() produces correct epoch seconds
-    time_index = base_signal.time_index.tz_localize("UTC")
-    values = base_signal.values().flatten()
-
-    # Add seasonality (numpy arithmetic)
-    if seasonality_config.enable:
-        period_in_steps = seasonality_config.period / time_config.series_config.step
-        # value_frequency = number of full periods per time unit (1 step)
-        value_frequency = 1.0 / period_in_steps
-        seasonality_ts = sine_timeseries(
-            value_frequency=value_frequency,
-            value_amplitude=seasonality_config.amplitude,
-            value_y_offset=0,
-            start=start_time,
-            length=total_points,
-            freq=freq_str,
-        )
-        values = values + seasonality_ts.values().flatten()
-
-    # Add noise (numpy arithmetic)
-    if noise_config.enable:
-        noise_ts = gaussian_timeseries(
-            mean=noise_config.mean,
-            std=noise_config.std,
-            start=start_time,
-            length=total_points,
-            freq=freq_str,
+    values = _build_piecewise_signals(rows, start_time, step, index)
+    values = _add_seasonality_and_noise(values, rows, step, index, rng=rng)
+    return timestamps, values
+
+
+def iter_timeseries_chunks(
+    start_time: datetime,
+    duration: timedelta,
+    step: timedelta,
+    rows: List[SeriesRowConfig],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = 0,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Stream a batch of series as fixed-size ``(timestamps, values)`` chunks.
+
+    Only one chunk is alive at a time, so months of 1-minute data can be written
+    out in constant memory. Output is deterministic for a given ``seed``; see
+    generate_timeseries_chunk for the per-chunk seeding.
+    """
+    total_points = int(duration / step)
+    for chunk_index in range(-(-total_points // chunk_size)):
+        yield generate_timeseries_chunk(
+            start_time, duration, step, rows, chunk_index, chunk_size, seed
         )
-        values = values + noise_ts.values().flatten()
 
-    # Build DataFrame directly from numpy arrays
-    timestamps = [t.timestamp() for t in time_index]
-    result_df = pd.DataFrame({"ds": timestamps, "y": values})
 
-    # Apply missing data
-    if missing_data_configs is not None:
-        time_points = pd.to_datetime(result_df["ds"], unit="s")
-        for missing_data_config in missing_data_configs:
-            missing_data = generate_missing_data(
-                missing_data_config, time_config.series_config.step
-            )
-            start_index = find_closest_index(
-                time_points, missing_data_config.start_time
+def _generate_seeded_rows(
+    rows: List[SeriesRowConfig],
+    start_time: datetime,
+    step: timedelta,
+    index: np.ndarray,
+    seed_sequences: List[np.random.SeedSequence],
+) -> np.ndarray:
+    """Generate ``rows`` with the noise of row i drawn from ``seed_sequences[i]``."""
+    values = _build_piecewise_signals(rows, start_time, step, index)
+    for i, (row, seed_sequence) in enumerate(zip(rows, seed_sequences)):
+        rng = np.random.Generator(np.random.PCG64(seed_sequence))
+        _add_seasonality_and_noise(values[i : i + 1], [row], step, index, rng=rng)
+    return values
+
+
+def _generate_rows_into_shared_memory(
+    shm_name: str,
+    shape: Tuple[int, int],
+    row_offset: int,
+    rows: List[SeriesRowConfig],
+    start_time: datetime,
+    step: timedelta,
+    seed_sequences: List[np.random.SeedSequence],
+):
+    """Worker for generate_timeseries_parallel: fill rows of the shared N×T array."""
+    index = np.arange(shape[1], dtype=np.int64)
+    block = _generate_seeded_rows(rows, start_time, step, index, seed_sequences)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        values[row_offset : row_offset + len(rows)] = block
+        # The buffer cannot be closed while an array still points into it
+        del values
+    finally:
+        shm.close()
+
+
+def generate_timeseries_parallel(
+    start_time: datetime,
+    duration: timedelta,
+    step: timedelta,
+    rows: List[SeriesRowConfig],
+    seed: int = 0,
+    max_workers: Optional[int] = None,
+    rows_per_task: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate a batch of series across a process pool.
+
+    Rows are split into tasks of ``rows_per_task`` rows and generated by a
+    ProcessPoolExecutor; workers write straight into one shared-memory N×T
+    array, so only the row configs are pickled. Row i draws its noise from
+    ``SeedSequence(seed).spawn(N)[i]``, which makes the output independent of
+    the worker count and task split. Batches smaller than PARALLEL_MIN_SAMPLES,
+    or ``max_workers=1``, are generated in-process with the same seeds.
+
+    Returns:
+        tuple: ``(timestamps, values)`` as for generate_timeseries_batch.
+    """
+    index = np.arange(int(duration / step), dtype=np.int64)
+    timestamps = _epoch_seconds(start_time) + index * int(step.total_seconds())
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(rows))
+    shape = (len(rows), len(index))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or shape[0] * shape[1] < PARALLEL_MIN_SAMPLES:
+        values = _generate_seeded_rows(rows, start_time, step, index, seed_sequences)
+        return timestamps, values
+
+    if rows_per_task is None:
+        # A few tasks per worker keeps the pool busy when rows differ in cost
+        rows_per_task = max(1, -(-len(rows) // (max_workers * 4)))
+
+    shm = shared_memory.SharedMemory(
+        create=True, size=shape[0] * shape[1] * np.dtype(np.float64).itemsize
+    )
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _generate_rows_into_shared_memory,
+                    shm.name,
+                    shape,
+                    offset,
+                    rows[offset : offset + rows_per_task],
+                    start_time,
+                    step,
+                    seed_sequences[offset : offset + rows_per_task],
+                )
+                for offset in range(0, len(rows), rows_per_task)
+            ]
+            for future in futures:
+                future.result()
+        values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return timestamps, values
+
+
+def generate_timeseries_arrays(
+    time_config: TimeConfig,
+    noise_config: NoiseConfig = default_noise,
+    seasonality_config: SeasonalityConfig = default_seasonality,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate a series as NumPy arrays without going through Darts or pandas.
+
+    Args:
+        time_config (TimeConfig): Start, duration, step and optional transition.
+        noise_config (NoiseConfig): Gaussian noise added on top of the signal.
+        seasonality_config (SeasonalityConfig): Sine seasonality added on top of the signal.
+
+    Returns:
+        tuple: ``(timestamps, values)`` where ``timestamps`` is an int64 array of
+        epoch seconds and ``values`` a float64 array of the same length.
+
+    The output matches the former Darts implementation: the ramp is the same
+    ``np.linspace``, the seasonality is ``amplitude * sin(2π * i / period_in_steps)``
+    and the noise is drawn from the global ``np.random`` state in the same order,
+    so seeding ``np.random`` reproduces the Darts values exactly. Timestamps are
+    the Darts epoch timestamps floored to whole seconds.
+    See ``scripts/benchmarks.py generator`` for the equivalence check.
+    """
+    series_config = time_config.series_config
+    timestamps, values = generate_timeseries_batch(
+        series_config.start_time,
+        series_config.duration,
+        series_config.step,
+        [
+            SeriesRowConfig(
+                start_value=series_config.start_value,
+                end_value=series_config.end_value,
+                transition_config=time_config.transition_config,
+                noise_config=noise_config,
+                seasonality_config=seasonality_config,
             )
-            for i in range(len(missing_data)):
-                if missing_data[i] == 0:
-                    result_df.loc[start_index + i, "y"] = None
-        result_df = result_df.dropna()
+        ],
+    )
+    return timestamps, values[0]
 
-    return result_df
 
+def generate_timeseries(
+    time_config: TimeConfig,
+    noise_config: NoiseConfig = default_noise,
+    seasonality_config: SeasonalityConfig = default_seasonality,
+    missing_data_configs: List[MissingDataConfig] | None = None,
+) -> "pd.DataFrame":
+    # The step modules work on the arrays directly, pandas is only loaded here
+    import pandas as pd
 
-def generate_spikes(spike_pattern, spike_multiplier, ts_values):
-    # Cycle through the spike pattern
-    for i in range(len(ts_values)):
-        if spike_pattern[i % len(spike_pattern)]:
-            ts_values[i] *= spike_multiplier
+    timestamps, values = generate_timeseries_arrays(
+        time_config, noise_config, seasonality_config
+    )
+
+    # Apply missing data: a single boolean compaction of both arrays, which the
+    # DataFrame then wraps without copying again
+    if missing_data_configs is not None:
+        keep = ~build_missing_mask(
+            timestamps, missing_data_configs, time_config.series_config.step
+        )
+        timestamps, values = timestamps[keep], values[keep]
 
-    return ts_values
+    return pd.DataFrame({"ds": timestamps, "y": values}, copy=False)
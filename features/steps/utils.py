@@ -7,14 +7,10 @@ import re
 import time
 import uuid
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import Dict, List
 
-import yaml
-
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator, model_validator
 
 from features.model import Device, ScenarioEnum
 from features.steps.cdo_apis import get
@@ -24,11 +20,10 @@ from shared.step_utils import parse_step_to_seconds
 from features.steps.time_series_generator import (
     NoiseConfig,
     SeasonalityConfig,
-    SeriesConfig,
-    TimeConfig,
+    SeriesRowConfig,
     TransitionConfig,
     default_noise,
-    generate_timeseries,
+    generate_timeseries_batch,
 )
 
 # Load scenario prerequisites from JSON config
@@ -75,16 +70,89 @@ def _filter_devices_by_type(devices: list, device_filter: str) -> list:
     return candidates
 
 
-class GeneratedData(BaseModel, arbitrary_types_allowed=True):
-    metric_name: str
-    values: pd.DataFrame
-    labels: dict
+def _as_1d_array(data, dtype, name: str) -> np.ndarray:
+    """View ``data`` as a 1-D array of ``dtype``; only copies if the dtype differs."""
+    array = np.asarray(data, dtype=dtype)
+    if array.ndim != 1:
+        raise ValueError(f"{name} must be 1-D, got shape {array.shape}")
+    return array
+
+
+def intern_labels(labels: dict, interned: dict) -> dict:
+    """Return one shared copy of ``labels`` per distinct label set in ``interned``.
+
+    ``interned`` is the table of one generation call, so it is dropped with the
+    call's series; the shared copy must be treated as read-only.
+    """
+    key = tuple(sorted(labels.items()))
+    shared = interned.get(key)
+    if shared is None:
+        shared = interned[key] = dict(labels)
+    return shared
+
+
+class GeneratedData:
+    """One generated series: int64 epoch-second timestamps and float64 values.
+
+    Slicing returns a GeneratedData whose arrays are views of this one, so
+    batch/live splits do not copy the samples.
+    """
+
+    __slots__ = ("metric_name", "timestamps", "values", "labels")
+
+    def __init__(
+        self, metric_name: str, timestamps: np.ndarray, values: np.ndarray, labels: dict
+    ):
+        self.metric_name = metric_name
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.labels = labels
+        if self.timestamps.shape != self.values.shape or self.values.ndim != 1:
+            raise ValueError(
+                f"timestamps {self.timestamps.shape} and values {self.values.shape} "
+                "must be 1-D arrays of the same length"
+            )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: slice) -> "GeneratedData":
+        return GeneratedData(
+            metric_name=self.metric_name,
+            timestamps=self.timestamps[index],
+            values=self.values[index],
+            labels=self.labels,
+        )
 
 
 class Series(BaseModel, arbitrary_types_allowed=True):
+    """One backfill series; values and timestamps stay NumPy arrays.
+
+    Only the dtype and shape are validated, not every element.
+    """
+
     labels: str
-    value: List[float]
-    timestamp: List[int]
+    value: np.ndarray
+    timestamp: np.ndarray
+
+    @field_validator("value", mode="before")
+    @classmethod
+    def _float64_array(cls, value):
+        return _as_1d_array(value, np.float64, "value")
+
+    @field_validator("timestamp", mode="before")
+    @classmethod
+    def _int64_array(cls, timestamp):
+        return _as_1d_array(timestamp, np.int64, "timestamp")
+
+    @model_validator(mode="after")
+    def _same_length(self):
+        if len(self.value) != len(self.timestamp):
+            raise ValueError(
+                f"value has {len(self.value)} samples but timestamp has "
+                f"{len(self.timestamp)}"
+            )
+        return self
 
 
 class BackfillData(BaseModel, arbitrary_types_allowed=True):
@@ -225,10 +293,11 @@ def is_data_present(query: str, duration: timedelta, step="5m"):
 
 # Helper function that can be used to dump the graph of genertaed timeseries when debugging
 def _save_timeseries_graph(
-    generated_data: pd.DataFrame, metric_name: str, labels: dict
+    generated_data: GeneratedData, metric_name: str, labels: dict
 ):
     """Save a graph of the timeseries data to a local file."""
-    import os
+    # matplotlib is only needed when debugging, keep it off the import path
+    import matplotlib.pyplot as plt
 
     # Create directory if it doesn't exist
     os.makedirs("./generated_graphs", exist_ok=True)
@@ -239,7 +308,7 @@ def _save_timeseries_graph(
 
     # Plot the data
     plt.figure(figsize=(12, 6))
-    plt.plot(generated_data["ds"], generated_data["y"])
+    plt.plot(generated_data.timestamps, generated_data.values)
     plt.xlabel("Time")
     plt.ylabel("Value")
     plt.title(f"{metric_name} - {label_str}")
@@ -264,100 +333,142 @@ def generate_synthesized_ts_obj(
     metric_type: str = "gauge",
     noise: bool = None,
 ) -> GeneratedData:
+    return generate_synthesized_ts_objs(
+        context,
+        [
+            {
+                "metric_name": metric_name,
+                "label_string": label_string,
+                "start_value": start_value,
+                "end_value": end_value,
+                "spike_duration_minutes": spike_duration_minutes,
+                "start_spike_minute": start_spike_minute,
+                "metric_type": metric_type,
+                "noise": noise,
+            }
+        ],
+        duration=duration,
+        time_offset=time_offset,
+    )[0]
+
+
+def generate_synthesized_ts_objs(
+    context,
+    specs: List[dict],
+    duration: int,
+    time_offset: timedelta,
+) -> List[GeneratedData]:
+    """Generate one GeneratedData per spec with a single batched generator call.
+
+    Each spec holds the per-row arguments of generate_synthesized_ts_obj:
+    metric_name, label_string, start_value, end_value, spike_duration_minutes,
+    start_spike_minute and optionally metric_type and noise. All rows share the
+    start time, duration and 1 minute step.
+    """
     now = datetime.now(timezone.utc)
     offsetted_start_time = now - timedelta(minutes=duration) + time_offset
 
-    # Configure noise based on the noise parameter
-    if noise is None:
-        noise_config = default_noise
-    else:
-        noise_config = NoiseConfig(enable=noise) if noise else NoiseConfig(enable=False)
-
-    generated_data = generate_timeseries(
-        time_config=TimeConfig(
-            series_config=SeriesConfig(
-                start_time=offsetted_start_time,
-                duration=timedelta(minutes=duration),
-                start_value=start_value,
-                end_value=end_value,
-                step=timedelta(minutes=1),
-            ),
-            transition_config=TransitionConfig(
-                transition_window=timedelta(minutes=spike_duration_minutes),
-                start_time=offsetted_start_time + timedelta(minutes=start_spike_minute),
-            ),
-        ),
-        noise_config=noise_config,
-        seasonality_config=SeasonalityConfig(enable=False),
-    )
+    rows = []
+    noise_configs = []
+    for spec in specs:
+        # Configure noise based on the noise parameter
+        noise = spec.get("noise")
+        if noise is None:
+            noise_config = default_noise
+        else:
+            noise_config = (
+                NoiseConfig(enable=noise) if noise else NoiseConfig(enable=False)
+            )
+        noise_configs.append(noise_config)
+
+        rows.append(
+            SeriesRowConfig(
+                start_value=spec["start_value"],
+                end_value=spec["end_value"],
+                transition_config=TransitionConfig(
+                    transition_window=timedelta(minutes=spec["spike_duration_minutes"]),
+                    start_time=offsetted_start_time
+                    + timedelta(minutes=spec["start_spike_minute"]),
+                ),
+                noise_config=noise_config,
+                seasonality_config=SeasonalityConfig(enable=False),
+            )
+        )
 
-    if metric_type == "counter":
-        # For counter metrics, apply cumulative sum to convert gauge values to counter
-        generated_data["y"] = generated_data["y"].cumsum()
-    elif metric_type == "exponential":
-        # For exponential metrics, implement quartic growth pattern to achieve steep upward slope
-        # that will be visible even after rate() calculation in Prometheus
-        # This type ignores end_value parameter
-        spike_start_idx = start_spike_minute
-        spike_end_idx = start_spike_minute + spike_duration_minutes
-
-        # Get the values array
-        y_values = generated_data["y"].values
-
-        # Generate time points for the spike window (0 to spike_duration_minutes)
-        t = np.arange(spike_duration_minutes)
-
-        # Apply quartic growth: y = start_value + coefficient * t^4
-        coefficient = 10000000000.0
-        y_values[spike_start_idx:spike_end_idx] = start_value + coefficient * (t**4)
-
-        # Update the dataframe
-        generated_data["y"] = y_values
-
-    label_map = get_label_map(context, label_string, timedelta(minutes=duration))
-
-    write_timeseries_yaml(
-        context=context,
-        metric_name=metric_name,
-        labels=label_map,
-        generated_data=generated_data,
-        ts_features={
-            "seasonality": False,
-            "trend": f"{start_value} -> {end_value} over {spike_duration_minutes}m (start at {start_spike_minute}m)",
-            "noise": noise_config.enable,
-        },
+    timestamps, values = generate_timeseries_batch(
+        start_time=offsetted_start_time,
+        duration=timedelta(minutes=duration),
+        step=timedelta(minutes=1),
+        rows=rows,
     )
 
-    return GeneratedData(
-        metric_name=metric_name,
-        values=generated_data,
-        labels=label_map,
-    )
+    generated_data_list = []
+    interned_labels = {}
+    for spec, noise_config, row_values in zip(specs, noise_configs, values):
+        metric_name = spec["metric_name"]
+        start_value = spec["start_value"]
+        end_value = spec["end_value"]
+        spike_duration_minutes = spec["spike_duration_minutes"]
+        start_spike_minute = spec["start_spike_minute"]
+        metric_type = spec.get("metric_type", "gauge")
+
+        if metric_type == "counter":
+            # For counter metrics, apply cumulative sum to convert gauge values to counter
+            row_values = row_values.cumsum()
+        elif metric_type == "exponential":
+            # For exponential metrics, implement quartic growth pattern to achieve steep upward slope
+            # that will be visible even after rate() calculation in Prometheus
+            # This type ignores end_value parameter
+            spike_start_idx = start_spike_minute
+            spike_end_idx = start_spike_minute + spike_duration_minutes
+
+            # Generate time points for the spike window (0 to spike_duration_minutes)
+            t = np.arange(spike_duration_minutes)
+
+            # Apply quartic growth: y = start_value + coefficient * t^4
+            coefficient = 10000000000.0
+            row_values[spike_start_idx:spike_end_idx] = start_value + coefficient * (
+                t**4
+            )
+
+        label_map = get_label_map(
+            context, spec["label_string"], timedelta(minutes=duration)
+        )
+        generated_data = GeneratedData(
+            metric_name=metric_name,
+            timestamps=timestamps,
+            values=row_values,
+            labels=intern_labels(label_map, interned_labels),
+        )
+
+        write_timeseries_yaml(
+            context=context,
+            metric_name=metric_name,
+            labels=label_map,
+            generated_data=generated_data,
+            ts_features={
+                "seasonality": False,
+                "trend": f"{start_value} -> {end_value} over {spike_duration_minutes}m (start at {start_spike_minute}m)",
+                "noise": noise_config.enable,
+            },
+        )
+
+        generated_data_list.append(generated_data)
+
+    return generated_data_list
 
 
 def split_data_for_batch_and_live_ingestion(
     synthesized_ts_list: List[GeneratedData], live_duration: int
 ) -> List[List[GeneratedData]]:
-    data_split_index = len(synthesized_ts_list[0].values) - live_duration
+    data_split_index = len(synthesized_ts_list[0]) - live_duration
 
     synthesized_ts_list_for_batch_fill: List[GeneratedData] = []
     synthesized_ts_list_for_live_fill: List[GeneratedData] = []
     for synthesized_ts in synthesized_ts_list:
         if data_split_index != 0:
-            synthesized_ts_list_for_batch_fill.append(
-                GeneratedData(
-                    metric_name=synthesized_ts.metric_name,
-                    values=synthesized_ts.values[:data_split_index],
-                    labels=synthesized_ts.labels,
-                )
-            )
-        synthesized_ts_list_for_live_fill.append(
-            GeneratedData(
-                metric_name=synthesized_ts.metric_name,
-                values=synthesized_ts.values[data_split_index:],
-                labels=synthesized_ts.labels,
-            )
-        )
+            synthesized_ts_list_for_batch_fill.append(synthesized_ts[:data_split_index])
+        synthesized_ts_list_for_live_fill.append(synthesized_ts[data_split_index:])
     return [synthesized_ts_list_for_batch_fill, synthesized_ts_list_for_live_fill]
 
 
@@ -436,16 +547,6 @@ def start_polling(
     return success
 
 
-def get_index_of_metric_object(
-    backfill_data_list: List[BackfillData], generated_data: GeneratedData
-):
-    for i, backfill_data in enumerate(backfill_data_list):
-        if backfill_data.metric_name == generated_data.metric_name:
-            return i
-    # No exisiting object found
-    return -1
-
-
 # Re-export for backward compatibility
 format_device_labels = format_labels
 
@@ -459,10 +560,12 @@ def write_timeseries_yaml(
     context,
     metric_name: str,
     labels: dict,
-    generated_data,
+    generated_data: GeneratedData,
     ts_features: dict,
 ):
     """Write generated timeseries to a YAML file under outputs/<feature>/<scenario>/."""
+    import yaml
+
     feature_name = getattr(context, "feature_name", "unknown_feature")
     scenario_enum = getattr(context, "scenario", ScenarioEnum.UNKNOWN_SCENARIO)
 
@@ -476,8 +579,8 @@ def write_timeseries_yaml(
     filename = f"{scenario_enum.name}_{metric_name}_{short_hash}.yaml"
     filepath = os.path.join(output_dir, filename)
 
-    timestamps = generated_data["ds"].tolist()
-    values = generated_data["y"].tolist()
+    timestamps = generated_data.timestamps.tolist()
+    values = generated_data.values.tolist()
 
     doc = {
         "metric": metric_name,
@@ -501,30 +604,28 @@ def write_timeseries_yaml(
 def convert_to_backfill_data(
     generated_data_list: List[GeneratedData],
 ) -> List[BackfillData]:
-    backfill_data_list: List[BackfillData] = []
+    # Dicts keep insertion order, so blocks come out in first-seen metric order
+    backfill_data_by_metric: Dict[str, BackfillData] = {}
     for generated_data in generated_data_list:
-        update_index = get_index_of_metric_object(backfill_data_list, generated_data)
-
         series = Series(
             labels=format_device_labels(generated_data.labels),
-            value=generated_data.values["y"].tolist(),
-            timestamp=generated_data.values["ds"].astype(int).tolist(),
+            value=generated_data.values,
+            timestamp=generated_data.timestamps,
         )
 
-        if update_index != -1:
+        backfill_data = backfill_data_by_metric.get(generated_data.metric_name)
+        if backfill_data is not None:
             # update existing block
-            backfill_data_list[update_index].series.append(series)
+            backfill_data.series.append(series)
         else:
             # add a new block
-            backfill_data_list.append(
-                BackfillData(
-                    metric_name=generated_data.metric_name,
-                    series=[series],
-                    description="Test Backfill Data",
-                )
+            backfill_data_by_metric[generated_data.metric_name] = BackfillData(
+                metric_name=generated_data.metric_name,
+                series=[series],
+                description="Test Backfill Data",
             )
 
-    return backfill_data_list
+    return list(backfill_data_by_metric.values())
 
 
 def compute_onboard_status_ignoring_fmc_export(response):
@@ -3,207 +3,62 @@
 import argparse
 import logging
 import os
-import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
-import requests
-from darts.utils.timeseries_generation import (
-    linear_timeseries,
-    sine_timeseries,
-)
-from dotenv import load_dotenv
-from jinja2 import Template
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from features.steps.env import get_base_url
-from shared.label_utils import format_labels, parse_labels
-from shared.step_utils import parse_step_to_minutes
+from shared.backfill_pipeline import (
+    BackfillError,
+    BackfillManifest,
+    ManifestMetric,
+    PhaseTimer,
+    backfill,
+    generate_manifest_series,
+    get_remote_write_config,
+    load_manifest,
+)
+from shared.promtool_blocks import DEFAULT_PROMTOOL_WORKERS
+from shared.retry import DEFAULT_MAX_WORKERS
 
 logging.basicConfig(
     level=logging.INFO,
     format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
 )
 
-TEMPLATE = Template(
-    """# HELP {{ metric_name }} {{ description }}
-# TYPE {{ metric_name }} gauge
-{% for i in range(values|length) -%}
-{{ metric_name }}{{ "{" }}{{ labels }}{{ "}" }} {{ values[i] }} {{ timestamps[i] }}
-{% endfor -%}
-"""
-)
-
-
-def generate_timeseries(
-    start_time, end_time, trend_coefficient, granularity_minutes=15, flat_base=5
-):
-    """Generate timeseries with specified trend coefficient and default seasonality/noise."""
-    start_ts = pd.Timestamp(start_time)
-    total_minutes = int((end_time - start_time).total_seconds() / 60)
-    total_points = total_minutes // granularity_minutes
-    freq = f"{granularity_minutes * 60}s"
-
-    # Trend component (coefficient per hour)
-    total_hours = total_minutes / 60
-    end_trend_value = flat_base + trend_coefficient * total_hours
-    trend = linear_timeseries(
-        start_value=flat_base,
-        end_value=end_trend_value,
-        start=start_ts,
-        length=total_points,
-        freq=freq,
-    )
-
-    # Seasonality component (daily sinusoidal approximation)
-    steps_per_day = int(24 * 60 / granularity_minutes)
-    seasonality = sine_timeseries(
-        value_frequency=1.0 / steps_per_day,
-        value_amplitude=9.25,
-        value_y_offset=10.25,
-        value_phase=np.pi,
-        start=start_ts,
-        length=total_points,
-        freq=freq,
-    )
-
-    combined = trend + seasonality
-    pdf = combined.pd_dataframe()
-    ts_values = pdf.iloc[:, 0].values
-    time_points = list(pdf.index.to_pydatetime())
-    return ts_values, time_points
-
-
-def get_remote_write_config(env):
-    """Fetch remote write configuration from GCM."""
-    load_dotenv()
-
-    cdo_token = os.getenv("CDO_TOKEN")
-    if not cdo_token:
-        raise ValueError("CDO_TOKEN environment variable not set in .env file")
-
-    base_url = get_base_url(env)
-    gcm_stack_url = (
-        f"{base_url}/api/platform/ai-ops-tenant-services/v2/timeseries-stack"
-    )
-
-    logging.info(f"Fetching GCM stack configuration from {gcm_stack_url}")
-
-    retry = Retry(
-        total=3,
-        backoff_factor=2,
-        status_forcelist=[i for i in range(400, 600)],
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session = requests.Session()
-    session.mount("https://", adapter)
-
-    response = session.get(
-        gcm_stack_url,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {cdo_token}",
-        },
-        timeout=180,
-    )
-
-    if response.status_code != 200:
-        raise Exception(
-            f"Failed to fetch GCM config: {response.status_code} - {response.text}"
-        )
-
-    gcm_stack_config = response.json()
-
-    return {
-        "url": gcm_stack_config["hmInstancePromUrl"].removesuffix("/api/prom/push"),
-        "username": gcm_stack_config["hmInstancePromId"],
-        "password": gcm_stack_config["prometheusToken"],
-    }
-
-
-def write_openmetrics_file(
-    metric_name, labels_str, values, timestamps, output_file, description
-):
-    """Write timeseries data to OpenMetrics format file."""
-    content = TEMPLATE.render(
-        metric_name=metric_name,
-        labels=labels_str,
-        values=values,
-        timestamps=timestamps,
-        description=description,
-    )
-
-    with open(output_file, "w") as f:
-        f.write(content)
-        f.write("# EOF\n")
-
-    logging.info(f"Wrote {len(values)} datapoints to {output_file}")
-
-
-def run_backfill(remote_write_config, utils_dir, data_block_dir, historical_data_file):
-    """Execute backfill.sh script to upload data to Prometheus."""
-    backfill_script = os.path.join(utils_dir, "backfill.sh")
-
-    if not os.path.exists(backfill_script):
-        raise FileNotFoundError(f"backfill.sh not found at {backfill_script}")
-
-    cmd = [
-        backfill_script,
-        remote_write_config["url"],
-        remote_write_config["username"],
-        remote_write_config["password"],
-        utils_dir,
-        data_block_dir,
-        historical_data_file,
-    ]
-
-    logging.info(f"Running backfill command: {' '.join(cmd)}")
-    logging.info("=" * 80)
-
-    # Run without capturing output so logs stream in real-time
-    result = subprocess.run(cmd)
-
-    logging.info("=" * 80)
-
-    if result.returncode != 0:
-        logging.error(f"Backfill failed with return code {result.returncode}")
-        sys.exit(1)
-
-    logging.info("Backfill completed successfully")
-
 
 def main():
     parser = argparse.ArgumentParser(
         description="Backfill metrics to Prometheus with generated timeseries data"
     )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="YAML or JSON file listing many metrics, label sets and signal "
+        "settings to backfill in one run (replaces --metric-name and --labels)",
+    )
     parser.add_argument(
         "--metric-name",
-        required=True,
         help="Name of the metric (e.g., 'vpn', 'cpu', 'memory')",
     )
     parser.add_argument(
         "--labels",
-        required=True,
         help="Label key-value pairs in format 'key1=value1,key2=value2'",
     )
     parser.add_argument(
         "--start-epoch",
         type=int,
-        required=True,
-        help="Backfill start time as Unix epoch timestamp",
+        help="Backfill start time as Unix epoch timestamp "
+        "(required unless set in the manifest)",
     )
     parser.add_argument(
         "--end-epoch",
         type=int,
-        required=True,
-        help="Backfill end time as Unix epoch timestamp",
+        help="Backfill end time as Unix epoch timestamp "
+        "(required unless set in the manifest)",
     )
     parser.add_argument(
         "--trend-coefficient",
@@ -232,6 +87,35 @@ def main():
         default=None,
         help="Output directory for generated files (default: project utils directory)",
     )
+    parser.add_argument(
+        "--block-writer",
+        choices=["native", "promtool", "promtool-stream"],
+        default="promtool",
+        help="How TSDB blocks are built: 'promtool' writes an OpenMetrics file for "
+        "promtool tsdb create-blocks-from, 'promtool-stream' feeds promtool "
+        "time-sharded files while generating, 'native' writes them directly "
+        "(opt-in, not yet checked against promtool or Mimir; default: promtool)",
+    )
+    parser.add_argument(
+        "--promtool-workers",
+        type=int,
+        default=DEFAULT_PROMTOOL_WORKERS,
+        help="promtool processes building time shards in parallel with "
+        f"--block-writer promtool-stream (default: {DEFAULT_PROMTOOL_WORKERS})",
+    )
+    parser.add_argument(
+        "--upload-backend",
+        choices=["mimirtool", "http"],
+        default="mimirtool",
+        help="How native blocks are uploaded: 'mimirtool' per block or 'http' via "
+        "the block upload API (default: mimirtool)",
+    )
+    parser.add_argument(
+        "--upload-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Blocks uploaded concurrently (default: {DEFAULT_MAX_WORKERS})",
+    )
     parser.add_argument(
         "--env",
         default="staging",
@@ -239,59 +123,82 @@ def main():
     )
 
     args = parser.parse_args()
+    timer = PhaseTimer()
+
+    if args.manifest:
+        with timer.phase("load manifest", args.manifest):
+            manifest = load_manifest(args.manifest)
+        name = Path(args.manifest).stem
+    else:
+        if not args.metric_name or not args.labels:
+            parser.error("--metric-name and --labels are required without --manifest")
+        manifest = BackfillManifest(
+            trend_coefficient=args.trend_coefficient,
+            flat_base=args.flat_base,
+            step_size=args.step_size,
+            description=args.description,
+            metrics=[ManifestMetric(metric_name=args.metric_name, labels=args.labels)],
+        )
+        name = args.metric_name
 
-    # Parse step size
-    try:
-        step_size_minutes = parse_step_to_minutes(args.step_size)
-    except ValueError as e:
-        logging.error(f"Invalid step-size: {e}")
-        sys.exit(1)
+    # Command line times override the manifest's
+    start_epoch = (
+        args.start_epoch if args.start_epoch is not None else manifest.start_epoch
+    )
+    end_epoch = args.end_epoch if args.end_epoch is not None else manifest.end_epoch
+    if start_epoch is None or end_epoch is None:
+        parser.error("--start-epoch and --end-epoch are required")
 
-    start_time = datetime.fromtimestamp(args.start_epoch)
-    end_time = datetime.fromtimestamp(args.end_epoch)
+    start_time = datetime.fromtimestamp(start_epoch)
+    end_time = datetime.fromtimestamp(end_epoch)
 
     if start_time >= end_time:
         logging.error("Start time must be before end time")
         sys.exit(1)
 
     logging.info(f"Generating timeseries from {start_time} to {end_time}")
-    logging.info(f"Metric: {args.metric_name}")
-    logging.info(f"Labels: {args.labels}")
-    logging.info(f"Trend coefficient: {args.trend_coefficient}")
-    logging.info(f"Flat base: {args.flat_base}")
-    logging.info(f"Step size: {step_size_minutes} minutes")
-
-    labels_dict = parse_labels(args.labels)
-    labels_str = format_labels(labels_dict)
-
-    ts_values, time_points = generate_timeseries(
-        start_time, end_time, args.trend_coefficient, step_size_minutes, args.flat_base
-    )
+    for metric in manifest.metrics:
+        logging.info(
+            f"Metric: {metric.metric_name}, {len(metric.label_dicts())} label set(s)"
+        )
 
-    timestamps = [int(tp.timestamp()) for tp in time_points]
+    with timer.phase("generate") as info:
+        try:
+            series_list = generate_manifest_series(manifest, start_time, end_time)
+        except ValueError as e:
+            logging.error(f"Invalid step-size: {e}")
+            sys.exit(1)
+        datapoints = sum(len(series.values) for series in series_list)
+        info["detail"] = f"{len(series_list)} series, {datapoints} datapoints"
 
     utils_dir = (
         args.output_dir if args.output_dir else os.path.join(project_root, "utils")
     )
-    historical_data_file = f"{args.metric_name}_backfill_{args.start_epoch}.txt"
-    data_block_dir = f"/{args.metric_name}_backfill_data/"
-
-    output_file = os.path.join(utils_dir, historical_data_file)
-
-    write_openmetrics_file(
-        args.metric_name,
-        labels_str,
-        ts_values,
-        timestamps,
-        output_file,
-        args.description,
-    )
 
-    logging.info(f"Environment: {args.env}")
-    logging.info("Fetching remote write configuration...")
-    remote_write_config = get_remote_write_config(args.env)
-
-    run_backfill(remote_write_config, utils_dir, data_block_dir, historical_data_file)
+    try:
+        logging.info(f"Environment: {args.env}")
+        logging.info("Fetching remote write configuration...")
+        with timer.phase("fetch config", args.env):
+            remote_write_config = get_remote_write_config(get_base_url(args.env))
+
+        backfill(
+            series_list,
+            remote_write_config,
+            utils_dir,
+            name,
+            start_epoch,
+            block_writer=args.block_writer,
+            upload_backend=args.upload_backend,
+            upload_workers=args.upload_workers,
+            promtool_workers=args.promtool_workers,
+            timer=timer,
+        )
+    except BackfillError as e:
+        logging.error(f"Backfill failed: {e}")
+        sys.exit(1)
+    finally:
+        # Also on failure, to show where the time went
+        timer.log_table()
 
     logging.info("Backfill process completed successfully!")
 
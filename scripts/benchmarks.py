@@ -0,0 +1,2037 @@
+#!/usr/bin/env python3
+"""
+Benchmarks and equivalence checks for the data generation pipeline.
+
+Sub-commands:
+  generator - Compare the NumPy time_series_generator engine against the former
+              Darts implementation: values must match for the same np.random seed
+              and timestamps must match after flooring to whole seconds. Every
+              streamed chunk must also be identical when generated on its own.
+  openmetrics - Compare the streaming OpenMetrics writer against the former
+              per-index Jinja render of backfill_generated_data: both files
+              must contain the same samples.
+  tsdb-blocks - Write TSDB blocks natively, read them back and check every
+              sample round-trips bit for bit; times the writer against the
+              OpenMetrics text file the promtool path has to write first.
+  block-upload - Upload native blocks to a local stub of Mimir's block upload
+              API that fails some requests; checks every block arrives intact,
+              that a rerun resumes from the progress file, and compares
+              sequential with concurrent throughput.
+  validator - Validate a large OpenMetrics file and time it, then check that
+              a NaN, a duplicate and an out-of-order timestamp and an
+              unescaped quote injected into copies are reported on their line.
+  remote-write - Build the snappy-compressed WriteRequest of one batch through
+              OpenTelemetry data points and the remote-write exporter, and
+              with the NumPy encoder; the payloads must be identical. Live
+              ticks sent through instant_remote_write_all to the stub
+              remote-write endpoint must all have the same size and carry
+              only the latest sample of each series.
+  planner - Plan a mix of old, hybrid and recent series and check the forced
+              split at the append window, the count of block samples newer
+              than query_store_after, the BLOCKS and REMOTE_WRITE overrides
+              and the ValueError for old samples forced onto remote write.
+  promtool-stream - Build blocks through create_blocks_streamed with a stub
+              promtool that records the shard files on disk and writes a
+              meta.json per shard; checks every sample lands in a block, the
+              bounded queue keeps at most 2 * workers + 1 shard files on
+              disk, the files are cleaned up, and a failing shard stops the
+              run. Compares one promtool process with several.
+  shard-validation - Feed validate_shard_blocks and validate_blocks shard
+              metas that reach outside their shard, miss samples or overlap a
+              neighbour; each must raise ShardValidationError, and adjacent
+              complete shards must pass.
+  tick-scheduler - Run run_ticks on a fake clock whose ticks take request
+              time; an aligned first tick must wait for the aligned
+              wall-clock second, an unaligned one must fire at once, a tick slower than the interval must only delay the
+              next one, and every later tick must fire on its original
+              deadline.
+  anomaly-injection - Compare inject_spikes with the former generate_spikes
+              loop for the pattern anomaly.py uses, check the other injectors
+              against per-sample loops, and time spikes against the loop.
+  remote-write-batches - Send a backlog through send_series to a local
+              stub remote-write endpoint that fails some requests and rejects
+              out-of-order samples; checks every request stays within
+              max_samples and max_bytes, every series arrives complete and in
+              order, only the failed chunks are sent again, and a rejected
+              chunk skips only the rest of its own series.
+  remote-write-client - Post to the stub remote-write endpoint through
+              RemoteWriteClient and through bare requests.post; the client
+              must open one connection for sequential requests and at most
+              one per thread for concurrent ones, and a 429 must wait for its
+              Retry-After, given in seconds or as an HTTP date, capped at
+              MAX_BACKOFF_SECONDS.
+  generator-parallel - Generate one batch with generate_timeseries_parallel
+              in-process and across process pools of several sizes, also with
+              an uneven rows_per_task; the values must be identical, and
+              different seeds must give different noise.
+  missing-data - Compare build_missing_mask with the former per-window
+              generate_missing_data loop for overlapping probability windows
+              under the same np.random seed, check that outages
+              (miss_probability 1.0, the default) are exact ranges that draw
+              no random numbers, and time both.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from features.steps.anomaly_injection import (
+    inject_dropouts,
+    inject_level_shift,
+    inject_ramp,
+    inject_spikes,
+    inject_square_wave,
+    random_burst_mask,
+)
+from features.steps.time_series_generator import (
+    PARALLEL_MIN_SAMPLES,
+    MissingDataConfig,
+    NoiseConfig,
+    SeasonalityConfig,
+    SeriesConfig,
+    SeriesRowConfig,
+    TimeConfig,
+    TransitionConfig,
+    build_missing_mask,
+    generate_timeseries_arrays,
+    generate_timeseries_batch,
+    generate_timeseries_chunk,
+    generate_timeseries_parallel,
+    iter_timeseries_chunks,
+)
+from shared.openmetrics import (
+    OpenMetricsFamily,
+    OpenMetricsSeries,
+    write_openmetrics_file,
+)
+from shared.openmetrics_validator import (
+    OpenMetricsValidationError,
+    expected_sample_counts,
+    validate_openmetrics_file,
+)
+from shared.remote_write import (
+    REMOTE_WRITE_HEADERS,
+    RemoteWriteSeries,
+    build_write_request,
+    prometheus_labels,
+)
+from shared.remote_write_batches import plan_chunks, send_series
+from shared.remote_write_client import (
+    RemoteWriteClient,
+    RemoteWriteError,
+    parse_retry_after,
+)
+from shared.retry import MAX_BACKOFF_SECONDS
+from shared.ingestion_planner import (
+    BLOCKS,
+    DEFAULT_SAFETY_MARGIN,
+    HEAD_APPEND_WINDOW,
+    HYBRID,
+    QUERY_STORE_AFTER,
+    REMOTE_WRITE,
+    log_plan,
+    plan_ingestion,
+)
+from shared.block_uploader import (
+    HttpBackend,
+    block_files,
+    list_blocks,
+    read_progress,
+    upload_block,
+    upload_blocks,
+)
+from shared.promtool_blocks import (
+    DEFAULT_SHARD_DURATION,
+    PromtoolError,
+    ShardValidationError,
+    create_blocks_streamed,
+    time_shards,
+    validate_blocks,
+    validate_shard_blocks,
+)
+from shared.tick_scheduler import (
+    DEFAULT_TICK_OFFSET_SECONDS,
+    run_ticks,
+    seconds_until_aligned,
+)
+from shared.tsdb_blocks import BlockSeries, read_block, read_meta, write_blocks
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
+)
+
+
+def _timed(fn, repeat):
+    """Run fn `repeat` times and return (best wall time in seconds, last result)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def darts_reference_timeseries(time_config, noise_config, seasonality_config):
+    """The Darts-based generate_timeseries that the NumPy engine replaced.
+
+    Kept here verbatim (minus missing-data handling) as the reference for the
+    equivalence check.
+    """
+    import pandas as pd
+    from darts.utils.timeseries_generation import (
+        constant_timeseries,
+        gaussian_timeseries,
+        linear_timeseries,
+        sine_timeseries,
+    )
+
+    series_config = time_config.series_config
+    transition_config = time_config.transition_config
+    start_time = pd.Timestamp(series_config.start_time).tz_localize(None)
+    freq_str = f"{int(series_config.step.total_seconds())}s"
+    total_points = int(series_config.duration / series_config.step)
+
+    if transition_config is None:
+        base_signal = constant_timeseries(
+            value=series_config.end_value,
+            start=start_time,
+            length=total_points,
+            freq=freq_str,
+            column_name="value",
+        )
+    else:
+        transition_start = pd.Timestamp(transition_config.start_time).tz_localize(None)
+        pre_points = max(0, int((transition_start - start_time) / series_config.step))
+        transition_points = max(
+            1, int(transition_config.transition_window / series_config.step)
+        )
+        post_points = max(0, total_points - pre_points - transition_points)
+
+        segments = []
+        if pre_points > 0:
+            segments.append(
+                constant_timeseries(
+                    value=series_config.start_value,
+                    start=start_time,
+                    length=pre_points,
+                    freq=freq_str,
+                    column_name="value",
+                )
+            )
+        trans_start_ts = start_time + pre_points * series_config.step
+        segments.append(
+            linear_timeseries(
+                start_value=series_config.start_value,
+                end_value=series_config.end_value,
+                start=trans_start_ts,
+                length=transition_points,
+                freq=freq_str,
+                column_name="value",
+            )
+        )
+        if post_points > 0:
+            segments.append(
+                constant_timeseries(
+                    value=series_config.end_value,
+                    start=trans_start_ts + transition_points * series_config.step,
+                    length=post_points,
+                    freq=freq_str,
+                    column_name="value",
+                )
+            )
+        base_signal = segments[0]
+        for seg in segments[1:]:
+            base_signal = base_signal.concatenate(seg, ignore_time_axis=True)
+
+    time_index = base_signal.time_index.tz_localize("UTC")
+    values = base_signal.values().flatten()
+
+    if seasonality_config.enable:
+        period_in_steps = seasonality_config.period / series_config.step
+        seasonality_ts = sine_timeseries(
+            value_frequency=1.0 / period_in_steps,
+            value_amplitude=seasonality_config.amplitude,
+            value_y_offset=0,
+            start=start_time,
+            length=total_points,
+            freq=freq_str,
+        )
+        values = values + seasonality_ts.values().flatten()
+
+    if noise_config.enable:
+        noise_ts = gaussian_timeseries(
+            mean=noise_config.mean,
+            std=noise_config.std,
+            start=start_time,
+            length=total_points,
+            freq=freq_str,
+        )
+        values = values + noise_ts.values().flatten()
+
+    timestamps = [t.timestamp() for t in time_index]
+    return np.array(timestamps), values
+
+
+def benchmark_generator(args):
+    """Check NumPy/Darts equivalence and report the speedup."""
+    start_time = datetime.now(timezone.utc) - timedelta(hours=args.hours)
+    time_config = TimeConfig(
+        series_config=SeriesConfig(
+            start_value=15.25,
+            end_value=60.72,
+            start_time=start_time,
+            duration=timedelta(hours=args.hours),
+        ),
+        transition_config=TransitionConfig(
+            start_time=start_time + timedelta(minutes=30),
+            transition_window=timedelta(hours=args.hours // 2),
+        ),
+    )
+    noise_config = NoiseConfig(enable=True, mean=0, std=2)
+    seasonality_config = SeasonalityConfig(
+        enable=True, amplitude=9.25, period=timedelta(hours=24)
+    )
+
+    def run_darts():
+        np.random.seed(args.seed)
+        return darts_reference_timeseries(time_config, noise_config, seasonality_config)
+
+    def run_numpy():
+        np.random.seed(args.seed)
+        return generate_timeseries_arrays(time_config, noise_config, seasonality_config)
+
+    darts_time, (darts_ts, darts_values) = _timed(run_darts, args.repeat)
+    numpy_time, (numpy_ts, numpy_values) = _timed(run_numpy, args.repeat)
+
+    assert numpy_ts.dtype == np.int64 and numpy_values.dtype == np.float64
+    np.testing.assert_array_equal(numpy_ts, np.floor(darts_ts).astype(np.int64))
+    # np.sin and math.sin may differ in the last ulp, everything else is exact
+    np.testing.assert_allclose(numpy_values, darts_values, rtol=1e-12, atol=1e-9)
+
+    # Chunk k must not depend on whether chunks 0..k-1 were materialized
+    rows = [
+        SeriesRowConfig(
+            start_value=15.25,
+            end_value=60.72,
+            transition_config=time_config.transition_config,
+            noise_config=noise_config,
+            seasonality_config=seasonality_config,
+        ),
+        SeriesRowConfig(start_value=3.0, end_value=3.0),
+    ]
+    chunk_args = (start_time, timedelta(hours=args.hours), timedelta(minutes=1), rows)
+    chunks = list(iter_timeseries_chunks(*chunk_args, seed=args.seed))
+    for chunk_index in reversed(range(len(chunks))):
+        alone = generate_timeseries_chunk(*chunk_args, chunk_index, seed=args.seed)
+        np.testing.assert_array_equal(alone[0], chunks[chunk_index][0])
+        np.testing.assert_array_equal(alone[1], chunks[chunk_index][1])
+    np.testing.assert_array_equal(
+        np.concatenate([timestamps for timestamps, _ in chunks]), numpy_ts
+    )
+    # Without noise the chunks are slices of the whole batch
+    quiet_rows = [
+        row.model_copy(update={"noise_config": NoiseConfig(enable=False)})
+        for row in rows
+    ]
+    quiet_args = (*chunk_args[:3], quiet_rows)
+    np.testing.assert_allclose(
+        np.concatenate(
+            [values for _, values in iter_timeseries_chunks(*quiet_args)], axis=1
+        ),
+        generate_timeseries_batch(*quiet_args)[1],
+        rtol=1e-12,
+    )
+
+    logging.info(f"Points per series: {len(numpy_values)}")
+    logging.info("Equivalence check passed")
+    logging.info(f"{len(chunks)} chunks match when generated on their own")
+    logging.info(f"Darts: {darts_time * 1000:.1f} ms")
+    logging.info(f"NumPy: {numpy_time * 1000:.1f} ms")
+    logging.info(f"Speedup: {darts_time / numpy_time:.1f}x")
+
+
+LEGACY_BACKFILL_TEMPLATE = """{%- for backfill_data in backfill_data_list %}
+# HELP {{backfill_data.metric_name}} {{backfill_data.description}}
+# TYPE {{backfill_data.metric_name}} gauge
+{% for series in backfill_data.series %}
+{{backfill_data.metric_name}}{{ "{" }}{{  series.labels }}{{ "}" }} {{ series.value[index] }} {{ series.timestamp[index] }}
+{%- endfor -%}
+{% endfor %}
+"""
+
+
+def legacy_write_backfill_file(backfill_data_list, path):
+    """The per-index template render that backfill_generated_data used to do."""
+    from jinja2 import Template
+
+    t = Template(LEGACY_BACKFILL_TEMPLATE)
+    file_text = ""
+    with open(path, "w") as file:
+        for i in range(len(backfill_data_list[0].series[0].value)):
+            multiline_text = t.render(backfill_data_list=backfill_data_list, index=i)
+            file_text += multiline_text
+
+        # remove all empty lines
+        output_lines = [line for line in file_text.splitlines() if line.strip()]
+        file_text = "\n".join(output_lines)
+
+        file.write(file_text)
+        file.write("\n# EOF")
+
+
+def _sample_lines(path):
+    with open(path) as f:
+        return sorted(line for line in f.read().splitlines() if line[:1] not in "#")
+
+
+def benchmark_openmetrics(args):
+    """Check both writers produce the same samples and report the speedup."""
+    rng = np.random.default_rng(args.seed)
+    timestamps = 1_700_000_000 + 60 * np.arange(args.points, dtype=np.int64)
+    backfill_data_list = [
+        SimpleNamespace(
+            metric_name=f"metric_{m}",
+            description="Test Backfill Data",
+            series=[
+                SimpleNamespace(
+                    labels=f'tenant_uuid="t",uuid="device-{s}"',
+                    value=rng.normal(50, 10, args.points),
+                    timestamp=timestamps,
+                )
+                for s in range(args.series)
+            ],
+        )
+        for m in range(args.metrics)
+    ]
+    families = [
+        OpenMetricsFamily(
+            metric_name=data.metric_name,
+            description=data.description,
+            series=[
+                OpenMetricsSeries(series.labels, series.timestamp, series.value)
+                for series in data.series
+            ],
+        )
+        for data in backfill_data_list
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, "legacy.txt")
+        streaming_path = os.path.join(tmp_dir, "streaming.txt")
+
+        legacy_time, _ = _timed(
+            lambda: legacy_write_backfill_file(backfill_data_list, legacy_path), 1
+        )
+        streaming_time, _ = _timed(
+            lambda: write_openmetrics_file(streaming_path, families, order=args.order),
+            args.repeat,
+        )
+        assert _sample_lines(legacy_path) == _sample_lines(streaming_path)
+        size_mb = os.path.getsize(streaming_path) / 1e6
+
+    samples = args.metrics * args.series * args.points
+    logging.info(f"Samples: {samples} ({size_mb:.1f} MB)")
+    logging.info("Equivalence check passed")
+    logging.info(f"Jinja template: {legacy_time * 1000:.1f} ms")
+    logging.info(
+        f"Streaming writer ({args.order}-major): {streaming_time * 1000:.1f} ms"
+    )
+    logging.info(f"Speedup: {legacy_time / streaming_time:.1f}x")
+
+
+def _directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def benchmark_tsdb_blocks(args):
+    """Check native blocks round-trip every sample and time the block writer."""
+    rng = np.random.default_rng(args.seed)
+    timestamps = 1_700_000_000 + 60 * np.arange(args.points, dtype=np.int64)
+    series = [
+        BlockSeries(
+            labels={
+                "__name__": f"metric_{m}",
+                "tenant_uuid": "t",
+                "uuid": f"device-{s}",
+            },
+            timestamps=timestamps * 1000,
+            values=np.round(rng.normal(50, 10, args.points), 2),
+        )
+        for m in range(args.metrics)
+        for s in range(args.series)
+    ]
+    families = [
+        OpenMetricsFamily(
+            metric_name=f"metric_{m}",
+            description="Test Backfill Data",
+            series=[
+                OpenMetricsSeries(
+                    f'tenant_uuid="t",uuid="device-{s}"',
+                    timestamps,
+                    series[m * args.series + s].values,
+                )
+                for s in range(args.series)
+            ],
+        )
+        for m in range(args.metrics)
+    ]
+    block_duration = timedelta(hours=args.block_hours)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        text_path = os.path.join(tmp_dir, "backfill.txt")
+        text_time, _ = _timed(
+            lambda: write_openmetrics_file(text_path, families), args.repeat
+        )
+        text_mb = os.path.getsize(text_path) / 1e6
+
+        def write():
+            block_dir = tempfile.mkdtemp(dir=tmp_dir)
+            return block_dir, write_blocks(block_dir, series, block_duration)
+
+        block_time, (block_dir, ulids) = _timed(write, args.repeat)
+        block_mb = _directory_size(block_dir) / 1e6
+
+        expected = {tuple(sorted(s.labels.items())): s for s in series}
+        decoded = {}
+        for ulid in ulids:
+            for s in read_block(os.path.join(block_dir, ulid)):
+                decoded.setdefault(tuple(sorted(s.labels.items())), []).append(s)
+        assert decoded.keys() == expected.keys()
+        for key, parts in decoded.items():
+            assert np.array_equal(
+                np.concatenate([p.timestamps for p in parts]),
+                expected[key].timestamps,
+            )
+            assert np.array_equal(
+                np.concatenate([p.values for p in parts]).view(np.uint64),
+                np.asarray(expected[key].values).view(np.uint64),
+            )
+
+    samples = args.metrics * args.series * args.points
+    logging.info(f"Samples: {samples} in {len(ulids)} blocks of {args.block_hours}h")
+    logging.info("Round-trip check passed")
+    logging.info(f"OpenMetrics text file: {text_time * 1000:.1f} ms ({text_mb:.1f} MB)")
+    logging.info(f"Native TSDB blocks: {block_time * 1000:.1f} ms ({block_mb:.1f} MB)")
+    logging.info(
+        f"Block bytes per sample: {block_mb * 1e6 / samples:.2f} "
+        "(promtool create-blocks-from would still have to parse the text file)"
+    )
+
+
+class StubUploadServer(ThreadingHTTPServer):
+    """In-memory stand-in for Mimir's block upload API.
+
+    Every ``fail_every``-th request is answered with 503 and every request
+    sleeps ``latency`` seconds, so retries and concurrency are exercised.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, fail_every=0):
+        super().__init__(("127.0.0.1", 0), StubUploadHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.metas = {}
+        self.files = {}
+        self.complete = set()
+
+    @property
+    def address(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StubUploadHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            if server.fail_every and server.requests % server.fail_every == 0:
+                server.failures += 1
+                return self._reply(503, b"injected failure")
+
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[:4] != ["api", "v1", "upload", "block"] or len(parts) != 6:
+            return self._reply(404)
+        ulid, action = parts[4], parts[5]
+        with server.lock:
+            if action == "start":
+                if ulid in server.complete:
+                    return self._reply(409, b"block already exists")
+                server.metas[ulid] = json.loads(body)
+                server.files[ulid] = {}
+            elif action == "files":
+                server.files[ulid][parse_qs(url.query)["path"][0]] = body
+            elif action == "finish":
+                expected = {
+                    f["rel_path"]: f["size_bytes"]
+                    for f in server.metas[ulid]["thanos"]["files"]
+                }
+                received = {
+                    path: len(data) for path, data in server.files[ulid].items()
+                }
+                if expected != received:
+                    return self._reply(400, b"missing or truncated files")
+                server.complete.add(ulid)
+            elif action == "check":
+                result = "complete" if ulid in server.complete else "uploading"
+                return self._reply(200, json.dumps({"result": result}).encode())
+            else:
+                return self._reply(404)
+        self._reply(200)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def _write_upload_blocks(block_dir, args):
+    rng = np.random.default_rng(args.seed)
+    timestamps = 1_700_000_000_000 + 60_000 * np.arange(args.points, dtype=np.int64)
+    series = [
+        BlockSeries(
+            labels={"__name__": "metric", "uuid": f"device-{s}"},
+            timestamps=timestamps,
+            values=np.round(rng.normal(50, 10, args.points), 2),
+        )
+        for s in range(args.series)
+    ]
+    return write_blocks(block_dir, series, timedelta(hours=args.block_hours))
+
+
+def benchmark_block_upload(args):
+    """Upload blocks to a flaky local stub sequentially and concurrently."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        block_dir = os.path.join(tmp_dir, "blocks")
+        ulids = _write_upload_blocks(block_dir, args)
+
+        timings = {}
+        for workers in (1, args.workers):
+            server = StubUploadServer(args.latency_ms / 1000, args.fail_every)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            backend = HttpBackend(server.address, "tenant", "key", check_interval=0.01)
+            progress_file = os.path.join(tmp_dir, f"progress-{workers}.txt")
+            try:
+                # Simulate an interrupted run: half the blocks are already done
+                resumed = ulids[: len(ulids) // 2]
+                for ulid in resumed:
+                    upload_block(backend, os.path.join(block_dir, ulid), backoff=0.01)
+                with open(progress_file, "w") as f:
+                    f.writelines(ulid + "\n" for ulid in resumed)
+                requests_before = server.requests
+                failures_before = server.failures
+
+                summary = upload_blocks(
+                    block_dir,
+                    backend,
+                    max_workers=workers,
+                    backoff=0.01,
+                    progress_file=progress_file,
+                )
+            finally:
+                server.shutdown()
+                server.server_close()
+
+            assert summary.ok, summary.failed
+            assert sorted(summary.skipped) == sorted(resumed)
+            assert read_progress(progress_file) == set(list_blocks(block_dir))
+            assert server.complete == set(ulids)
+            for ulid in ulids:
+                for rel_path in block_files(os.path.join(block_dir, ulid)):
+                    with open(os.path.join(block_dir, ulid, rel_path), "rb") as f:
+                        assert server.files[ulid][rel_path] == f.read()
+            timings[workers] = summary
+            logging.info(
+                f"{workers} worker(s): {len(summary.uploaded)} blocks in "
+                f"{summary.seconds:.2f}s with {server.requests - requests_before} "
+                f"requests, {server.failures - failures_before} injected failures"
+            )
+
+    logging.info("Upload and resume checks passed")
+    logging.info(
+        f"Speedup with {args.workers} workers: "
+        f"{timings[1].seconds / timings[args.workers].seconds:.1f}x"
+    )
+
+
+def benchmark_validator(args):
+    """Time the validator on a large file and check it finds injected errors."""
+    rng = np.random.default_rng(args.seed)
+    timestamps = 1_700_000_000 + 60 * np.arange(args.points, dtype=np.int64)
+    families = [
+        OpenMetricsFamily(
+            metric_name=f"metric_{m}",
+            description="Test Backfill Data",
+            series=[
+                OpenMetricsSeries(
+                    f'tenant_uuid="t",uuid="device-{s}",instance="127.0.0.2:9273"',
+                    timestamps,
+                    rng.normal(50, 10, args.points),
+                )
+                for s in range(args.series)
+            ],
+        )
+        for m in range(args.metrics)
+    ]
+    expected = expected_sample_counts(families)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "backfill.txt")
+        write_openmetrics_file(path, families)
+        size_mb = os.path.getsize(path) / 1e6
+        seconds, report = _timed(
+            lambda: validate_openmetrics_file(path, expected), args.repeat
+        )
+        assert report.samples == args.metrics * args.series * args.points
+
+        with open(path) as f:
+            lines = f.readlines()
+        # Line numbers are 1-based; the first sample of the file is on line 3
+        line_number = len(lines) // 2
+        prefix, _, timestamp = lines[line_number - 1].rsplit(" ", 2)
+        injected = {
+            "NaN": f"{prefix} NaN {timestamp}",
+            "duplicate": lines[line_number - 2],
+            "out of order": f"{prefix} 1.0 {int(timestamp) - 120}\n",
+            "unescaped quote": lines[line_number - 1].replace(
+                'uuid="device', 'uuid="dev"ice', 1
+            ),
+        }
+        bad_path = os.path.join(tmp_dir, "bad.txt")
+        for kind, line in injected.items():
+            with open(bad_path, "w") as f:
+                f.writelines(lines[: line_number - 1])
+                f.write(line)
+                f.writelines(lines[line_number:])
+            try:
+                validate_openmetrics_file(bad_path, expected)
+            except OpenMetricsValidationError as e:
+                assert e.line_number == line_number, (kind, str(e))
+                logging.info(f"{kind}: {str(e).splitlines()[0]}")
+            else:
+                raise AssertionError(f"{kind} was not detected")
+
+    logging.info(f"Samples: {report.samples} in {report.series} series")
+    logging.info("Injected errors reported on the right line")
+    logging.info(
+        f"Validated {size_mb:.1f} MB in {seconds:.2f}s "
+        f"({size_mb / seconds:.0f} MB/s, {report.samples / seconds / 1e6:.1f}M "
+        "samples/s)"
+    )
+
+
+def otel_write_request(metric_name, labels, timestamps, values):
+    """The payload batch_remote_write used to build through OpenTelemetry."""
+    from opentelemetry.sdk.metrics._internal.point import (
+        Gauge,
+        Metric,
+        NumberDataPoint,
+        ResourceMetrics,
+        ScopeMetrics,
+    )
+    from opentelemetry.sdk.metrics.export import MetricsData
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+    from shared.otel_remote_write import DebugRemoteWriteExporter
+
+    data_points = [
+        NumberDataPoint(
+            time_unix_nano=timestamp,
+            start_time_unix_nano=timestamp,
+            value=value,
+            attributes=labels,
+        )
+        for timestamp, value in zip(
+            (timestamps * 1_000_000_000).tolist(), values.tolist()
+        )
+    ]
+    metrics_data = MetricsData(
+        resource_metrics=[
+            ResourceMetrics(
+                resource=Resource.get_empty(),
+                schema_url="",
+                scope_metrics=[
+                    ScopeMetrics(
+                        scope=InstrumentationScope(name="sample_scope"),
+                        metrics=[
+                            Metric(
+                                name=metric_name,
+                                description="",
+                                data=Gauge(data_points=data_points),
+                                unit="",
+                            )
+                        ],
+                        schema_url="",
+                    )
+                ],
+            )
+        ]
+    )
+    exporter = DebugRemoteWriteExporter(endpoint="http://127.0.0.1:0")
+    return exporter._build_message(exporter._translate_data(metrics_data))
+
+
+def benchmark_remote_write(args):
+    """Check the NumPy encoder matches the OpenTelemetry payload and time both."""
+    import snappy
+
+    rng = np.random.default_rng(args.seed)
+    timestamps = 1_700_000_000 + 60 * np.arange(args.points, dtype=np.int64)
+    values = rng.normal(50, 10, args.points)
+    labels = {
+        "tenant_uuid": "t",
+        "uuid": "device-1",
+        "instance": "127.0.0.2:9273",
+        "cpu": "lina_cp_avg",
+    }
+
+    otel_time, otel_body = _timed(
+        lambda: otel_write_request("cpu", labels, timestamps, values), args.repeat
+    )
+    native_time, native_body = _timed(
+        lambda: build_write_request(
+            [
+                RemoteWriteSeries(
+                    prometheus_labels("cpu", labels), timestamps * 1000, values
+                )
+            ]
+        ),
+        args.repeat,
+    )
+    assert snappy.decompress(native_body) == snappy.decompress(otel_body)
+
+    logging.info(f"Samples: {args.points} ({len(native_body) / 1e3:.1f} KB compressed)")
+    logging.info("Payloads are identical")
+    logging.info(f"OpenTelemetry data points + exporter: {otel_time * 1000:.1f} ms")
+    logging.info(f"NumPy WriteRequest encoder: {native_time * 1000:.1f} ms")
+    logging.info(f"Speedup: {otel_time / native_time:.1f}x")
+
+    _check_instant_ticks(args)
+
+
+def _check_instant_ticks(args):
+    """Live ticks through instant_remote_write_all must stay the same size."""
+    import snappy
+
+    # The step modules import their siblings as top-level modules, as behave runs them
+    sys.path.insert(0, str(project_root / "features" / "steps"))
+    from features.steps import metrics as step_metrics
+
+    rng = np.random.default_rng(args.seed)
+    series = [
+        ("cpu", {"uuid": f"device-{d}", "cpu": f"core-{c}"})
+        for d in range(args.devices)
+        for c in range(4)
+    ]
+    server = StubRemoteWriteServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sender = step_metrics.remote_write_sender
+    step_metrics.remote_write_sender = lambda: RemoteWriteClient(server.address)
+    sizes, bodies = [], []
+    try:
+        for tick in range(args.ticks):
+            scheduled = 1_700_000_000 + 60 * tick
+            values = rng.normal(50, 10, len(series))
+            samples = [
+                (name, labels, value) for (name, labels), value in zip(series, values)
+            ]
+            # A stale value given first and a NaN: the last value wins, NaN is left out
+            samples = (
+                [(*series[0], -1.0)] + samples + [("cpu", {"uuid": "nan"}, np.nan)]
+            )
+            requests_before = server.requests
+            step_metrics.instant_remote_write_all(samples, timestamp=scheduled)
+            assert server.requests == requests_before + 1
+
+            # Bodies are recorded in the order they were first posted
+            body = list(server.attempts)[-1]
+            bodies.append(body)
+            sizes.append(len(snappy.decompress(body)))
+            decoded = _decode_write_request(body)
+            assert len(decoded) == len(series)
+            expected = {
+                tuple(prometheus_labels(name, labels)): value
+                for (name, labels), value in zip(series, values)
+            }
+            for labels, timestamps, tick_values in decoded:
+                assert timestamps.tolist() == [scheduled * 1000]
+                assert tick_values.tolist() == [expected[labels]]
+    finally:
+        step_metrics.remote_write_sender = sender
+        server.shutdown()
+        server.server_close()
+
+    # Values and timestamps are fixed width, so only snappy's output may vary
+    assert len(set(sizes)) == 1, sizes
+    compressed = [len(body) for body in bodies]
+    logging.info(
+        f"{args.ticks} live ticks of {len(series)} series: {sizes[0]} bytes each "
+        f"uncompressed, {min(compressed)}-{max(compressed)} compressed, only the "
+        "latest sample per series"
+    )
+
+
+def benchmark_planner(args):
+    """Check the planner's forced split and overrides and time a large plan."""
+    now = 1_700_000_000
+
+    def minutes(count, end):
+        return end - 60 * np.arange(count, dtype=np.int64)[::-1]
+
+    old = minutes(2 * 1440, now - 20 * 86400)
+    hybrid = minutes(2 * 1440, now)
+    recent = minutes(30, now)
+
+    cutoff = now - (HEAD_APPEND_WINDOW - DEFAULT_SAFETY_MARGIN).total_seconds()
+    store_cutoff = now - QUERY_STORE_AFTER.total_seconds()
+    plan = plan_ingestion([old, hybrid, recent], now)
+    assert [s.method for s in plan.series] == [BLOCKS, HYBRID, REMOTE_WRITE], plan
+    split = plan.series[1].split
+    assert hybrid[split - 1] < cutoff <= hybrid[split]
+    assert plan.unqueryable_block_samples == int(
+        np.count_nonzero((hybrid >= store_cutoff) & (hybrid < cutoff))
+    )
+    log_plan(plan)
+    logging.info("Forced split at the append window checked")
+
+    plan = plan_ingestion([old, hybrid, recent], now, method=BLOCKS)
+    assert [s.split for s in plan.series] == [len(old), len(hybrid), len(recent)]
+    assert plan.remote_write_samples == 0
+    plan = plan_ingestion([recent], now, method=REMOTE_WRITE)
+    assert plan.series[0].split == 0 and plan.block_samples == 0
+    for method, series in ((REMOTE_WRITE, [recent, hybrid]), ("bogus", [recent])):
+        try:
+            plan_ingestion(series, now, method=method)
+        except ValueError as e:
+            logging.info(f"method={method}: {e}")
+        else:
+            raise AssertionError(f"method={method} did not raise ValueError")
+    logging.info("BLOCKS and REMOTE_WRITE overrides checked")
+
+    rng = np.random.default_rng(args.seed)
+    series = [
+        minutes(args.points, now - int(rng.integers(0, 30 * 86400)))
+        for _ in range(args.series)
+    ]
+    seconds, plan = _timed(lambda: plan_ingestion(series, now), args.repeat)
+    logging.info(
+        f"Planned {args.series} series of {args.points} samples in "
+        f"{seconds * 1000:.1f} ms: {plan.counts()}"
+    )
+
+
+STUB_PROMTOOL = """#!python
+# Stub of `promtool tsdb create-blocks-from openmetrics FILE OUT`: one block
+# per file with the meta.json fields create_blocks_streamed checks
+import json, os, sys, time
+
+path, out = sys.argv[5], sys.argv[6]
+shard = os.path.basename(path)[: -len(".txt")]
+on_disk = sum(name.endswith(".txt") for name in os.listdir(os.path.dirname(path)))
+with open(os.environ["STUB_PROMTOOL_LOG"], "a") as f:
+    f.write(f"{shard} {on_disk}\\n")
+time.sleep(float(os.environ["STUB_PROMTOOL_SECONDS"]))
+if shard == os.environ.get("STUB_PROMTOOL_FAIL"):
+    sys.exit("stub promtool failure")
+timestamps = [
+    float(line.rsplit(" ", 1)[1]) for line in open(path) if not line.startswith("#")
+]
+block = os.path.join(out, "STUB" + shard)
+os.makedirs(block)
+with open(os.path.join(block, "meta.json"), "w") as f:
+    json.dump(
+        {
+            "ulid": "STUB" + shard,
+            "minTime": round(min(timestamps) * 1000),
+            "maxTime": round(max(timestamps) * 1000) + 1,
+            "stats": {"numSamples": len(timestamps)},
+        },
+        f,
+    )
+"""
+
+
+def _stub_promtool(tmp_dir):
+    path = os.path.join(tmp_dir, "promtool")
+    with open(path, "w") as f:
+        f.write(STUB_PROMTOOL.replace("#!python", "#!" + sys.executable, 1))
+    os.chmod(path, 0o755)
+    return path
+
+
+def _promtool_calls(log_path):
+    with open(log_path) as f:
+        calls = [line.split() for line in f]
+    os.remove(log_path)
+    return [(shard, int(on_disk)) for shard, on_disk in calls]
+
+
+def benchmark_promtool_stream(args):
+    """Check create_blocks_streamed against a stub promtool and time it."""
+    rng = np.random.default_rng(args.seed)
+    points = args.days * 1440
+    timestamps = 1_700_000_000 + 60 * np.arange(points, dtype=np.int64)
+    families = [
+        OpenMetricsFamily(
+            metric_name="metric",
+            description="Test Backfill Data",
+            series=[
+                OpenMetricsSeries(
+                    f'uuid="device-{s}"',
+                    timestamps,
+                    np.round(rng.normal(50, 10, points), 2),
+                )
+                for s in range(args.series)
+            ],
+        )
+    ]
+    samples = args.series * points
+    shard_starts = [start for start, _ in time_shards(families, DEFAULT_SHARD_DURATION)]
+    shards = len(shard_starts)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        promtool = _stub_promtool(tmp_dir)
+        work_dir = os.path.join(tmp_dir, "work")
+        os.makedirs(work_dir)
+        log_path = os.path.join(tmp_dir, "calls.txt")
+        os.environ["STUB_PROMTOOL_LOG"] = log_path
+        os.environ["STUB_PROMTOOL_SECONDS"] = str(args.promtool_ms / 1000)
+
+        timings = {}
+        for workers in (1, args.workers):
+            block_dir = os.path.join(tmp_dir, f"blocks-{workers}")
+            stats = create_blocks_streamed(
+                promtool, families, block_dir, work_dir=work_dir, workers=workers
+            )
+            calls = _promtool_calls(log_path)
+            metas = [
+                read_meta(os.path.join(block_dir, ulid))
+                for ulid in os.listdir(block_dir)
+            ]
+            assert stats.samples == samples and stats.shards == shards
+            assert sum(meta["stats"]["numSamples"] for meta in metas) == samples
+            assert len(calls) == shards
+            max_on_disk = max(on_disk for _, on_disk in calls)
+            assert max_on_disk <= 2 * workers + 1, max_on_disk
+            assert not os.listdir(work_dir), os.listdir(work_dir)
+            timings[workers] = stats.seconds
+            logging.info(
+                f"{workers} worker(s): {shards} shards in {stats.seconds:.2f}s, "
+                f"at most {max_on_disk} shard files on disk"
+            )
+
+        # The third shard fails: the run must stop early and clean up
+        os.environ["STUB_PROMTOOL_FAIL"] = str(shard_starts[2])
+        try:
+            create_blocks_streamed(
+                promtool,
+                families,
+                os.path.join(tmp_dir, "blocks-failing"),
+                work_dir=work_dir,
+                workers=args.workers,
+            )
+        except PromtoolError as e:
+            logging.info(f"Failing shard: {str(e).splitlines()[0]}")
+        else:
+            raise AssertionError("A failing promtool run did not raise PromtoolError")
+        finally:
+            del os.environ["STUB_PROMTOOL_FAIL"]
+        calls = _promtool_calls(log_path)
+        # Shards already handed to a promtool process may finish, no others
+        assert len(calls) <= 3 + 2 * args.workers, f"{len(calls)} shards built"
+        assert not os.listdir(work_dir), os.listdir(work_dir)
+        logging.info(f"Stopped after {len(calls)} of {shards} shards, files removed")
+
+    logging.info("Streamed promtool checks passed")
+    speedup = timings[1] / timings[args.workers]
+    logging.info(f"Speedup with {args.workers} workers: {speedup:.1f}x")
+
+
+def _shard_meta(min_time, max_time, samples):
+    return {"minTime": min_time, "maxTime": max_time, "stats": {"numSamples": samples}}
+
+
+def benchmark_shard_validation(args):
+    """Check that overlapping and incomplete shard blocks are rejected."""
+    width = int(DEFAULT_SHARD_DURATION.total_seconds())
+    start = 1_699_920_000 // width * width
+    stop = start + width
+    half = (start + width // 2) * 1000
+    complete = [
+        ("A", _shard_meta(start * 1000, half, 600)),
+        ("B", _shard_meta(half, stop * 1000, 400)),
+    ]
+    validate_shard_blocks(start, stop, 1000, complete)
+
+    invalid = {
+        "reaches into the next shard": (
+            1000,
+            [complete[0], ("B", _shard_meta(half, stop * 1000 + 1, 400))],
+        ),
+        "starts in the previous shard": (
+            1000,
+            [("A", _shard_meta(start * 1000 - 60_000, half, 600)), complete[1]],
+        ),
+        "misses samples": (1000, complete[:1]),
+        "holds extra samples": (900, complete),
+    }
+    for kind, (samples, blocks) in invalid.items():
+        try:
+            validate_shard_blocks(start, stop, samples, blocks)
+        except ShardValidationError as e:
+            logging.info(f"Shard that {kind}: {e}")
+        else:
+            raise AssertionError(f"A shard that {kind} passed validation")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for ulid, meta in complete + [
+            ("C", _shard_meta(stop * 1000, stop * 1000 + 1, 1))
+        ]:
+            os.makedirs(os.path.join(tmp_dir, ulid))
+            with open(os.path.join(tmp_dir, ulid, "meta.json"), "w") as f:
+                json.dump(meta, f)
+        validate_blocks(tmp_dir)
+
+        with open(os.path.join(tmp_dir, "C", "meta.json"), "w") as f:
+            json.dump(_shard_meta(stop * 1000 - 1, stop * 1000 + 1, 2), f)
+        try:
+            validate_blocks(tmp_dir)
+        except ShardValidationError as e:
+            logging.info(f"Overlapping blocks: {e}")
+        else:
+            raise AssertionError("Overlapping blocks passed validation")
+
+    logging.info("Shard validation checks passed")
+
+
+class FakeClock:
+    """Monotonic and wall clock that only move when slept on or advanced."""
+
+    def __init__(self, wall: float):
+        self.now = 0.0
+        self.wall_offset = wall
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def wall(self) -> float:
+        return self.wall_offset + self.now
+
+    def sleep(self, seconds: float):
+        assert seconds >= 0, seconds
+        self.now += seconds
+
+
+def benchmark_tick_scheduler(args):
+    """Check that run_ticks keeps absolute, wall-clock aligned deadlines."""
+    if args.ticks < 4:
+        raise ValueError("--ticks must be at least 4")
+    interval, offset = 60.0, DEFAULT_TICK_OFFSET_SECONDS
+    clock = FakeClock(wall=1_700_000_000.25)
+    # Request time of every tick; tick 2 takes longer than an interval
+    request_seconds = [0.4, 0.9, interval + 15, 0.3] + [0.5] * (args.ticks - 4)
+    fired = []
+
+    def on_tick(index, scheduled):
+        fired.append((clock.monotonic(), clock.wall(), scheduled))
+        clock.sleep(request_seconds[index])
+
+    reports = run_ticks(
+        args.ticks,
+        on_tick,
+        interval=interval,
+        offset=offset,
+        align=True,
+        clock=clock.monotonic,
+        sleep=clock.sleep,
+        wall_clock=clock.wall,
+    )
+
+    first_wall = fired[0][1]
+    assert first_wall % interval == offset, first_wall
+    assert fired[0][0] == seconds_until_aligned(interval, offset, 1_700_000_000.25)
+    start = fired[0][0]
+    for index, (report, (monotonic, wall, scheduled)) in enumerate(zip(reports, fired)):
+        deadline = start + index * interval
+        assert scheduled == first_wall + index * interval
+        # Only the tick after the slow one is late, by the overrun
+        expected = 15.0 if index == 3 else 0.0
+        assert monotonic == deadline + expected, (index, monotonic, deadline)
+        assert report.lateness_seconds == expected
+    assert clock.monotonic() == start + args.ticks * interval
+    logging.info(
+        f"First tick after {start:.2f}s at {first_wall % interval:g}s into the "
+        f"minute; {args.ticks} ticks kept their deadlines after a "
+        f"{request_seconds[2]:g}s tick"
+    )
+
+    # Unaligned by default: the live steps start ticking right away
+    clock = FakeClock(wall=1_700_000_000.25)
+    fired = []
+    run_ticks(
+        2,
+        on_tick,
+        interval=interval,
+        clock=clock.monotonic,
+        sleep=clock.sleep,
+        wall_clock=clock.wall,
+    )
+    assert fired[0][0] == 0.0 and fired[0][2] == 1_700_000_000.25, fired[0]
+    assert fired[1][0] == interval, fired[1]
+
+    # The sleep loop it replaced: every request delays all later ticks
+    drift = sum(request_seconds)
+    logging.info(
+        f"time.sleep({interval:g}) after each tick would have drifted {drift:.1f}s"
+    )
+    logging.info("Tick scheduler checks passed")
+
+
+def legacy_generate_spikes(spike_pattern, spike_multiplier, ts_values):
+    """The loop time_series_generator.generate_spikes used to run."""
+    for i in range(len(ts_values)):
+        if spike_pattern[i % len(spike_pattern)]:
+            ts_values[i] *= spike_multiplier
+
+    return ts_values
+
+
+def benchmark_anomaly_injection(args):
+    """Check the vectorized injectors against per-sample loops."""
+    rng = np.random.default_rng(args.seed)
+    # The pattern and multiplier of "push data that is intermittently anomalous"
+    pattern, multiplier = [0, 1, 1, 0, 0], 5
+    for length in (1, 4, 5, 7, 1440, args.points):
+        values = rng.normal(200, 10, length)
+        expected = legacy_generate_spikes(pattern, multiplier, values.tolist())
+        original = values.copy()
+        np.testing.assert_array_equal(
+            inject_spikes(values, pattern, multiplier), expected
+        )
+        np.testing.assert_array_equal(values, original)
+    batch = rng.normal(200, 10, (3, 1440))
+    multipliers = np.array([5.0, 2.0, 1.0])
+    spiked = inject_spikes(batch, pattern, multipliers)
+    for row, factor in enumerate(multipliers):
+        np.testing.assert_array_equal(
+            spiked[row], legacy_generate_spikes(pattern, factor, batch[row].tolist())
+        )
+    logging.info("inject_spikes matches generate_spikes")
+
+    length = 500
+    values = rng.normal(50, 5, length)
+    level, ramp, square = values.copy(), values.copy(), values.copy()
+    for i in range(length):
+        if i >= 100:
+            level[i] += 7
+        ramp[i] += 30 * min(max((i - 200 + 1) / 50, 0.0), 1.0)
+        if i >= 10 and (i - 10) % 60 < 0.25 * 60:
+            square[i] += 4
+    np.testing.assert_allclose(inject_level_shift(values, 100, 7), level)
+    np.testing.assert_allclose(inject_ramp(values, 200, 50, 30), ramp)
+    np.testing.assert_allclose(
+        inject_square_wave(values, 60, 0.25, 4, start=10), square
+    )
+    no_hold = inject_ramp(values, 200, 50, 30, hold=False)
+    np.testing.assert_allclose(no_hold[250:], values[250:])
+
+    dropped = inject_dropouts(values, 0.1, rng=np.random.default_rng(args.seed))
+    draws = np.random.default_rng(args.seed).random(length)
+    np.testing.assert_array_equal(np.isnan(dropped), draws < 0.1)
+
+    shape = (4, 2000)
+    mask = random_burst_mask(shape, 0.01, 8, rng=np.random.default_rng(args.seed))
+    reference_rng = np.random.default_rng(args.seed)
+    starts = np.flatnonzero(reference_rng.random(shape) < 0.01)
+    durations = reference_rng.geometric(1 / 8, starts.size)
+    expected = np.zeros(shape, dtype=bool)
+    for start, duration in zip(starts, durations):
+        row, column = divmod(int(start), shape[1])
+        expected[row, column : column + duration] = True
+    np.testing.assert_array_equal(mask, expected)
+    logging.info("Other injectors match their per-sample loops")
+
+    values = rng.normal(200, 10, args.points)
+    legacy_time, _ = _timed(
+        lambda: legacy_generate_spikes(pattern, multiplier, values.copy()),
+        args.repeat,
+    )
+    vector_time, _ = _timed(
+        lambda: inject_spikes(values, pattern, multiplier), args.repeat
+    )
+    logging.info(f"generate_spikes loop: {legacy_time * 1000:.1f} ms")
+    logging.info(f"inject_spikes: {vector_time * 1000:.1f} ms")
+    logging.info(f"Speedup: {legacy_time / vector_time:.1f}x")
+
+
+class StubRemoteWriteServer(ThreadingHTTPServer):
+    """In-memory remote-write endpoint that keeps what it accepted per series.
+
+    Every ``fail_every``-th request is answered with 503, or with 429 and the
+    Retry-After header ``retry_after()`` returns when that is set. Like the TSDB head,
+    a request whose samples are not newer than the last accepted sample of
+    their series is rejected with 400, and so is any request ``reject``
+    returns True for, given the decoded series.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, fail_every=0, reject=None, retry_after=None):
+        super().__init__(("127.0.0.1", 0), StubRemoteWriteHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.reject = reject
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.max_request_samples = 0
+        self.max_request_bytes = 0
+        # Client ports seen; one per TCP connection
+        self.client_ports = set()
+        # body -> number of times it was posted
+        self.attempts = {}
+        # labels -> (timestamps, values) of every accepted request, in order
+        self.samples = {}
+
+    @property
+    def address(self):
+        return f"http://127.0.0.1:{self.server_port}/api/v1/push"
+
+
+def _decode_write_request(body):
+    """(labels, timestamps, values) of every series in a compressed WriteRequest."""
+    import snappy
+    from opentelemetry.exporter.prometheus_remote_write.gen.remote_pb2 import (
+        WriteRequest,
+    )
+
+    request = WriteRequest.FromString(snappy.decompress(body))
+    return [
+        (
+            tuple((label.name, label.value) for label in series.labels),
+            np.array([sample.timestamp for sample in series.samples], dtype=np.int64),
+            np.array([sample.value for sample in series.samples]),
+        )
+        for series in request.timeseries
+    ]
+
+
+class StubRemoteWriteHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like a real endpoint
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(server.latency)
+        series = _decode_write_request(body)
+        with server.lock:
+            server.requests += 1
+            server.client_ports.add(self.client_address[1])
+            server.attempts[body] = server.attempts.get(body, 0) + 1
+            server.max_request_samples = max(
+                server.max_request_samples, sum(len(ts) for _, ts, _ in series)
+            )
+            server.max_request_bytes = max(server.max_request_bytes, len(body))
+            if server.fail_every and server.requests % server.fail_every == 0:
+                server.failures += 1
+                if server.retry_after is not None:
+                    return self._reply(
+                        429, b"slow down", {"Retry-After": server.retry_after()}
+                    )
+                return self._reply(503, b"injected failure")
+            if server.reject is not None and server.reject(series):
+                return self._reply(400, b"rejected")
+            for labels, timestamps, _ in series:
+                accepted = server.samples.get(labels)
+                if accepted and timestamps[0] <= accepted[-1][0][-1]:
+                    return self._reply(400, f"out of order sample {labels}".encode())
+            for labels, timestamps, values in series:
+                server.samples.setdefault(labels, []).append((timestamps, values))
+        self._reply(200)
+
+
+def _backlog_series(args):
+    rng = np.random.default_rng(args.seed)
+    series = []
+    for s in range(args.long_series + args.short_series):
+        if s < args.long_series:
+            # Noisy and long: cut into slices the byte limit has to halve
+            points = args.points
+            values = rng.normal(50, 10, points)
+        else:
+            # Flat and short: compresses well, so packing stops at max_samples
+            points = args.max_samples // 4
+            values = np.full(points, float(s))
+        timestamps = 1_700_000_000_000 + 60_000 * np.arange(points, dtype=np.int64)
+        series.append(
+            RemoteWriteSeries(
+                prometheus_labels("metric", {"uuid": f"device-{s}"}), timestamps, values
+            )
+        )
+    return series
+
+
+def _run_stub_remote_write(series, args, **server_args):
+    server = StubRemoteWriteServer(args.latency_ms / 1000, **server_args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        summary = send_series(
+            series,
+            RemoteWriteClient(server.address),
+            max_samples=args.max_samples,
+            max_bytes=args.max_bytes,
+            max_workers=args.workers,
+            backoff=0.01,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    return server, summary
+
+
+def benchmark_remote_write_batches(args):
+    """Send a chunked backlog to a flaky stub and check limits, order and retries."""
+    series = _backlog_series(args)
+    chains = plan_chunks(series, args.max_samples, args.max_bytes)
+    chunks = [chunk for chain in chains for chunk in chain]
+    assert sum(chunk.samples for chunk in chunks) == sum(len(s.values) for s in series)
+    # Both limits must bind: the byte limit halves some max_samples slices
+    assert max(chunk.samples for chunk in chunks) == args.max_samples
+    assert max(len(chain) for chain in chains) > -(-args.points // args.max_samples)
+
+    server, summary = _run_stub_remote_write(series, args, fail_every=args.fail_every)
+    assert summary.ok, summary.failed
+    assert server.max_request_samples <= args.max_samples
+    assert server.max_request_bytes <= args.max_bytes
+    assert server.samples.keys() == {tuple(s.labels) for s in series}
+    for s in series:
+        parts = server.samples[tuple(s.labels)]
+        assert np.array_equal(np.concatenate([ts for ts, _ in parts]), s.timestamps)
+        assert np.array_equal(np.concatenate([v for _, v in parts]), s.values)
+    # Every chunk was posted once, plus once more for each injected failure
+    assert server.failures > 0
+    assert server.requests == len(chunks) + server.failures
+    assert sorted(server.attempts.values()) == sorted(r.attempts for r in summary.sent)
+    logging.info(
+        f"{len(series)} series in {len(chunks)} chunks ({len(chains)} chains): "
+        f"at most {server.max_request_samples} samples and "
+        f"{server.max_request_bytes} bytes per request, "
+        f"{server.failures} injected failures retried"
+    )
+
+    # A chunk rejected for good skips the rest of its series, nothing else
+    rejected = tuple(series[0].labels)
+    middle = series[0].timestamps[len(series[0].timestamps) // 2]
+    chain = next(
+        chain
+        for chain in chains
+        if chain[0].parts[0][0] == 0 and len(chain[0].parts) == 1
+    )
+    position = next(
+        i
+        for i, chunk in enumerate(chain)
+        if series[0].timestamps[chunk.parts[0][2] - 1] >= middle
+    )
+    server, summary = _run_stub_remote_write(
+        series,
+        args,
+        reject=lambda decoded: any(
+            labels == rejected and timestamps[-1] >= middle
+            for labels, timestamps, _ in decoded
+        ),
+    )
+    assert [result.parts for result in summary.failed] == [chain[position].parts]
+    assert summary.skipped == chain[position + 1 :]
+    assert len(summary.sent) == len(chunks) - len(chain) + position
+    assert server.requests == len(chunks) - len(chain) + position + 1
+    logging.info(
+        f"Rejected chunk {position + 1}/{len(chain)} of a series: "
+        f"{len(summary.skipped)} later chunks skipped, other series complete"
+    )
+    logging.info("Chunk limit, ordering and retry checks passed")
+
+
+def _retry_after_wait(header, body):
+    """The delay RemoteWriteClient.send takes for one 429 with ``header``."""
+    server = StubRemoteWriteServer(fail_every=1, retry_after=header)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = RemoteWriteClient(server.address)
+    waits = []
+    try:
+        # fail_every=1 fails every request; retries=1 gives up after one wait
+        client.send(body, retries=1, backoff=0.01, sleep=waits.append)
+    except RemoteWriteError as e:
+        assert e.status_code == 429, e
+    else:
+        raise AssertionError("The stub did not answer with 429")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(waits) == 1
+    return waits[0], client.stats.retry_after_waits
+
+
+def benchmark_remote_write_client(args):
+    """Check keep-alive reuse and Retry-After handling of RemoteWriteClient."""
+    import requests
+
+    bodies = [
+        build_write_request(
+            [
+                # One series per request, so concurrent requests never
+                # arrive out of order
+                RemoteWriteSeries(
+                    prometheus_labels("metric", {"uuid": f"device-{i}"}),
+                    np.array([1_700_000_000_000], dtype=np.int64),
+                    np.array([float(i)]),
+                )
+            ]
+        )
+        for i in range(args.requests)
+    ]
+    server = StubRemoteWriteServer(args.latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        bare_time, _ = _timed(
+            lambda: [
+                requests.post(server.address, data=body, headers=REMOTE_WRITE_HEADERS)
+                for body in bodies
+            ],
+            1,
+        )
+        assert len(server.client_ports) == args.requests
+        server.samples.clear()
+        server.client_ports.clear()
+
+        client = RemoteWriteClient(server.address)
+        pooled_time, _ = _timed(lambda: [client(body) for body in bodies], 1)
+        assert client.stats.requests == args.requests
+        assert client.stats.connections == len(server.client_ports) == 1
+        assert client.stats.reuse_ratio == 1 - 1 / args.requests
+        logging.info(
+            f"Sequential: {args.requests} requests over {client.stats.connections} "
+            f"connection, mean handshake "
+            f"{client.stats.mean_handshake_seconds * 1000:.2f} ms"
+        )
+
+        server.samples.clear()
+        server.client_ports.clear()
+        client = RemoteWriteClient(server.address)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(client, bodies))
+        assert client.stats.requests == args.requests
+        assert client.stats.connections == len(server.client_ports)
+        assert client.stats.connections <= args.workers
+        logging.info(
+            f"{args.workers} threads: {args.requests} requests over "
+            f"{client.stats.connections} connections "
+            f"(reuse {client.stats.reuse_ratio:.0%})"
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    body = bodies[0]
+    wait, waited = _retry_after_wait(lambda: "2", body)
+    assert wait == 2.0 and waited == 1, (wait, waited)
+    logging.info(f"Retry-After: 2 -> waited {wait:.1f}s")
+    wait, waited = _retry_after_wait(
+        lambda: format_datetime(
+            datetime.now(timezone.utc) + timedelta(seconds=3), usegmt=True
+        ),
+        body,
+    )
+    # HTTP dates have whole seconds, so up to one second is lost
+    assert 1.5 < wait <= 3.0 and waited == 1, (wait, waited)
+    logging.info(f"Retry-After: <HTTP date in 3s> -> waited {wait:.1f}s")
+    wait, waited = _retry_after_wait(lambda: "3600", body)
+    assert wait == MAX_BACKOFF_SECONDS and waited == 1, (wait, waited)
+    logging.info(f"Retry-After: 3600 -> waited {wait:.1f}s (capped)")
+    wait, waited = _retry_after_wait(lambda: "soon", body)
+    # Unparseable: full-jitter backoff, at most the 0.01s base on attempt 0
+    assert wait <= 0.01 and waited == 0, (wait, waited)
+    logging.info(f"Retry-After: soon -> backoff of {wait:.3f}s")
+    assert parse_retry_after(format_datetime(datetime(2000, 1, 1), usegmt=False)) == 0
+
+    logging.info("Connection reuse and Retry-After checks passed")
+    logging.info(f"Bare requests.post: {bare_time * 1000 / args.requests:.2f} ms/req")
+    logging.info(f"RemoteWriteClient: {pooled_time * 1000 / args.requests:.2f} ms/req")
+
+
+def _parallel_rows(count):
+    return [
+        SeriesRowConfig(
+            start_value=10 + row,
+            end_value=50 + 3 * row,
+            transition_config=TransitionConfig(
+                start_time=datetime(2024, 1, 1, tzinfo=timezone.utc)
+                + timedelta(hours=row % 24),
+                transition_window=timedelta(minutes=15 * (row % 5)),
+            ),
+            noise_config=NoiseConfig(enable=row % 4 != 3, std=1 + row % 3),
+            seasonality_config=SeasonalityConfig(
+                enable=row % 3 != 0, amplitude=5 + row, period=timedelta(hours=6)
+            ),
+        )
+        for row in range(count)
+    ]
+
+
+def benchmark_generator_parallel(args):
+    """Check generate_timeseries_parallel is independent of the worker count."""
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    duration = timedelta(days=args.days)
+    step = timedelta(minutes=1)
+    rows = _parallel_rows(args.series)
+    assert args.series * int(duration / step) >= PARALLEL_MIN_SAMPLES
+
+    serial_time, (timestamps, expected) = _timed(
+        lambda: generate_timeseries_parallel(
+            start_time, duration, step, rows, seed=args.seed, max_workers=1
+        ),
+        1,
+    )
+    # rows_per_task that does not divide the row count leaves a short last task
+    uneven = max(2, args.series // 3 + 1)
+    assert args.series % uneven
+    timings = {}
+    for workers, rows_per_task in (
+        (2, None),
+        (args.workers, None),
+        (args.workers, uneven),
+        (args.workers, 1),
+    ):
+        seconds, (parallel_timestamps, values) = _timed(
+            lambda: generate_timeseries_parallel(
+                start_time,
+                duration,
+                step,
+                rows,
+                seed=args.seed,
+                max_workers=workers,
+                rows_per_task=rows_per_task,
+            ),
+            1,
+        )
+        assert np.array_equal(parallel_timestamps, timestamps)
+        assert np.array_equal(values, expected), (workers, rows_per_task)
+        timings[(workers, rows_per_task)] = seconds
+        logging.info(
+            f"{workers} workers, rows_per_task={rows_per_task}: identical "
+            f"({seconds * 1000:.1f} ms)"
+        )
+
+    _, other = generate_timeseries_parallel(
+        start_time, duration, step, rows, seed=args.seed + 1, max_workers=1
+    )
+    noisy = [i for i, row in enumerate(rows) if row.noise_config.enable]
+    quiet = [i for i, row in enumerate(rows) if not row.noise_config.enable]
+    assert not np.array_equal(other[noisy], expected[noisy])
+    assert np.array_equal(other[quiet], expected[quiet])
+
+    logging.info(f"Samples: {expected.size} in {args.series} series")
+    logging.info("Output is independent of the worker count and task split")
+    logging.info(f"In-process: {serial_time * 1000:.1f} ms")
+    logging.info(
+        f"Speedup with {args.workers} workers: "
+        f"{serial_time / timings[(args.workers, None)]:.1f}x"
+    )
+
+
+def legacy_missing_mask(timestamps, missing_data_configs, step):
+    """The per-window loop generate_timeseries used to apply missing data."""
+    mask = np.zeros(len(timestamps), dtype=bool)
+    for config in missing_data_configs:
+        # generate_missing_data: 0 (missing) with probability miss_probability
+        num_samples = int(config.duration.total_seconds() / step.total_seconds())
+        data = np.random.choice(
+            [1, 0],
+            size=num_samples,
+            p=[1 - config.miss_probability, config.miss_probability],
+        )
+        # find_closest_index
+        target = (config.start_time - datetime(1970, 1, 1)).total_seconds()
+        start_index = np.abs(timestamps - target).argmin()
+        for i in range(len(data)):
+            # Rows past the end were appended as NaN and dropped again
+            if data[i] == 0 and start_index + i < len(mask):
+                mask[start_index + i] = True
+    return mask
+
+
+def _rng_state():
+    _, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    return keys.tobytes(), position, has_gauss, cached_gaussian
+
+
+def benchmark_missing_data(args):
+    """Check build_missing_mask against the former loop and its outage claims."""
+    step = timedelta(minutes=1)
+    start = datetime(2024, 1, 1)
+    timestamps = int((start - datetime(1970, 1, 1)).total_seconds()) + 60 * np.arange(
+        args.points, dtype=np.int64
+    )
+
+    def window(offset_minutes, minutes, probability=None):
+        # Offsets with seconds fall between samples and resolve to the closest
+        config = dict(
+            start_time=start + timedelta(minutes=offset_minutes),
+            duration=timedelta(minutes=minutes),
+        )
+        if probability is not None:
+            config["miss_probability"] = probability
+        return MissingDataConfig(**config)
+
+    # Overlapping probability windows, one running past the end of the series
+    dropouts = [
+        window(100, 600, 0.3),
+        window(400.4, 900, 0.05),
+        window(450.6, 120, 0.9),
+        window(args.points - 50, 200, 0.5),
+    ]
+    np.random.seed(args.seed)
+    expected = legacy_missing_mask(timestamps, dropouts, step)
+    expected_state = _rng_state()
+    np.random.seed(args.seed)
+    mask = build_missing_mask(timestamps, dropouts, step)
+    assert np.array_equal(mask, expected)
+    # Same draws, so the noise generated afterwards is unchanged as well
+    assert _rng_state() == expected_state
+    logging.info(
+        f"Probability windows match generate_missing_data: {mask.sum()} missing"
+    )
+
+    # miss_probability now defaults to 1.0, a fixed-length outage; it used to
+    # be a required field
+    assert window(0, 1).miss_probability == 1.0
+    outages = [window(10, 30), window(25, 30, 1.0), window(args.points - 5, 60)]
+    np.random.seed(args.seed)
+    state = _rng_state()
+    mask = build_missing_mask(timestamps, outages, step)
+    assert _rng_state() == state
+    expected = np.zeros(args.points, dtype=bool)
+    expected[10:55] = True
+    expected[args.points - 5 :] = True
+    assert np.array_equal(mask, expected)
+
+    # Outages between the probability windows do not shift their draws
+    np.random.seed(args.seed)
+    expected = legacy_missing_mask(timestamps, dropouts, step) | mask
+    np.random.seed(args.seed)
+    mixed = [outages[0], dropouts[0], outages[1], dropouts[1]]
+    mixed += [outages[2], *dropouts[2:]]
+    assert np.array_equal(build_missing_mask(timestamps, mixed, step), expected)
+    logging.info("Outages are exact ranges and draw no random numbers")
+
+    configs = [
+        window(offset, 240, 0.2) for offset in range(0, args.points, args.points // 20)
+    ]
+    legacy_time, _ = _timed(
+        lambda: legacy_missing_mask(timestamps, configs, step), args.repeat
+    )
+    vector_time, _ = _timed(
+        lambda: build_missing_mask(timestamps, configs, step), args.repeat
+    )
+    logging.info(f"Former loop: {legacy_time * 1000:.1f} ms")
+    logging.info(f"build_missing_mask: {vector_time * 1000:.1f} ms")
+    logging.info(f"Speedup: {legacy_time / vector_time:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks and equivalence checks for data generation"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generator_parser = subparsers.add_parser(
+        "generator", help="NumPy generator vs the former Darts implementation"
+    )
+    generator_parser.add_argument(
+        "--hours",
+        type=int,
+        default=2160,
+        help="Series duration in hours at 1-minute resolution (default: 2160)",
+    )
+    generator_parser.add_argument("--seed", type=int, default=42)
+    generator_parser.add_argument("--repeat", type=int, default=3)
+    generator_parser.set_defaults(func=benchmark_generator)
+
+    openmetrics_parser = subparsers.add_parser(
+        "openmetrics", help="Streaming OpenMetrics writer vs the Jinja template"
+    )
+    openmetrics_parser.add_argument(
+        "--points",
+        type=int,
+        default=20160,
+        help="Samples per series (default: 20160, two weeks at 1-minute steps)",
+    )
+    openmetrics_parser.add_argument("--series", type=int, default=3)
+    openmetrics_parser.add_argument("--metrics", type=int, default=2)
+    openmetrics_parser.add_argument(
+        "--order", choices=["series", "time"], default="series"
+    )
+    openmetrics_parser.add_argument("--seed", type=int, default=42)
+    openmetrics_parser.add_argument("--repeat", type=int, default=3)
+    openmetrics_parser.set_defaults(func=benchmark_openmetrics)
+
+    blocks_parser = subparsers.add_parser(
+        "tsdb-blocks", help="Native TSDB block writer round trip and timing"
+    )
+    blocks_parser.add_argument(
+        "--points",
+        type=int,
+        default=20160,
+        help="Samples per series (default: 20160, two weeks at 1-minute steps)",
+    )
+    blocks_parser.add_argument("--series", type=int, default=3)
+    blocks_parser.add_argument("--metrics", type=int, default=2)
+    blocks_parser.add_argument("--block-hours", type=int, default=12)
+    blocks_parser.add_argument("--seed", type=int, default=42)
+    blocks_parser.add_argument("--repeat", type=int, default=3)
+    blocks_parser.set_defaults(func=benchmark_tsdb_blocks)
+
+    upload_parser = subparsers.add_parser(
+        "block-upload", help="Concurrent block uploader against a local stub server"
+    )
+    upload_parser.add_argument(
+        "--points",
+        type=int,
+        default=20160,
+        help="Samples per series (default: 20160, two weeks at 1-minute steps)",
+    )
+    upload_parser.add_argument("--series", type=int, default=3)
+    upload_parser.add_argument("--block-hours", type=int, default=12)
+    upload_parser.add_argument("--workers", type=int, default=8)
+    upload_parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=20,
+        help="Simulated latency of every stub request (default: 20)",
+    )
+    upload_parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=7,
+        help="Answer every n-th request with 503 (default: 7, 0 disables)",
+    )
+    upload_parser.add_argument("--seed", type=int, default=42)
+    upload_parser.set_defaults(func=benchmark_block_upload)
+
+    validator_parser = subparsers.add_parser(
+        "validator", help="OpenMetrics validator throughput and error detection"
+    )
+    validator_parser.add_argument(
+        "--points",
+        type=int,
+        default=43200,
+        help="Samples per series (default: 43200, 30 days at 1-minute steps)",
+    )
+    validator_parser.add_argument("--series", type=int, default=20)
+    validator_parser.add_argument("--metrics", type=int, default=2)
+    validator_parser.add_argument("--seed", type=int, default=42)
+    validator_parser.add_argument("--repeat", type=int, default=1)
+    validator_parser.set_defaults(func=benchmark_validator)
+
+    remote_write_parser = subparsers.add_parser(
+        "remote-write", help="NumPy WriteRequest encoder vs the OpenTelemetry path"
+    )
+    remote_write_parser.add_argument(
+        "--points",
+        type=int,
+        default=10000,
+        help="Samples in the batch (default: 10000, the planner's batch size)",
+    )
+    remote_write_parser.add_argument("--seed", type=int, default=42)
+    remote_write_parser.add_argument("--repeat", type=int, default=5)
+    remote_write_parser.add_argument(
+        "--ticks", type=int, default=30, help="Live ticks to check (default: 30)"
+    )
+    remote_write_parser.add_argument("--devices", type=int, default=10)
+    remote_write_parser.set_defaults(func=benchmark_remote_write)
+
+    planner_parser = subparsers.add_parser(
+        "planner", help="Ingestion planner forced split and overrides"
+    )
+    planner_parser.add_argument(
+        "--points",
+        type=int,
+        default=20160,
+        help="Samples per series of the timed plan (default: 20160)",
+    )
+    planner_parser.add_argument("--series", type=int, default=200)
+    planner_parser.add_argument("--seed", type=int, default=42)
+    planner_parser.add_argument("--repeat", type=int, default=3)
+    planner_parser.set_defaults(func=benchmark_planner)
+
+    promtool_stream_parser = subparsers.add_parser(
+        "promtool-stream", help="Streamed promtool block creation with a stub promtool"
+    )
+    promtool_stream_parser.add_argument(
+        "--days",
+        type=int,
+        default=30,
+        help="Days of 1-minute samples per series (default: 30, 15 shards)",
+    )
+    promtool_stream_parser.add_argument("--series", type=int, default=4)
+    promtool_stream_parser.add_argument("--workers", type=int, default=4)
+    promtool_stream_parser.add_argument(
+        "--promtool-ms",
+        type=float,
+        default=200,
+        help="Time the stub promtool takes per shard (default: 200)",
+    )
+    promtool_stream_parser.add_argument("--seed", type=int, default=42)
+    promtool_stream_parser.set_defaults(func=benchmark_promtool_stream)
+
+    shard_validation_parser = subparsers.add_parser(
+        "shard-validation", help="Reject overlapping and incomplete promtool shards"
+    )
+    shard_validation_parser.set_defaults(func=benchmark_shard_validation)
+
+    tick_parser = subparsers.add_parser(
+        "tick-scheduler", help="Drift-free, aligned live ticks on a fake clock"
+    )
+    tick_parser.add_argument(
+        "--ticks",
+        type=int,
+        default=10,
+        help="Ticks to run, at least 4 (default: 10)",
+    )
+    tick_parser.set_defaults(func=benchmark_tick_scheduler)
+
+    anomaly_parser = subparsers.add_parser(
+        "anomaly-injection", help="Vectorized injectors vs per-sample loops"
+    )
+    anomaly_parser.add_argument(
+        "--points",
+        type=int,
+        default=43200,
+        help="Samples of the timed series (default: 43200, 30 days at 1-minute steps)",
+    )
+    anomaly_parser.add_argument("--seed", type=int, default=42)
+    anomaly_parser.add_argument("--repeat", type=int, default=3)
+    anomaly_parser.set_defaults(func=benchmark_anomaly_injection)
+
+    batches_parser = subparsers.add_parser(
+        "remote-write-batches",
+        help="Chunked concurrent remote write against a local stub endpoint",
+    )
+    batches_parser.add_argument(
+        "--points",
+        type=int,
+        default=20160,
+        help="Samples per long series (default: 20160, two weeks at 1-minute steps)",
+    )
+    batches_parser.add_argument("--long-series", type=int, default=3)
+    batches_parser.add_argument("--short-series", type=int, default=40)
+    batches_parser.add_argument("--max-samples", type=int, default=2000)
+    batches_parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=24 * 1024,
+        help="Compressed bytes per request (default: 24576, low enough to bind)",
+    )
+    batches_parser.add_argument("--workers", type=int, default=4)
+    batches_parser.add_argument("--latency-ms", type=float, default=5)
+    batches_parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=7,
+        help="Answer every n-th request with 503 (default: 7)",
+    )
+    batches_parser.add_argument("--seed", type=int, default=42)
+    batches_parser.set_defaults(func=benchmark_remote_write_batches)
+
+    client_parser = subparsers.add_parser(
+        "remote-write-client",
+        help="Keep-alive reuse and Retry-After of the remote-write client",
+    )
+    client_parser.add_argument("--requests", type=int, default=200)
+    client_parser.add_argument("--workers", type=int, default=4)
+    client_parser.add_argument("--latency-ms", type=float, default=0)
+    client_parser.set_defaults(func=benchmark_remote_write_client)
+
+    parallel_parser = subparsers.add_parser(
+        "generator-parallel",
+        help="Parallel generator output vs the in-process output",
+    )
+    parallel_parser.add_argument("--series", type=int, default=64)
+    parallel_parser.add_argument(
+        "--days",
+        type=int,
+        default=30,
+        help="Length of every series; the batch must reach PARALLEL_MIN_SAMPLES "
+        "(default: 30)",
+    )
+    parallel_parser.add_argument("--workers", type=int, default=4)
+    parallel_parser.add_argument("--seed", type=int, default=42)
+    parallel_parser.set_defaults(func=benchmark_generator_parallel)
+
+    missing_parser = subparsers.add_parser(
+        "missing-data", help="Missing-data mask vs the former per-window loop"
+    )
+    missing_parser.add_argument(
+        "--points",
+        type=int,
+        default=43200,
+        help="Samples of the series (default: 43200, 30 days at 1-minute steps)",
+    )
+    missing_parser.add_argument("--seed", type=int, default=42)
+    missing_parser.add_argument("--repeat", type=int, default=3)
+    missing_parser.set_defaults(func=benchmark_missing_data)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Report the import cost of the behave step modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, the
+same way behave loads it (project root, features/ and features/steps/ on the
+path). The report lists the cumulative import time per module and the direct
+imports that account for most of it. Use --output to store the numbers as JSON
+so they can be tracked across builds, and --budget-ms to fail when the combined
+import of all step modules gets slower than an agreed budget.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
+)
+
+ALL_STEP_MODULES = "<all step modules>"
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def discover_modules():
+    """Return the dotted names of features/environment.py and every step module."""
+    steps_dir = project_root / "features" / "steps"
+    modules = ["features.environment"]
+    modules += sorted(
+        f"features.steps.{path.stem}"
+        for path in steps_dir.glob("*.py")
+        if path.stem != "__init__"
+    )
+    return modules
+
+
+def measure_import(modules, top):
+    """Import `modules` in a fresh interpreter and parse the -X importtime output.
+
+    Returns:
+        dict: cumulative and self time in ms, plus the `top` heaviest direct imports.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [
+            str(project_root),
+            str(project_root / "features"),
+            str(project_root / "features" / "steps"),
+        ]
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}"
+        )
+
+    targets = set(modules)
+    total_us = 0
+    self_us = 0
+    direct_imports = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        depth = (len(indent) - 1) // 2
+        if depth == 0 and name in targets:
+            total_us += int(cumulative)
+            self_us += int(own)
+        elif depth == 1:
+            direct_imports[name] = max(direct_imports.get(name, 0), int(cumulative))
+
+    heaviest = sorted(direct_imports.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "cumulative_ms": round(total_us / 1000, 1),
+        "self_ms": round(self_us / 1000, 1),
+        "top_imports": [
+            {"module": name, "cumulative_ms": round(us / 1000, 1)}
+            for name, us in heaviest[:top]
+        ],
+    }
+
+
+def best_of(modules, repeat, top):
+    """Measure `repeat` times and keep the fastest run to reduce noise."""
+    runs = [measure_import(modules, top) for _ in range(repeat)]
+    return min(runs, key=lambda run: run["cumulative_ms"])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report per-module import time of the behave step modules"
+    )
+    parser.add_argument(
+        "--modules",
+        nargs="*",
+        default=None,
+        help="Dotted module names to measure (default: environment + all step modules)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per module, the fastest one is reported (default: 3)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=5,
+        help="Number of heaviest direct imports listed per module (default: 5)",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the report as JSON to this file for tracking",
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Exit with an error if importing all step modules takes longer than this",
+    )
+
+    args = parser.parse_args()
+
+    modules = args.modules or discover_modules()
+
+    report = {}
+    for module in modules:
+        report[module] = best_of([module], args.repeat, args.top)
+    report[ALL_STEP_MODULES] = best_of(modules, args.repeat, args.top)
+
+    logging.info("=" * 80)
+    logging.info(f"{'Module':<45} {'Cumulative (ms)':>16} {'Self (ms)':>10}")
+    logging.info("=" * 80)
+    for module, entry in report.items():
+        logging.info(
+            f"{module:<45} {entry['cumulative_ms']:>16.1f} {entry['self_ms']:>10.1f}"
+        )
+        for heavy in entry["top_imports"]:
+            logging.info(f"    {heavy['module']:<41} {heavy['cumulative_ms']:>16.1f}")
+    logging.info("=" * 80)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Wrote import time report to {args.output}")
+
+    total_ms = report[ALL_STEP_MODULES]["cumulative_ms"]
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        logging.error(
+            f"Importing all step modules took {total_ms:.1f} ms, "
+            f"budget is {args.budget_ms:.1f} ms"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,16 +9,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
-from darts.utils.timeseries_generation import (
-    linear_timeseries,
-    sine_timeseries,
-)
 from dotenv import load_dotenv
 from opentelemetry import metrics
-from opentelemetry.exporter.prometheus_remote_write import (
-    PrometheusRemoteWriteMetricsExporter,
-)
 from opentelemetry.sdk.metrics import MeterProvider
 from opentelemetry.sdk.metrics._internal.export import InMemoryMetricReader
 from opentelemetry.sdk.metrics.export import MetricExportResult
@@ -29,6 +21,9 @@ sys.path.insert(0, str(project_root))
 
 from features.steps.env import get_base_url
 from shared.label_utils import parse_labels, sanitize_label_name
+from shared.otel_remote_write import get_exporter
+from shared.remote_write_client import log_connection_stats
+from shared.signal_components import linear_trend, seasonality, time_points
 
 logging.basicConfig(
     level=logging.INFO,
@@ -60,37 +55,21 @@ def create_gauge(name: str, description: str):
 
 def generate_timeseries(start_time, end_time, trend_coefficient, flat_base=5):
     """Generate timeseries with specified trend coefficient and default seasonality/noise."""
-    start_ts = pd.Timestamp(start_time)
     total_minutes = int((end_time - start_time).total_seconds() / 60)
-    freq = "60s"
+    step = timedelta(minutes=1)
 
     # Trend component
     total_hours = total_minutes / 60
     end_trend_value = flat_base + trend_coefficient * (total_hours / 0.95)
-    trend = linear_timeseries(
-        start_value=flat_base,
-        end_value=end_trend_value,
-        start=start_ts,
-        length=total_minutes,
-        freq=freq,
-    )
+    trend = linear_trend(total_minutes, step, flat_base, end_trend_value)
 
     # Seasonality component (daily sinusoidal approximation)
-    seasonality = sine_timeseries(
-        value_frequency=1.0 / 1440.0,
-        value_amplitude=9.25,
-        value_y_offset=10.25,
-        value_phase=np.pi,
-        start=start_ts,
-        length=total_minutes,
-        freq=freq,
+    daily = seasonality(
+        total_minutes, step, amplitude=9.25, y_offset=10.25, phase=np.pi
     )
 
-    combined = trend + seasonality
-    pdf = combined.pd_dataframe()
-    ts_values = pdf.iloc[:, 0].values
-    time_points = list(pdf.index.to_pydatetime())
-    return ts_values, time_points
+    ts_values = trend + daily
+    return ts_values, time_points(start_time, total_minutes, step)
 
 
 def get_remote_write_config(env):
@@ -163,9 +142,9 @@ def push_live_metrics(
 
     # Get remote write config
     config = get_remote_write_config(env)
-    exporter = PrometheusRemoteWriteMetricsExporter(
-        endpoint=config["endpoint"],
-        headers={"Authorization": f"Bearer {config['token']}"},
+    # Keeps one connection open across ticks instead of reconnecting every minute
+    exporter = get_exporter(
+        config["endpoint"], {"Authorization": f"Bearer {config['token']}"}
     )
 
     logging.info(f"Starting live metric push (1 datapoint per minute)")
@@ -197,6 +176,8 @@ def push_live_metrics(
         logging.info(f"Interrupted! Pushed {i+1}/{len(ts_values)} datapoints")
         logging.info("=" * 80)
         sys.exit(0)
+    finally:
+        log_connection_stats()
 
 
 def main():
@@ -9,6 +9,10 @@ Test Scenarios:
 3. One week historical data with trend and seasonality
 4. One week historical data with no trend and seasonality
 5. One day historical data
+
+Scenarios run concurrently in a thread pool (--workers), each generating,
+plotting and backfilling in-process through shared.backfill_pipeline, so one
+scenario's upload overlaps the next one's generation and plotting.
 """
 
 import argparse
@@ -16,45 +20,50 @@ import json
 import logging
 import os
 import re
-import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
 import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
 import requests
-from darts.utils.timeseries_generation import (
-    gaussian_timeseries,
-    linear_timeseries,
-    sine_timeseries,
-)
+from matplotlib.figure import Figure
 from dotenv import load_dotenv
-from jinja2 import Template
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.label_utils import format_labels, parse_labels, sanitize_label_name
+from features.steps.env import get_base_url
+from shared.backfill_pipeline import (
+    BackfillError,
+    BackfillSeries,
+    PhaseTimer,
+    backfill,
+    get_remote_write_config,
+)
+from shared.label_utils import parse_labels, sanitize_label_name
 from shared.step_utils import parse_step_to_minutes, parse_step_to_seconds
+from shared.signal_components import (
+    component_cache_info,
+    gaussian_noise,
+    linear_trend,
+    seasonality,
+    time_points,
+)
 
 logging.basicConfig(
     level=logging.INFO,
-    format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
+    format="[%(asctime)s] [%(levelname)s] [%(threadName)s] [%(filename)s:%(lineno)d] %(message)s",
 )
 
-TEMPLATE = Template(
-    """# HELP {{ metric_name }} {{ description }}
-# TYPE {{ metric_name }} gauge
-{% for i in range(values|length) -%}
-{{ metric_name }}{{ "{" }}{{ labels }}{{ "}" }} {{ values[i] }} {{ timestamps[i] }}
-{% endfor -%}
-"""
-)
+# Devices picked by a running scenario, so concurrent scenarios pick different ones
+_claimed_devices = set()
+_device_lock = threading.Lock()
 
 
 class ScenarioConfig:
@@ -148,7 +157,10 @@ def generate_timeseries(
     granularity_minutes=15,
 ):
     """
-    Generate timeseries with specified parameters using Darts.
+    Generate timeseries with specified parameters.
+
+    Trend and seasonality come from the shared component cache, so scenarios
+    with the same duration and granularity reuse them; only noise is redrawn.
 
     Args:
         start_time: Start datetime
@@ -161,52 +173,24 @@ def generate_timeseries(
     Returns:
         tuple: (ts_values, time_points)
     """
-    start_ts = pd.Timestamp(start_time)
     total_minutes = int((end_time - start_time).total_seconds() / 60)
     total_points = total_minutes // granularity_minutes
-    freq = f"{granularity_minutes * 60}s"
+    step = timedelta(minutes=granularity_minutes)
 
     # Trend component (coefficient per hour)
     total_hours = total_minutes / 60
     end_trend_value = flat_base + trend_coefficient * total_hours
-    trend = linear_timeseries(
-        start_value=flat_base,
-        end_value=end_trend_value,
-        start=start_ts,
-        length=total_points,
-        freq=freq,
-    )
-
-    combined = trend
+    ts_values = linear_trend(total_points, step, flat_base, end_trend_value)
 
     if has_seasonality:
-        steps_per_day = int(24 * 60 / granularity_minutes)
-        seasonality = sine_timeseries(
-            value_frequency=1.0 / steps_per_day,
-            value_amplitude=9.25,
-            value_y_offset=10.25,
-            value_phase=np.pi,
-            start=start_ts,
-            length=total_points,
-            freq=freq,
+        ts_values = ts_values + seasonality(
+            total_points, step, amplitude=9.25, y_offset=10.25, phase=np.pi
         )
-        combined = combined + seasonality
 
     # Noise component
-    noise = gaussian_timeseries(
-        mean=0,
-        std=3,
-        start=start_ts,
-        length=total_points,
-        freq=freq,
-    )
-    combined = combined + noise
-
-    pdf = combined.pd_dataframe()
-    ts_values = pdf.iloc[:, 0].values
-    time_points = list(pdf.index.to_pydatetime())
+    ts_values = ts_values + gaussian_noise(total_points, mean=0, std=3)
 
-    return ts_values, time_points
+    return ts_values, time_points(start_time, total_points, step)
 
 
 def plot_timeseries(
@@ -228,7 +212,10 @@ def plot_timeseries(
         actual_flat_base if actual_flat_base is not None else scenario_config.flat_base
     )
 
-    fig, ax = plt.subplots(figsize=(14, 6))
+    # A Figure per plot instead of pyplot's global state, so scenarios can
+    # plot from several threads
+    fig = Figure(figsize=(14, 6))
+    ax = fig.subplots()
     ax.plot(time_points, ts_values, linewidth=0.8, alpha=0.8, color="#1f77b4")
     ax.set_xlabel("Time", fontsize=12)
     ax.set_ylabel("Value", fontsize=12)
@@ -247,7 +234,7 @@ def plot_timeseries(
         ax.xaxis.set_major_locator(mdates.HourLocator(interval=4))
 
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d %H:%M"))
-    plt.xticks(rotation=45)
+    ax.tick_params(axis="x", labelrotation=45)
 
     stats_text = (
         f"Data Points: {len(ts_values)}\n"
@@ -267,11 +254,10 @@ def plot_timeseries(
         fontsize=9,
     )
 
-    plt.tight_layout()
+    fig.tight_layout()
     plot_filename = f"{scenario_config.name}.png"
     plot_path = os.path.join(output_dir, plot_filename)
-    plt.savefig(plot_path, dpi=300, bbox_inches="tight")
-    plt.close()
+    fig.savefig(plot_path, dpi=300, bbox_inches="tight")
 
     logging.info(f"Saved plot to {plot_path}")
 
@@ -407,7 +393,11 @@ def is_data_present(
 def find_device_without_data(
     metric_name, label_filters, duration: timedelta, max_devices=10
 ):
-    """Find a device that doesn't have data for the specified historical duration."""
+    """Find a device that doesn't have data for the specified historical duration.
+
+    Devices already claimed by another scenario of this run are skipped, and
+    the returned device is claimed.
+    """
     logging.info("=" * 80)
     logging.info(f"Searching for device without data for metric: {metric_name}")
     logging.info(f"Duration: {duration.days} days")
@@ -424,6 +414,10 @@ def find_device_without_data(
             logging.warning("No standalone devices found, using all devices")
             standalone_devices = devices
 
+        standalone_devices = [
+            d for d in standalone_devices if d.get("uid") not in _claimed_devices
+        ]
+
         logging.info(
             f"Checking {min(len(standalone_devices), max_devices)} devices for existing data..."
         )
@@ -448,6 +442,7 @@ def find_device_without_data(
                 logging.info(f"  Device UUID: {device_uid}")
                 logging.info(f"  No data present for the last {duration.days} days")
                 logging.info("")
+                _claimed_devices.add(device_uid)
                 return device_uid, device_name
 
         logging.warning(f"All checked devices ({checked_count}) have existing data")
@@ -455,6 +450,7 @@ def find_device_without_data(
 
         if standalone_devices:
             first_device = standalone_devices[0]
+            _claimed_devices.add(first_device.get("uid"))
             return first_device.get("uid"), first_device.get("name", "Unknown")
 
         return None, None
@@ -465,77 +461,6 @@ def find_device_without_data(
         return None, None
 
 
-def write_openmetrics_file(
-    metric_name, labels_str, values, timestamps, output_file, description
-):
-    """Write timeseries data to OpenMetrics format file."""
-    content = TEMPLATE.render(
-        metric_name=metric_name,
-        labels=labels_str,
-        values=values,
-        timestamps=timestamps,
-        description=description,
-    )
-
-    with open(output_file, "w") as f:
-        f.write(content)
-        f.write("# EOF\n")
-
-    logging.info(f"Wrote {len(values)} datapoints to {output_file}")
-
-
-def run_backfill_script(
-    metric_name,
-    labels,
-    start_epoch,
-    end_epoch,
-    trend_coefficient,
-    flat_base,
-    description,
-    step_size_minutes,
-):
-    """Execute backfill.py script."""
-    backfill_script = os.path.join(project_root, "scripts", "backfill.py")
-
-    if not os.path.exists(backfill_script):
-        raise FileNotFoundError(f"backfill.py not found at {backfill_script}")
-
-    cmd = [
-        "poetry",
-        "run",
-        "python",
-        backfill_script,
-        "--metric-name",
-        metric_name,
-        "--labels",
-        labels,
-        "--start-epoch",
-        str(start_epoch),
-        "--end-epoch",
-        str(end_epoch),
-        "--trend-coefficient",
-        str(trend_coefficient),
-        "--step-size",
-        str(step_size_minutes),
-        "--description",
-        description,
-    ]
-
-    logging.info(f"Running backfill command: {' '.join(cmd)}")
-    logging.info("=" * 80)
-
-    result = subprocess.run(cmd)
-
-    logging.info("=" * 80)
-
-    if result.returncode != 0:
-        logging.error(f"Backfill failed with return code {result.returncode}")
-        return False
-
-    logging.info("Backfill completed successfully")
-    return True
-
-
 def process_scenario(
     scenario_id,
     metric_name,
@@ -547,8 +472,17 @@ def process_scenario(
     output_dir,
     auto_select_device,
     step_size_minutes,
+    remote_write_config=None,
+    timer=None,
 ):
-    """Process a single test scenario."""
+    """Process a single test scenario.
+
+    Args:
+        remote_write_config (dict): Credentials from get_remote_write_config,
+            needed unless dry_run.
+        timer (PhaseTimer): Records the time spent in each phase.
+    """
+    timer = timer or PhaseTimer()
     if scenario_id not in SCENARIOS:
         logging.error(f"Invalid scenario ID: {scenario_id}")
         return False
@@ -605,9 +539,10 @@ def process_scenario(
 
         # Find device without data
         duration = timedelta(days=scenario.days_back)
-        selected_device_uid, selected_device_name = find_device_without_data(
-            metric_name, label_filters, duration
-        )
+        with timer.phase("select device"), _device_lock:
+            selected_device_uid, selected_device_name = find_device_without_data(
+                metric_name, label_filters, duration
+            )
 
         if selected_device_uid:
             # Add uuid to labels
@@ -624,14 +559,16 @@ def process_scenario(
     end_time = datetime.now()
     start_time = end_time - timedelta(days=scenario.days_back)
 
-    ts_values, time_points = generate_timeseries(
-        start_time,
-        end_time,
-        trend_coefficient,
-        flat_base,
-        scenario.has_seasonality,
-        granularity_minutes,
-    )
+    with timer.phase("generate") as info:
+        ts_values, time_points = generate_timeseries(
+            start_time,
+            end_time,
+            trend_coefficient,
+            flat_base,
+            scenario.has_seasonality,
+            granularity_minutes,
+        )
+        info["detail"] = f"{len(ts_values)} datapoints"
 
     logging.info(f"Generated {len(ts_values)} data points")
     logging.info(f"Time range: {time_points[0]} to {time_points[-1]}")
@@ -643,9 +580,10 @@ def process_scenario(
 
     logging.info("")
 
-    plot_timeseries(
-        ts_values, time_points, scenario, output_dir, trend_coefficient, flat_base
-    )
+    with timer.phase("plot"):
+        plot_timeseries(
+            ts_values, time_points, scenario, output_dir, trend_coefficient, flat_base
+        )
 
     if dry_run:
         logging.info("DRY RUN: Skipping actual backfill")
@@ -677,22 +615,48 @@ def process_scenario(
         return True
     else:
         logging.info("Executing backfill...")
-        labels_dict = parse_labels(labels)
-        labels_str = format_labels(labels_dict)
         start_epoch = int(start_time.timestamp())
-        end_epoch = int(end_time.timestamp())
 
-        success = run_backfill_script(
+        # Backfill exactly the plotted series
+        series = BackfillSeries(
             metric_name,
-            labels,
-            start_epoch,
-            end_epoch,
-            trend_coefficient,
-            flat_base,
+            parse_labels(labels),
             description,
-            granularity_minutes,
+            ts_values,
+            np.array([int(tp.timestamp()) for tp in time_points], dtype=np.int64),
         )
-        return success
+        try:
+            backfill(
+                [series],
+                remote_write_config,
+                os.path.join(project_root, "utils"),
+                f"{scenario.name}_{metric_name}",
+                start_epoch,
+                timer=timer,
+            )
+        except BackfillError as e:
+            logging.error(f"Backfill failed: {e}")
+            return False
+
+        logging.info("Backfill completed successfully")
+        return True
+
+
+def run_scenario(scenario_id, **kwargs):
+    """process_scenario in a worker thread named after the scenario.
+
+    Returns:
+        tuple: (success, wall seconds, PhaseTimer)
+    """
+    threading.current_thread().name = f"scenario-{scenario_id}"
+    timer = PhaseTimer()
+    start = time.perf_counter()
+    try:
+        success = process_scenario(scenario_id, timer=timer, **kwargs)
+    except Exception as e:
+        logging.error(f"Error processing scenario {scenario_id}: {e}", exc_info=True)
+        success = False
+    return success, time.perf_counter() - start, timer
 
 
 def main():
@@ -786,6 +750,18 @@ Examples:
         default="5m",
         help="Time granularity for data points (default: 5m). Examples: 5m, 15m, 1h, 30s",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=3,
+        help="Scenarios processed concurrently (default: 3)",
+    )
+    parser.add_argument(
+        "--env",
+        default="staging",
+        help="Environment the scenarios are backfilled to, as for backfill.py "
+        "(default: staging)",
+    )
 
     args = parser.parse_args()
 
@@ -823,32 +799,37 @@ Examples:
         ["1", "2", "3", "4", "5", "6"] if args.scenario == "all" else [args.scenario]
     )
 
-    success_count = 0
-    failure_count = 0
+    # Fetched once and shared by all scenarios
+    remote_write_config = None
+    if not args.dry_run:
+        remote_write_config = get_remote_write_config(get_base_url(args.env))
 
-    for scenario_id in scenarios_to_run:
-        try:
-            success = process_scenario(
+    run_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            scenario_id: executor.submit(
+                run_scenario,
                 scenario_id,
-                args.metric_name,
-                args.labels,
-                args.description,
-                args.trend_coefficient,
-                args.flat_base,
-                args.dry_run,
-                output_dir,
-                args.auto_select_device,
-                step_size_minutes,
+                metric_name=args.metric_name,
+                labels=args.labels,
+                description_override=args.description,
+                trend_coef_override=args.trend_coefficient,
+                flat_base_override=args.flat_base,
+                dry_run=args.dry_run,
+                output_dir=output_dir,
+                auto_select_device=args.auto_select_device,
+                step_size_minutes=step_size_minutes,
+                remote_write_config=remote_write_config,
             )
-            if success:
-                success_count += 1
-            else:
-                failure_count += 1
-        except Exception as e:
-            logging.error(
-                f"Error processing scenario {scenario_id}: {e}", exc_info=True
-            )
-            failure_count += 1
+            for scenario_id in scenarios_to_run
+        }
+        results = {
+            scenario_id: future.result() for scenario_id, future in futures.items()
+        }
+    run_seconds = time.perf_counter() - run_start
+
+    success_count = sum(1 for success, _, _ in results.values() if success)
+    failure_count = len(results) - success_count
 
     logging.info("=" * 80)
     logging.info("EXECUTION SUMMARY")
@@ -856,7 +837,25 @@ Examples:
     logging.info(f"Total scenarios: {len(scenarios_to_run)}")
     logging.info(f"Successful: {success_count}")
     logging.info(f"Failed: {failure_count}")
+    for scenario_id, (success, seconds, timer) in results.items():
+        phases = ", ".join(
+            f"{name} {phase_seconds:.1f}s" for name, phase_seconds, _ in timer.phases
+        )
+        logging.info(
+            f"Scenario {scenario_id} ({SCENARIOS[scenario_id].name}): "
+            f"{'ok' if success else 'FAILED'} in {seconds:.1f}s [{phases}]"
+        )
+    logging.info(
+        f"Wall time: {run_seconds:.1f}s for {len(results)} scenarios "
+        f"({sum(seconds for _, seconds, _ in results.values()):.1f}s of scenario time, "
+        f"{args.workers} workers)"
+    )
     logging.info(f"Plots saved to: {output_dir}")
+    cache_info = component_cache_info()
+    logging.info(
+        f"Signal component cache: {cache_info.hits} hits, "
+        f"{cache_info.misses} misses"
+    )
 
     if args.dry_run:
         logging.info("")
@@ -864,9 +863,8 @@ Examples:
             "DRY RUN MODE - Review the generated plots before executing backfill"
         )
         logging.info("To execute backfill:")
-        logging.info("  1. Uncomment the backfill code in process_scenario() function")
-        logging.info("  2. Run with --dry-run false")
-        logging.info("  3. Or use the generated make commands shown above")
+        logging.info("  1. Run with --dry-run false")
+        logging.info("  2. Or use the generated make commands shown above")
 
     sys.exit(0 if failure_count == 0 else 1)
 
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Upload TSDB blocks concurrently, with retries and resumable progress.
+
+Replaces the sequential `mimirtool backfill` loop of utils/upload_blocks.sh.
+Rerunning with the same block directory skips the blocks recorded in its
+progress file.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from shared.block_uploader import make_backend, upload_blocks
+from shared.retry import DEFAULT_BACKOFF_SECONDS, DEFAULT_MAX_WORKERS, DEFAULT_RETRIES
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Upload TSDB blocks concurrently with retries"
+    )
+    parser.add_argument("--address", required=True, help="Prometheus/Mimir address")
+    parser.add_argument("--id", required=True, help="Tenant (instance) id")
+    parser.add_argument("--key", required=True, help="API key")
+    parser.add_argument(
+        "--block-dir", required=True, help="Directory with one sub-directory per block"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["mimirtool", "http"],
+        default="mimirtool",
+        help="'mimirtool' runs mimirtool backfill per block, 'http' uses the "
+        "block upload API directly (default: mimirtool)",
+    )
+    parser.add_argument(
+        "--mimirtool",
+        default=None,
+        help="Path to mimirtool (default: project utils/mimirtool)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Blocks uploaded concurrently (default: {DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f"Retries per block (default: {DEFAULT_RETRIES})",
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=DEFAULT_BACKOFF_SECONDS,
+        help=f"Base backoff in seconds (default: {DEFAULT_BACKOFF_SECONDS})",
+    )
+    parser.add_argument(
+        "--progress-file",
+        default=None,
+        help="Record of uploaded block ULIDs (default: upload-progress.txt in --block-dir)",
+    )
+
+    args = parser.parse_args()
+
+    mimirtool = args.mimirtool or os.path.join(project_root, "utils", "mimirtool")
+    backend = make_backend(args.backend, args.address, args.id, args.key, mimirtool)
+    summary = upload_blocks(
+        args.block_dir,
+        backend,
+        max_workers=args.workers,
+        retries=args.retries,
+        backoff=args.backoff,
+        progress_file=args.progress_file,
+    )
+    if not summary.ok:
+        logging.error(f"{len(summary.failed)} blocks failed to upload")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Check an OpenMetrics backfill file before promtool and mimirtool see it.
+
+Stops at the first out-of-order or duplicate timestamp, NaN/Inf value,
+malformed label set or missing `# EOF` and prints the offending line.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from shared.openmetrics_validator import (
+    OpenMetricsValidationError,
+    validate_openmetrics_file,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate an OpenMetrics backfill file"
+    )
+    parser.add_argument(
+        "file", help="OpenMetrics file, e.g. utils/*_historical_data.txt"
+    )
+    parser.add_argument(
+        "--allow-non-finite",
+        action="store_true",
+        help="Accept NaN and +/-Inf values",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        validate_openmetrics_file(args.file, allow_non_finite=args.allow_non_finite)
+    except OpenMetricsValidationError as e:
+        logging.error(f"{args.file}: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""Shared backfill pipeline: generate, write blocks, fetch credentials, upload.
+
+Used by both scripts/backfill.py and scripts/test_historical_scenarios.py so
+that scenarios are backfilled in-process instead of through a subprocess per
+scenario.
+
+backfill() validates a list of BackfillSeries, writes them to TSDB blocks
+(natively, or through OpenMetrics and promtool), uploads them and records how long each phase
+took in a PhaseTimer. Failures raise BackfillError instead of exiting, so
+callers running several backfills at once can report each one.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+import requests
+import yaml
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from shared import openmetrics, tsdb_blocks
+from shared.block_uploader import make_backend, upload_blocks
+from shared.openmetrics_validator import (
+    OpenMetricsValidationError,
+    expected_sample_counts,
+    validate_families,
+    validate_openmetrics_file,
+)
+from shared.promtool_blocks import (
+    DEFAULT_PROMTOOL_WORKERS,
+    PromtoolError,
+    create_blocks_streamed,
+)
+from shared.label_utils import format_labels, parse_labels, sanitize_label_name
+from shared.retry import DEFAULT_MAX_WORKERS
+from shared.signal_components import linear_trend, seasonality, time_points
+from shared.step_utils import parse_step_to_minutes
+
+
+class BackfillError(Exception):
+    """Writing or uploading the backfill failed."""
+
+
+def generate_timeseries(
+    start_time, end_time, trend_coefficient, granularity_minutes=15, flat_base=5
+):
+    """Generate timeseries with specified trend coefficient and default seasonality/noise."""
+    total_minutes = int((end_time - start_time).total_seconds() / 60)
+    total_points = total_minutes // granularity_minutes
+    step = timedelta(minutes=granularity_minutes)
+
+    # Trend component (coefficient per hour)
+    total_hours = total_minutes / 60
+    end_trend_value = flat_base + trend_coefficient * total_hours
+    trend = linear_trend(total_points, step, flat_base, end_trend_value)
+
+    # Seasonality component (daily sinusoidal approximation)
+    daily = seasonality(total_points, step, amplitude=9.25, y_offset=10.25, phase=np.pi)
+
+    ts_values = trend + daily
+    return ts_values, time_points(start_time, total_points, step)
+
+
+def get_remote_write_config(base_url):
+    """Fetch remote write configuration from GCM.
+
+    Args:
+        base_url (str): CDO base URL, e.g. features.steps.env.get_base_url(env).
+    """
+    load_dotenv()
+
+    cdo_token = os.getenv("CDO_TOKEN")
+    if not cdo_token:
+        raise ValueError("CDO_TOKEN environment variable not set in .env file")
+
+    gcm_stack_url = (
+        f"{base_url}/api/platform/ai-ops-tenant-services/v2/timeseries-stack"
+    )
+
+    logging.info(f"Fetching GCM stack configuration from {gcm_stack_url}")
+
+    retry = Retry(
+        total=3,
+        backoff_factor=2,
+        status_forcelist=[i for i in range(400, 600)],
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+
+    response = session.get(
+        gcm_stack_url,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {cdo_token}",
+        },
+        timeout=180,
+    )
+
+    if response.status_code != 200:
+        raise Exception(
+            f"Failed to fetch GCM config: {response.status_code} - {response.text}"
+        )
+
+    gcm_stack_config = response.json()
+
+    return {
+        "url": gcm_stack_config["hmInstancePromUrl"].removesuffix("/api/prom/push"),
+        "username": gcm_stack_config["hmInstancePromId"],
+        "password": gcm_stack_config["prometheusToken"],
+    }
+
+
+class ManifestMetric(BaseModel):
+    """One metric of a manifest; unset signal fields fall back to the manifest's."""
+
+    metric_name: str
+    labels: Union[str, Dict[str, str], None] = None
+    label_sets: List[Union[str, Dict[str, str]]] = []
+    trend_coefficient: Optional[float] = None
+    flat_base: Optional[float] = None
+    step_size: Union[str, int, None] = None
+    description: Optional[str] = None
+
+    def label_dicts(self) -> List[dict]:
+        """``labels`` and every entry of ``label_sets`` as label dicts."""
+        label_sets = ([self.labels] if self.labels is not None else []) + list(
+            self.label_sets
+        )
+        return [
+            (
+                parse_labels(label_set)
+                if isinstance(label_set, str)
+                else {sanitize_label_name(k): str(v) for k, v in label_set.items()}
+            )
+            for label_set in label_sets or [""]
+        ]
+
+
+class BackfillManifest(BaseModel):
+    """Many metrics and label sets backfilled into one shared block set."""
+
+    start_epoch: Optional[int] = None
+    end_epoch: Optional[int] = None
+    trend_coefficient: float = 0.1
+    flat_base: float = 5.0
+    step_size: Union[str, int] = "5m"
+    description: str = "Backfilled metric data"
+    metrics: List[ManifestMetric]
+
+
+class BackfillSeries(NamedTuple):
+    metric_name: str
+    labels: dict
+    description: str
+    values: np.ndarray
+    timestamps: np.ndarray
+
+
+def load_manifest(path) -> BackfillManifest:
+    """Read a manifest from a .json file, or from YAML for any other extension."""
+    with open(path) as f:
+        if str(path).endswith(".json"):
+            content = json.load(f)
+        else:
+            content = yaml.safe_load(f)
+    return BackfillManifest.model_validate(content)
+
+
+def generate_manifest_series(
+    manifest: BackfillManifest, start_time, end_time
+) -> List[BackfillSeries]:
+    """Generate every label set of every metric in the manifest.
+
+    Label sets with the same trend coefficient, flat base and step share
+    one generated array.
+    """
+    generated = {}
+    series = []
+    for metric in manifest.metrics:
+        signal = (
+            (
+                metric.trend_coefficient
+                if metric.trend_coefficient is not None
+                else manifest.trend_coefficient
+            ),
+            metric.flat_base if metric.flat_base is not None else manifest.flat_base,
+            parse_step_to_minutes(metric.step_size or manifest.step_size),
+        )
+        if signal not in generated:
+            trend_coefficient, flat_base, step_size_minutes = signal
+            values, points = generate_timeseries(
+                start_time, end_time, trend_coefficient, step_size_minutes, flat_base
+            )
+            timestamps = np.array([int(tp.timestamp()) for tp in points], np.int64)
+            generated[signal] = (values, timestamps)
+        values, timestamps = generated[signal]
+        for labels in metric.label_dicts():
+            series.append(
+                BackfillSeries(
+                    metric.metric_name,
+                    labels,
+                    metric.description or manifest.description,
+                    values,
+                    timestamps,
+                )
+            )
+    return series
+
+
+class PhaseTimer:
+    """Wall time of each phase of a backfill, logged as a table."""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str, detail: str = ""):
+        """Time the block; it may set the yielded dict's "detail" for the table."""
+        info = {"detail": detail}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.phases.append((name, time.perf_counter() - start, info["detail"]))
+
+    def log_table(self):
+        total = sum(seconds for _, seconds, _ in self.phases)
+        width = max([len(name) for name, _, _ in self.phases] + [len("total")])
+        logging.info(f"{'phase':<{width}}  {'seconds':>9}  {'share':>6}  detail")
+        for name, seconds, detail in self.phases + [("total", total, "")]:
+            share = seconds / total * 100 if total else 0.0
+            logging.info(f"{name:<{width}}  {seconds:>9.2f}  {share:>5.1f}%  {detail}")
+
+
+def openmetrics_families(
+    series_list: List[BackfillSeries],
+) -> List[openmetrics.OpenMetricsFamily]:
+    """Group the series into one OpenMetrics family per metric name."""
+    families = {}
+    for series in series_list:
+        family = families.setdefault(
+            series.metric_name,
+            openmetrics.OpenMetricsFamily(
+                metric_name=series.metric_name,
+                description=series.description,
+                series=[],
+            ),
+        )
+        family.series.append(
+            openmetrics.OpenMetricsSeries(
+                format_labels(series.labels), series.timestamps, series.values
+            )
+        )
+    return list(families.values())
+
+
+def write_openmetrics_file(series_list: List[BackfillSeries], output_file):
+    """Write timeseries data to OpenMetrics format file, one family per metric."""
+    openmetrics.write_openmetrics_file(output_file, openmetrics_families(series_list))
+
+    datapoints = sum(len(series.values) for series in series_list)
+    logging.info(f"Wrote {datapoints} datapoints to {output_file}")
+
+
+def write_native_blocks(series_list: List[BackfillSeries], block_dir):
+    """Write timeseries data straight to TSDB blocks, without promtool."""
+    # Same as backfill.sh: start from an empty block directory
+    shutil.rmtree(block_dir, ignore_errors=True)
+    ulids = tsdb_blocks.write_blocks(
+        block_dir,
+        [
+            tsdb_blocks.BlockSeries(
+                labels={"__name__": series.metric_name, **series.labels},
+                timestamps=series.timestamps * 1000,
+                values=series.values,
+            )
+            for series in series_list
+        ],
+    )
+
+    datapoints = sum(len(series.values) for series in series_list)
+    logging.info(f"Wrote {datapoints} datapoints to {len(ulids)} blocks in {block_dir}")
+
+
+def write_promtool_blocks_streamed(
+    series_list: List[BackfillSeries],
+    utils_dir,
+    block_dir,
+    workers: int = DEFAULT_PROMTOOL_WORKERS,
+):
+    """Build blocks with promtool from time-sharded OpenMetrics files.
+
+    Only a few shards are on disk at a time, ``workers`` promtool processes
+    build blocks from them while the next are written, and the merged blocks
+    are checked for overlaps and missing samples.
+    """
+    # Same as backfill.sh: start from an empty block directory
+    shutil.rmtree(block_dir, ignore_errors=True)
+    try:
+        create_blocks_streamed(
+            os.path.join(utils_dir, "promtool"),
+            openmetrics_families(series_list),
+            block_dir,
+            work_dir=utils_dir,
+            workers=workers,
+        )
+    except PromtoolError as e:
+        raise BackfillError(str(e)) from e
+
+
+def _run_utils_script(utils_dir, script_name, args):
+    """Run a shell script from utils_dir, raising BackfillError if it fails."""
+    script = os.path.join(utils_dir, script_name)
+
+    if not os.path.exists(script):
+        raise FileNotFoundError(f"{script_name} not found at {script}")
+
+    cmd = [script, *args]
+
+    logging.info(f"Running backfill command: {' '.join(cmd)}")
+    logging.info("=" * 80)
+
+    # Run without capturing output so logs stream in real-time
+    result = subprocess.run(cmd)
+
+    logging.info("=" * 80)
+
+    if result.returncode != 0:
+        raise BackfillError(
+            f"{script_name} failed with return code {result.returncode}"
+        )
+
+    logging.info("Backfill completed successfully")
+
+
+def run_backfill(remote_write_config, utils_dir, data_block_dir, historical_data_file):
+    """Execute backfill.sh script to build blocks with promtool and upload them."""
+    _run_utils_script(
+        utils_dir,
+        "backfill.sh",
+        [
+            remote_write_config["url"],
+            remote_write_config["username"],
+            remote_write_config["password"],
+            utils_dir,
+            data_block_dir,
+            historical_data_file,
+        ],
+    )
+
+
+def run_block_upload(
+    remote_write_config,
+    utils_dir,
+    data_block_dir,
+    backend="mimirtool",
+    max_workers=DEFAULT_MAX_WORKERS,
+):
+    """Upload already written blocks concurrently, then remove them."""
+    block_dir = f"{utils_dir}{data_block_dir}"
+    summary = upload_blocks(
+        block_dir,
+        make_backend(
+            backend,
+            remote_write_config["url"],
+            remote_write_config["username"],
+            remote_write_config["password"],
+            os.path.join(utils_dir, "mimirtool"),
+        ),
+        max_workers=max_workers,
+    )
+
+    if not summary.ok:
+        # Keep the blocks so scripts/upload_blocks.py can resume the upload
+        raise BackfillError(
+            f"{len(summary.failed)} blocks not uploaded, "
+            f"resume with scripts/upload_blocks.py --block-dir {block_dir}"
+        )
+
+    shutil.rmtree(block_dir, ignore_errors=True)
+    logging.info("Backfill completed successfully")
+
+
+def backfill(
+    series_list: List[BackfillSeries],
+    remote_write_config: dict,
+    utils_dir: str,
+    name: str,
+    start_epoch: int,
+    block_writer: str = "promtool",
+    upload_backend: str = "mimirtool",
+    upload_workers: int = DEFAULT_MAX_WORKERS,
+    timer: Optional[PhaseTimer] = None,
+    promtool_workers: int = DEFAULT_PROMTOOL_WORKERS,
+):
+    """Write ``series_list`` as one block set and upload it.
+
+    Args:
+        series_list: Series to backfill.
+        remote_write_config (dict): url, username and password, as returned
+            by get_remote_write_config.
+        utils_dir (str): Directory with backfill.sh and mimirtool; blocks and
+            files are written there.
+        name (str): Prefix of the block directory and OpenMetrics file; give
+            concurrent backfills different names.
+        start_epoch (int): Part of the OpenMetrics file name.
+        block_writer (str): "promtool" (one OpenMetrics file and
+            backfill.sh), "promtool-stream" (time-sharded files streamed into
+            promtool) or "native" (opt-in; shared/tsdb_blocks has not been
+            checked against promtool or Mimir yet).
+        upload_backend (str): "mimirtool" or "http", except for "promtool".
+        upload_workers (int): Blocks uploaded concurrently.
+        timer (PhaseTimer): Records the write and upload phases.
+        promtool_workers (int): promtool processes run in parallel for
+            "promtool-stream".
+
+    Raises:
+        BackfillError: If the series or the OpenMetrics file fail validation,
+            or promtool or the upload fails.
+    """
+    timer = timer or PhaseTimer()
+    historical_data_file = f"{name}_backfill_{start_epoch}.txt"
+    data_block_dir = f"/{name}_backfill_data/"
+
+    if block_writer in ("native", "promtool-stream"):
+        with timer.phase("validate", f"{len(series_list)} series"):
+            try:
+                validate_families(openmetrics_families(series_list))
+            except OpenMetricsValidationError as e:
+                raise BackfillError(f"Invalid backfill data: {e}") from e
+        if block_writer == "native":
+            with timer.phase("write blocks", data_block_dir):
+                write_native_blocks(series_list, f"{utils_dir}{data_block_dir}")
+        else:
+            with timer.phase("promtool (streamed)", f"{promtool_workers} workers"):
+                write_promtool_blocks_streamed(
+                    series_list,
+                    utils_dir,
+                    f"{utils_dir}{data_block_dir}",
+                    workers=promtool_workers,
+                )
+        with timer.phase("upload", f"{upload_workers} workers"):
+            run_block_upload(
+                remote_write_config,
+                utils_dir,
+                data_block_dir,
+                backend=upload_backend,
+                max_workers=upload_workers,
+            )
+    else:
+        with timer.phase("write openmetrics", historical_data_file):
+            write_openmetrics_file(
+                series_list, os.path.join(utils_dir, historical_data_file)
+            )
+        with timer.phase("validate", historical_data_file):
+            try:
+                validate_openmetrics_file(
+                    os.path.join(utils_dir, historical_data_file),
+                    expected_sample_counts(openmetrics_families(series_list)),
+                )
+            except OpenMetricsValidationError as e:
+                raise BackfillError(f"Invalid {historical_data_file}: {e}") from e
+        with timer.phase("promtool + upload", "backfill.sh"):
+            run_backfill(
+                remote_write_config, utils_dir, data_block_dir, historical_data_file
+            )
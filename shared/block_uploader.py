@@ -0,0 +1,338 @@
+"""Shared concurrent TSDB block uploader.
+
+Uploads block directories to Mimir for the behave backfill step, the backfill
+pipeline of scripts/backfill.py and scripts/upload_blocks.py.
+
+Uploads every block directory under a root with a bounded thread pool,
+replacing the sequential `mimirtool backfill` loop. Each block is retried with
+full-jitter exponential backoff, and the ULIDs of finished blocks are appended
+to a progress file, so a rerun after a failure only uploads what is missing.
+
+Two backends:
+  MimirtoolBackend - runs `mimirtool backfill` for one block at a time
+  HttpBackend      - speaks Mimir's block upload API directly:
+                     POST /api/v1/upload/block/{ulid}/start     (meta.json)
+                     POST /api/v1/upload/block/{ulid}/files?path=...
+                     POST /api/v1/upload/block/{ulid}/finish
+                     GET  /api/v1/upload/block/{ulid}/check      (until complete)
+"""
+
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional
+
+import requests
+
+from shared.retry import (
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_RETRIES,
+    call_with_retries,
+)
+
+PROGRESS_FILE_NAME = "upload-progress.txt"
+
+
+class UploadError(Exception):
+    """A block upload failed; ``retryable`` says whether trying again can help."""
+
+    def __init__(
+        self, message: str, retryable: bool = True, status_code: Optional[int] = None
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+
+
+class BlockUploadResult(NamedTuple):
+    ulid: str
+    size_bytes: int
+    seconds: float
+    attempts: int
+    error: Optional[str] = None
+
+
+class UploadSummary(NamedTuple):
+    uploaded: List[BlockUploadResult]
+    skipped: List[str]
+    failed: List[BlockUploadResult]
+    seconds: float
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(result.size_bytes for result in self.uploaded)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def list_blocks(block_root: str) -> List[str]:
+    """ULIDs of the block directories (those with a meta.json) under block_root."""
+    return sorted(
+        name
+        for name in os.listdir(block_root)
+        if os.path.isfile(os.path.join(block_root, name, "meta.json"))
+    )
+
+
+def block_files(block_dir: str) -> List[str]:
+    """Paths of the files Mimir accepts for a block, relative to block_dir.
+
+    meta.json is sent on its own and tombstones are not uploaded.
+    """
+    chunks_dir = os.path.join(block_dir, "chunks")
+    return ["index"] + [f"chunks/{name}" for name in sorted(os.listdir(chunks_dir))]
+
+
+def _block_size(block_dir: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(block_dir, f)) for f in block_files(block_dir)
+    )
+
+
+def read_progress(progress_file: str) -> set:
+    """ULIDs recorded as uploaded in progress_file (empty if it does not exist)."""
+    if not os.path.exists(progress_file):
+        return set()
+    with open(progress_file) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class MimirtoolBackend:
+    """Upload one block with `mimirtool backfill`."""
+
+    def __init__(self, mimirtool: str, address: str, tenant_id: str, key: str):
+        self.mimirtool = mimirtool
+        self.address = address
+        self.tenant_id = tenant_id
+        self.key = key
+
+    def upload(self, block_dir: str):
+        result = subprocess.run(
+            [
+                self.mimirtool,
+                "backfill",
+                f"--address={self.address}",
+                f"--id={self.tenant_id}",
+                f"--key={self.key}",
+                block_dir,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise UploadError(
+                f"mimirtool exited with {result.returncode}: {result.stderr.strip()}"
+            )
+
+
+class HttpBackend:
+    """Upload one block through Mimir's block upload HTTP API.
+
+    Authenticates like mimirtool: basic auth with the tenant id and key, plus
+    the X-Scope-OrgID header. One requests.Session is kept per worker thread.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        tenant_id: str,
+        key: str,
+        timeout: float = 300,
+        check_interval: float = 1.0,
+        check_timeout: float = 600,
+    ):
+        self.address = address.rstrip("/")
+        self.tenant_id = tenant_id
+        self.key = key
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.auth = (self.tenant_id, self.key)
+            session.headers["X-Scope-OrgID"] = self.tenant_id
+            self._local.session = session
+        return session
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        try:
+            response = self._session().request(
+                method, url, timeout=self.timeout, **kwargs
+            )
+        except requests.RequestException as e:
+            raise UploadError(f"{method} {url} failed: {e}") from e
+        if response.status_code >= 400:
+            # Client errors other than throttling will not go away on a retry
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise UploadError(
+                f"{method} {url} returned {response.status_code}: {response.text}",
+                retryable=retryable,
+                status_code=response.status_code,
+            )
+        return response
+
+    def upload(self, block_dir: str):
+        with open(os.path.join(block_dir, "meta.json")) as f:
+            meta = json.load(f)
+        files = block_files(block_dir)
+        meta["thanos"] = {
+            "labels": {},
+            "downsample": {"resolution": 0},
+            "source": "upload",
+            "files": [
+                {
+                    "rel_path": rel_path,
+                    "size_bytes": os.path.getsize(os.path.join(block_dir, rel_path)),
+                }
+                for rel_path in files
+            ],
+        }
+
+        url = f"{self.address}/api/v1/upload/block/{meta['ulid']}"
+        try:
+            self._request("POST", f"{url}/start", json=meta)
+        except UploadError as e:
+            # 409: the block is already in the store
+            if e.status_code == 409:
+                return
+            raise
+        for rel_path in files:
+            with open(os.path.join(block_dir, rel_path), "rb") as f:
+                self._request("POST", f"{url}/files", params={"path": rel_path}, data=f)
+        self._request("POST", f"{url}/finish")
+        self._wait_until_complete(url)
+
+    def _wait_until_complete(self, url: str):
+        deadline = time.monotonic() + self.check_timeout
+        while True:
+            state = self._request("GET", f"{url}/check").json()
+            result = state.get("result")
+            if result == "complete":
+                return
+            if result == "failed":
+                raise UploadError(
+                    f"Validation of {url} failed: {state.get('error')}", retryable=False
+                )
+            if time.monotonic() > deadline:
+                raise UploadError(f"Validation of {url} did not finish in time")
+            time.sleep(self.check_interval)
+
+
+def make_backend(name: str, address: str, tenant_id: str, key: str, mimirtool: str):
+    """Build the backend called ``name``: 'mimirtool' or 'http'."""
+    if name == "http":
+        return HttpBackend(address, tenant_id, key)
+    if name == "mimirtool":
+        return MimirtoolBackend(mimirtool, address, tenant_id, key)
+    raise ValueError(f"Unknown block upload backend {name!r}")
+
+
+def upload_block(
+    backend,
+    block_dir: str,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> BlockUploadResult:
+    """Upload one block, retrying retryable failures up to ``retries`` times."""
+    ulid = os.path.basename(os.path.normpath(block_dir))
+    size_bytes = _block_size(block_dir)
+    start = time.perf_counter()
+    attempts, error = call_with_retries(
+        lambda: backend.upload(block_dir),
+        UploadError,
+        f"Upload of block {ulid}",
+        retries=retries,
+        backoff=backoff,
+        sleep=sleep,
+    )
+    return BlockUploadResult(
+        ulid,
+        size_bytes,
+        time.perf_counter() - start,
+        attempts,
+        None if error is None else str(error),
+    )
+
+
+def upload_blocks(
+    block_root: str,
+    backend,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    progress_file: Optional[str] = None,
+) -> UploadSummary:
+    """Upload every block under block_root concurrently and log a summary.
+
+    Args:
+        block_root (str): Directory containing one sub-directory per block.
+        backend: MimirtoolBackend or HttpBackend (anything with upload(block_dir)).
+        max_workers (int): Blocks uploaded at the same time.
+        retries (int): Retries per block after the first attempt.
+        backoff (float): Base of the jittered exponential backoff in seconds.
+        progress_file (str): Record of uploaded ULIDs, one per line. Blocks
+            listed there are skipped. Defaults to upload-progress.txt in
+            block_root.
+
+    Returns:
+        UploadSummary: Uploaded, skipped and failed blocks.
+    """
+    if progress_file is None:
+        progress_file = os.path.join(block_root, PROGRESS_FILE_NAME)
+    done = read_progress(progress_file)
+    ulids = list_blocks(block_root)
+    skipped = [ulid for ulid in ulids if ulid in done]
+    pending = [ulid for ulid in ulids if ulid not in done]
+    if skipped:
+        logging.info(f"Skipping {len(skipped)} blocks already uploaded")
+
+    lock = threading.Lock()
+    uploaded, failed = [], []
+
+    def run(ulid: str):
+        result = upload_block(
+            backend, os.path.join(block_root, ulid), retries=retries, backoff=backoff
+        )
+        with lock:
+            if result.error is None:
+                uploaded.append(result)
+                with open(progress_file, "a") as f:
+                    f.write(ulid + "\n")
+                logging.info(
+                    f"Uploaded block {ulid} ({len(uploaded)}/{len(pending)}) "
+                    f"in {result.seconds:.1f}s"
+                )
+            else:
+                failed.append(result)
+                logging.error(f"Giving up on block {ulid}: {result.error}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(run, pending))
+    summary = UploadSummary(uploaded, skipped, failed, time.perf_counter() - start)
+    log_summary(summary)
+    return summary
+
+
+def log_summary(summary: UploadSummary):
+    seconds = max(summary.seconds, 1e-9)
+    megabytes = summary.size_bytes / 1e6
+    retried = sum(1 for result in summary.uploaded if result.attempts > 1)
+    logging.info(
+        f"Uploaded {len(summary.uploaded)} blocks ({megabytes:.1f} MB) in "
+        f"{summary.seconds:.1f}s: {len(summary.uploaded) / seconds * 60:.1f} "
+        f"blocks/min, {megabytes / seconds:.2f} MB/s; {retried} needed retries, "
+        f"{len(summary.skipped)} skipped, {len(summary.failed)} failed"
+    )
@@ -0,0 +1,282 @@
+"""Shared size-aware planner choosing between remote write and block backfill.
+
+Decides how ingest_generated_data in features/steps/common_steps.py ingests each
+series; the planner benchmark in scripts/benchmarks.py checks it.
+
+Remote write is cheap to start but pays per request and per sample, and the
+ingester rejects samples older than its append window. Block backfill pays a
+fixed cost (writing blocks, uploading, validation) plus a cost per 12h block,
+but accepts any age. For every series the planner splits the samples at the
+oldest time remote write still accepts: older samples must go through blocks,
+newer ones go whichever way the cost model predicts is cheaper. A series is
+then planned as "remote-write", "blocks" or "hybrid" (old part as blocks,
+recent part through remote write). The cost model never moves a series
+that reaches into the last query_store_after (12h) to blocks: queries over
+that range are answered by the ingesters alone, so uploaded blocks would not
+show up in them until the data is older. Samples older than the append
+window have no choice, though, so samples between the append window (about
+50 minutes) and 12h old still go into blocks. The plan counts them in
+unqueryable_block_samples and log_plan warns about them.
+
+The append window is the TSDB head's in-order window (an hour behind the
+newest sample it has) plus the tenant's out-of-order window, which is 0
+unless the Mimir tenant configures out_of_order_time_window.
+"""
+
+import logging
+import math
+from datetime import timedelta
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from shared.tsdb_blocks import DEFAULT_BLOCK_DURATION
+
+REMOTE_WRITE = "remote-write"
+BLOCKS = "blocks"
+HYBRID = "hybrid"
+
+# Samples up to this far behind the head are appended in order
+HEAD_APPEND_WINDOW = timedelta(hours=1)
+# Room for the time that passes between planning and the last remote write
+DEFAULT_SAFETY_MARGIN = timedelta(minutes=10)
+# Mimir's querier.query_store_after: newer data is only read from ingesters
+QUERY_STORE_AFTER = timedelta(hours=12)
+
+
+class CostModel(NamedTuple):
+    """Throughput and latency figures the predictions are based on.
+
+    The defaults are rough figures for the OpenTelemetry remote-write path
+    and for the native block writer with mimirtool uploads; adjust them when
+    the predicted and actual durations logged by log_outcome drift apart.
+    """
+
+    remote_write_samples_per_second: float = 40_000
+    remote_write_request_seconds: float = 0.3
+    max_samples_per_request: int = 10_000
+    block_samples_per_second: float = 1_000_000
+    block_seconds: float = 4.0
+    block_fixed_seconds: float = 30.0
+
+    def remote_write_requests(self, samples: int) -> int:
+        return math.ceil(samples / self.max_samples_per_request)
+
+    def remote_write_cost(self, samples: int) -> float:
+        return (
+            samples / self.remote_write_samples_per_second
+            + self.remote_write_requests(samples) * self.remote_write_request_seconds
+        )
+
+    def block_cost(self, samples: int, blocks: int) -> float:
+        return samples / self.block_samples_per_second + blocks * self.block_seconds
+
+
+class SeriesPlan(NamedTuple):
+    """How one series is ingested.
+
+    Samples before ``split`` are backfilled as blocks, the rest are remote
+    written.
+    """
+
+    method: str
+    split: int
+    samples: int
+
+
+class IngestionPlan(NamedTuple):
+    series: List[SeriesPlan]
+    batch_size: int
+    remote_write_samples: int
+    remote_write_requests: int
+    remote_write_seconds: float
+    block_samples: int
+    blocks: int
+    block_seconds: float
+    # Block samples newer than query_store_after, not queryable until older
+    unqueryable_block_samples: int = 0
+
+    @property
+    def predicted_seconds(self) -> float:
+        return self.remote_write_seconds + self.block_seconds
+
+    def counts(self) -> dict:
+        counts = {REMOTE_WRITE: 0, BLOCKS: 0, HYBRID: 0}
+        for series_plan in self.series:
+            counts[series_plan.method] += 1
+        return counts
+
+
+def _block_windows(timestamps: np.ndarray, block_duration: timedelta) -> set:
+    if not len(timestamps):
+        return set()
+    return set(np.unique(timestamps // int(block_duration.total_seconds())).tolist())
+
+
+def _method(split: int, samples: int) -> str:
+    if split == 0:
+        return REMOTE_WRITE
+    if split == samples:
+        return BLOCKS
+    return HYBRID
+
+
+def plan_ingestion(
+    timestamps: Sequence[np.ndarray],
+    now: float,
+    cost_model: CostModel = CostModel(),
+    out_of_order_window: timedelta = timedelta(0),
+    safety_margin: timedelta = DEFAULT_SAFETY_MARGIN,
+    block_duration: timedelta = DEFAULT_BLOCK_DURATION,
+    method: Optional[str] = None,
+) -> IngestionPlan:
+    """Plan the ingestion of series with the given sorted timestamps.
+
+    Args:
+        timestamps: Epoch-second timestamps of each series, ascending.
+        now (float): Epoch seconds the append window is measured from.
+        cost_model (CostModel): Figures the costs are predicted with.
+        out_of_order_window (timedelta): The tenant's out-of-order window.
+        safety_margin (timedelta): Subtracted from the append window.
+        block_duration (timedelta): Duration of the backfilled blocks.
+        method (str): Force REMOTE_WRITE or BLOCKS for every series instead
+            of choosing by cost.
+
+    Returns:
+        IngestionPlan: Per-series plans and the predicted costs.
+
+    Raises:
+        ValueError: If REMOTE_WRITE is forced for samples older than the
+            append window.
+    """
+    cutoff = (
+        now - (HEAD_APPEND_WINDOW + out_of_order_window - safety_margin).total_seconds()
+    )
+    store_cutoff = now - QUERY_STORE_AFTER.total_seconds()
+    timestamps = [np.asarray(ts, dtype=np.int64) for ts in timestamps]
+    # Samples before the split are too old for remote write
+    splits = [int(np.searchsorted(ts, cutoff, side="left")) for ts in timestamps]
+
+    if method == REMOTE_WRITE and any(splits):
+        raise ValueError(
+            f"{sum(splits)} samples are older than the remote write window "
+            f"of {HEAD_APPEND_WINDOW + out_of_order_window}"
+        )
+    if method == BLOCKS:
+        splits = [len(ts) for ts in timestamps]
+    elif method is None:
+        splits = _choose_splits(
+            timestamps,
+            splits,
+            store_cutoff,
+            cost_model,
+            block_duration,
+        )
+    elif method != REMOTE_WRITE:
+        raise ValueError(f"Unknown ingestion method {method!r}")
+
+    remote_write_samples = sum(len(ts) - split for ts, split in zip(timestamps, splits))
+    block_samples = sum(splits)
+    unqueryable_block_samples = sum(
+        split - int(np.searchsorted(ts[:split], store_cutoff, side="left"))
+        for ts, split in zip(timestamps, splits)
+    )
+    windows = set()
+    for ts, split in zip(timestamps, splits):
+        windows |= _block_windows(ts[:split], block_duration)
+    block_seconds = (
+        cost_model.block_fixed_seconds
+        + cost_model.block_cost(block_samples, len(windows))
+        if block_samples
+        else 0.0
+    )
+    # Requests are made per series, so each pays for its own partial batch
+    remote_write_requests = sum(
+        cost_model.remote_write_requests(len(ts) - split)
+        for ts, split in zip(timestamps, splits)
+    )
+    remote_write_seconds = (
+        remote_write_samples / cost_model.remote_write_samples_per_second
+        + remote_write_requests * cost_model.remote_write_request_seconds
+    )
+    return IngestionPlan(
+        series=[
+            SeriesPlan(_method(split, len(ts)), split, len(ts))
+            for ts, split in zip(timestamps, splits)
+        ],
+        batch_size=cost_model.max_samples_per_request,
+        remote_write_samples=remote_write_samples,
+        remote_write_requests=remote_write_requests,
+        remote_write_seconds=remote_write_seconds,
+        block_samples=block_samples,
+        blocks=len(windows),
+        block_seconds=block_seconds,
+        unqueryable_block_samples=unqueryable_block_samples,
+    )
+
+
+def _choose_splits(
+    timestamps: List[np.ndarray],
+    forced_splits: List[int],
+    store_cutoff: float,
+    cost_model: CostModel,
+    block_duration: timedelta,
+) -> List[int]:
+    """Move the recent part of a series to blocks where that is cheaper.
+
+    Blocks are shared by all series, so a series only pays for the block
+    windows no earlier series needed. The fixed block cost is only paid once;
+    when no series has to use blocks, moving series to blocks must save more
+    than that fixed cost in total. Series newer than ``store_cutoff`` keep
+    their recent part on remote write so it is queryable right away.
+    """
+    windows = set()
+    for ts, split in zip(timestamps, forced_splits):
+        windows |= _block_windows(ts[:split], block_duration)
+
+    splits = list(forced_splits)
+    saved = 0.0
+    for index, (ts, split) in enumerate(zip(timestamps, forced_splits)):
+        recent = ts[split:]
+        if not len(recent) or recent[-1] >= store_cutoff:
+            continue
+        new_windows = _block_windows(recent, block_duration) - windows
+        remote_write_cost = cost_model.remote_write_cost(len(recent))
+        block_cost = cost_model.block_cost(len(recent), len(new_windows))
+        if block_cost < remote_write_cost:
+            splits[index] = len(ts)
+            windows |= new_windows
+            saved += remote_write_cost - block_cost
+
+    if not any(forced_splits) and saved <= cost_model.block_fixed_seconds:
+        return list(forced_splits)
+    return splits
+
+
+def log_plan(plan: IngestionPlan):
+    counts = plan.counts()
+    logging.info(
+        f"Ingestion plan: {counts[REMOTE_WRITE]} series by remote write, "
+        f"{counts[BLOCKS]} as blocks, {counts[HYBRID]} hybrid; "
+        f"{plan.remote_write_samples} samples in {plan.remote_write_requests} "
+        f"remote write requests (~{plan.remote_write_seconds:.1f}s), "
+        f"{plan.block_samples} samples in {plan.blocks} blocks "
+        f"(~{plan.block_seconds:.1f}s); predicted {plan.predicted_seconds:.1f}s"
+    )
+    if plan.unqueryable_block_samples:
+        logging.warning(
+            f"{plan.unqueryable_block_samples} block samples are newer than "
+            f"query_store_after ({QUERY_STORE_AFTER}) but too old for remote "
+            f"write; queries will not return them until they are older"
+        )
+
+
+def log_outcome(plan: IngestionPlan, remote_write_seconds: float, block_seconds: float):
+    """Log the actual durations next to the predicted ones."""
+    actual = remote_write_seconds + block_seconds
+    logging.info(
+        f"Ingestion took {actual:.1f}s, predicted {plan.predicted_seconds:.1f}s "
+        f"(remote write {remote_write_seconds:.1f}s vs "
+        f"{plan.remote_write_seconds:.1f}s, blocks {block_seconds:.1f}s vs "
+        f"{plan.block_seconds:.1f}s)"
+    )
@@ -0,0 +1,139 @@
+"""Shared streaming OpenMetrics writer for backfill files.
+
+Writes the OpenMetrics files the behave backfill step and the backfill pipeline
+hand to promtool.
+
+Samples are written straight from NumPy arrays to a buffered file handle, a
+chunk of samples at a time, instead of rendering a template per timestamp.
+The `metric{labels} ` prefix of every series is built once, and values and
+timestamps are formatted with one map over each chunk.
+"""
+
+from typing import IO, Iterable, List, NamedTuple, Sequence
+
+import numpy as np
+
+# Samples formatted per series before they are handed to the file handle
+DEFAULT_CHUNK_SIZE = 65536
+
+# OpenMetrics spelling of the non-finite values (repr() gives nan/inf/-inf)
+_NON_FINITE = {"nan": "NaN", "inf": "+Inf", "-inf": "-Inf"}
+
+
+class OpenMetricsSeries(NamedTuple):
+    labels: str
+    timestamps: np.ndarray
+    values: np.ndarray
+
+
+class OpenMetricsFamily(NamedTuple):
+    metric_name: str
+    description: str
+    series: Sequence[OpenMetricsSeries]
+    metric_type: str = "gauge"
+
+
+def format_values(values: np.ndarray) -> List[str]:
+    """Format float values as shortest round-trip strings (same as repr)."""
+    formatted = list(map(float.__repr__, np.asarray(values, dtype=np.float64).tolist()))
+    non_finite = np.flatnonzero(~np.isfinite(values))
+    for i in non_finite.tolist():
+        formatted[i] = _NON_FINITE[formatted[i]]
+    return formatted
+
+
+def format_timestamps(timestamps: np.ndarray) -> List[str]:
+    """Format integer epoch-second timestamps."""
+    return list(map(int.__repr__, np.asarray(timestamps, dtype=np.int64).tolist()))
+
+
+def _series_lines(prefix: str, timestamps: np.ndarray, values: np.ndarray) -> List[str]:
+    return [
+        prefix + value + " " + timestamp
+        for value, timestamp in zip(
+            format_values(values), format_timestamps(timestamps)
+        )
+    ]
+
+
+def write_metric_family(
+    f: IO[str],
+    family: OpenMetricsFamily,
+    order: str = "series",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Write one metric family (HELP, TYPE and all samples) to ``f``.
+
+    Args:
+        f: Text file handle to write to.
+        family (OpenMetricsFamily): Metric name, description and series.
+        order (str): "series" writes each series' samples in turn, "time"
+            interleaves the series sample by sample. All series must then have
+            the same length.
+        chunk_size (int): Samples per series formatted at a time.
+
+    Returns:
+        int: Number of samples written.
+    """
+    if order not in ("series", "time"):
+        raise ValueError(f"order must be 'series' or 'time', got {order!r}")
+
+    f.write(f"# HELP {family.metric_name} {family.description}\n")
+    f.write(f"# TYPE {family.metric_name} {family.metric_type}\n")
+    prefixes = [f"{family.metric_name}{{{series.labels}}} " for series in family.series]
+
+    written = 0
+    if order == "series":
+        for prefix, series in zip(prefixes, family.series):
+            for start in range(0, len(series.values), chunk_size):
+                stop = start + chunk_size
+                lines = _series_lines(
+                    prefix, series.timestamps[start:stop], series.values[start:stop]
+                )
+                f.write("\n".join(lines))
+                f.write("\n")
+                written += len(lines)
+        return written
+
+    lengths = {len(series.values) for series in family.series}
+    if len(lengths) > 1:
+        raise ValueError("time-major order needs series of equal length")
+    length = lengths.pop() if lengths else 0
+    count = len(family.series)
+    for start in range(0, length, chunk_size):
+        stop = min(start + chunk_size, length)
+        lines = [None] * ((stop - start) * count)
+        for i, (prefix, series) in enumerate(zip(prefixes, family.series)):
+            lines[i::count] = _series_lines(
+                prefix, series.timestamps[start:stop], series.values[start:stop]
+            )
+        f.write("\n".join(lines))
+        f.write("\n")
+        written += len(lines)
+    return written
+
+
+def write_openmetrics(
+    f: IO[str],
+    families: Iterable[OpenMetricsFamily],
+    order: str = "series",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Write all families followed by the ``# EOF`` marker; returns the sample count."""
+    written = 0
+    for family in families:
+        written += write_metric_family(f, family, order=order, chunk_size=chunk_size)
+    f.write("# EOF\n")
+    return written
+
+
+def write_openmetrics_file(
+    path: str,
+    families: Iterable[OpenMetricsFamily],
+    order: str = "series",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    buffer_size: int = 1 << 20,
+) -> int:
+    """Write an OpenMetrics file through a large write buffer; returns the sample count."""
+    with open(path, "w", buffering=buffer_size) as f:
+        return write_openmetrics(f, families, order=order, chunk_size=chunk_size)
@@ -0,0 +1,402 @@
+"""Shared pre-flight validator for OpenMetrics backfill data.
+
+Checks backfill data before promtool reads it, in the behave backfill step, the
+backfill pipeline and scripts/validate_openmetrics.py.
+
+promtool, mimirtool and Mimir itself only report bad samples after minutes of
+work (or never, when check_if_data_present just times out). The validator
+runs before any blocks are built and stops at the first problem, naming the
+offending line: samples that are not strictly ascending per series
+(duplicates included), NaN/Inf values, malformed metric names or label sets
+(such as an unescaped quote from a feature table), families that are split
+up, a missing ``# EOF`` and, when given, a sample count per series that
+differs from what was generated.
+
+The file is read line by line. Every series' ``name{labels}`` prefix is
+parsed once; later samples of the series are only split into value and
+timestamp and compared with the previous timestamp.
+"""
+
+import logging
+import math
+import re
+import time
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional
+
+import numpy as np
+
+from shared.openmetrics import OpenMetricsFamily
+
+_METRIC_NAME = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\\n]|\\[\\"n])*)"')
+_TYPES = {
+    "counter",
+    "gauge",
+    "histogram",
+    "gaugehistogram",
+    "stateset",
+    "info",
+    "summary",
+    "unknown",
+}
+# Sample name suffixes each metric type may add to the family name
+_SUFFIXES = {
+    "counter": ("_total", "_created"),
+    "histogram": ("_bucket", "_count", "_sum", "_created"),
+    "gaugehistogram": ("_bucket", "_gcount", "_gsum"),
+    "summary": ("_count", "_sum", "_created"),
+    "info": ("_info",),
+}
+# Longest line quoted in an error message
+_MAX_QUOTED = 200
+
+
+class OpenMetricsValidationError(ValueError):
+    """Backfill data that promtool or Mimir would reject or store wrongly."""
+
+    def __init__(self, message: str, line_number: Optional[int] = None, line=None):
+        self.line_number = line_number
+        self.line = line
+        if line_number is not None:
+            quoted = line.rstrip("\n") if line is not None else ""
+            if len(quoted) > _MAX_QUOTED:
+                quoted = quoted[:_MAX_QUOTED] + "..."
+            message = f"line {line_number}: {message}\n    {quoted}"
+        super().__init__(message)
+
+
+class ValidationReport(NamedTuple):
+    families: int
+    series: int
+    samples: int
+    bytes: int
+    seconds: float
+
+
+def series_key(metric_name: str, labels: str) -> str:
+    """The ``name{labels}`` prefix a series' samples are written with."""
+    return f"{metric_name}{{{labels}}}"
+
+
+def expected_sample_counts(families: Iterable[OpenMetricsFamily]) -> Dict[str, int]:
+    """Samples per series key, for validate_openmetrics_file."""
+    return {
+        series_key(family.metric_name, series.labels): len(series.values)
+        for family in families
+        for series in family.series
+    }
+
+
+def parse_series(key: str) -> str:
+    """Check a ``name{labels}`` series key and return the metric name.
+
+    Raises:
+        OpenMetricsValidationError: If the metric name or a label is malformed
+            or a label name repeats.
+    """
+    match = _METRIC_NAME.match(key)
+    if match is None:
+        raise OpenMetricsValidationError(f"invalid metric name in {key!r}")
+    name = match.group()
+    rest = key[match.end() :]
+    if not rest:
+        return name
+    if rest[0] != "{" or rest[-1] != "}":
+        raise OpenMetricsValidationError(
+            f"expected '{{labels}}' after metric name {name!r}, got {rest!r}"
+        )
+    body = rest[1:-1]
+    seen = set()
+    pos = 0
+    while pos < len(body):
+        label = _LABEL.match(body, pos)
+        if label is None:
+            raise OpenMetricsValidationError(
+                f"malformed label at {body[pos:pos + 40]!r} (label names are "
+                r"[a-zA-Z_][a-zA-Z0-9_]*, values are quoted with only \\, \" "
+                r"and \n escaped)"
+            )
+        if label.group(1) in seen:
+            raise OpenMetricsValidationError(f"label {label.group(1)!r} repeats")
+        seen.add(label.group(1))
+        pos = label.end()
+        if pos == len(body):
+            break
+        if body[pos] != "," or pos + 1 == len(body):
+            raise OpenMetricsValidationError(
+                f"unexpected {body[pos:pos + 40]!r} after "
+                f"{label.group()!r}; is there an unescaped quote in the value?"
+            )
+        pos += 1
+    return name
+
+
+def _belongs_to(name: str, family: str, metric_type: str) -> bool:
+    if name == family:
+        return True
+    return any(name == family + suffix for suffix in _SUFFIXES.get(metric_type, ()))
+
+
+def validate_openmetrics_file(
+    path: str,
+    expected_samples: Optional[Mapping[str, int]] = None,
+    allow_non_finite: bool = False,
+) -> ValidationReport:
+    """Check an OpenMetrics backfill file, stopping at the first error.
+
+    Args:
+        path (str): OpenMetrics file to check.
+        expected_samples: Sample count per series key, e.g. from
+            expected_sample_counts; series missing from the file, extra
+            series and other counts are errors. Not checked if None.
+        allow_non_finite (bool): Accept NaN and +/-Inf values.
+
+    Returns:
+        ValidationReport: Families, series, samples and bytes read.
+
+    Raises:
+        OpenMetricsValidationError: With the number and text of the
+            offending line.
+    """
+    start = time.perf_counter()
+    # Series key -> [last timestamp, samples, last line number, first line number]
+    series = {}
+    closed_families = set()
+    family = None
+    metric_type = "unknown"
+    family_has_samples = False
+    family_count = 0
+    samples = 0
+    size = 0
+    eof = False
+    isfinite = math.isfinite
+
+    with open(path, encoding="utf-8", buffering=1 << 20) as f:
+        line_number = 0
+        line = None
+        try:
+            for line_number, line in enumerate(f, 1):
+                size += len(line)
+                if eof:
+                    raise OpenMetricsValidationError(
+                        "content after '# EOF'", line_number, line
+                    )
+                if line[0] != "#":
+                    if line == "\n":
+                        raise OpenMetricsValidationError(
+                            "empty line", line_number, line
+                        )
+                    parts = line.rsplit(" ", 2)
+                    if len(parts) != 3:
+                        raise OpenMetricsValidationError(
+                            "expected '<series> <value> <timestamp>'",
+                            line_number,
+                            line,
+                        )
+                    key, value, timestamp = parts
+                    state = series.get(key)
+                    if state is None:
+                        try:
+                            name = parse_series(key)
+                        except OpenMetricsValidationError as e:
+                            raise OpenMetricsValidationError(
+                                str(e), line_number, line
+                            ) from None
+                        if family is None or not _belongs_to(name, family, metric_type):
+                            # A sample without HELP/TYPE is a family of its own
+                            if name in closed_families or name == family:
+                                raise OpenMetricsValidationError(
+                                    f"samples of {name!r} are split up by "
+                                    "another family",
+                                    line_number,
+                                    line,
+                                )
+                            if family is not None:
+                                closed_families.add(family)
+                            family, metric_type = name, "unknown"
+                            family_count += 1
+                        state = series[key] = [-math.inf, 0, 0, line_number]
+                    family_has_samples = True
+                    try:
+                        timestamp = float(timestamp)
+                        value = float(value)
+                    except ValueError:
+                        raise OpenMetricsValidationError(
+                            "value or timestamp is not a number", line_number, line
+                        ) from None
+                    if not allow_non_finite and not isfinite(value):
+                        raise OpenMetricsValidationError(
+                            f"value is {value}", line_number, line
+                        )
+                    if timestamp <= state[0]:
+                        kind = "duplicate" if timestamp == state[0] else "out of order"
+                        raise OpenMetricsValidationError(
+                            f"{kind} timestamp, the previous sample of this series "
+                            f"(line {state[2]}) is at {state[0]:.15g}",
+                            line_number,
+                            line,
+                        )
+                    state[0] = timestamp
+                    state[1] += 1
+                    state[2] = line_number
+                    samples += 1
+                    continue
+
+                if line.rstrip("\n") == "# EOF":
+                    eof = True
+                    continue
+                fields = line.rstrip("\n").split(" ", 3)
+                if len(fields) < 3 or fields[1] not in ("HELP", "TYPE", "UNIT"):
+                    raise OpenMetricsValidationError(
+                        "expected '# HELP', '# TYPE', '# UNIT' or '# EOF'",
+                        line_number,
+                        line,
+                    )
+                name = fields[2]
+                if _METRIC_NAME.fullmatch(name) is None:
+                    raise OpenMetricsValidationError(
+                        f"invalid metric name {name!r}", line_number, line
+                    )
+                if name != family:
+                    if name in closed_families:
+                        raise OpenMetricsValidationError(
+                            f"family {name!r} appears twice", line_number, line
+                        )
+                    if family is not None:
+                        closed_families.add(family)
+                    family, metric_type = name, "unknown"
+                    family_has_samples = False
+                    family_count += 1
+                elif family_has_samples:
+                    raise OpenMetricsValidationError(
+                        f"metadata of {name!r} after its samples", line_number, line
+                    )
+                if fields[1] == "TYPE":
+                    metric_type = fields[3] if len(fields) == 4 else ""
+                    if metric_type not in _TYPES:
+                        raise OpenMetricsValidationError(
+                            f"unknown metric type {metric_type!r}", line_number, line
+                        )
+        except UnicodeDecodeError as e:
+            raise OpenMetricsValidationError(
+                f"not UTF-8 ({e.reason})", line_number + 1
+            ) from None
+
+    if not eof:
+        raise OpenMetricsValidationError("missing '# EOF'", line_number, line)
+    if expected_samples is not None:
+        for key, count in expected_samples.items():
+            state = series.get(key)
+            if state is None:
+                raise OpenMetricsValidationError(f"series {key} is missing")
+            if state[1] != count:
+                raise OpenMetricsValidationError(
+                    f"series {key} has {state[1]} samples (lines {state[3]} to "
+                    f"{state[2]}), expected {count}"
+                )
+        extra = [state for key, state in series.items() if key not in expected_samples]
+        if extra:
+            first = min(state[3] for state in extra)
+            raise OpenMetricsValidationError(
+                f"{len(extra)} series were not expected, the first starts here",
+                first,
+                _read_line(path, first),
+            )
+
+    report = ValidationReport(
+        families=family_count,
+        series=len(series),
+        samples=samples,
+        bytes=size,
+        seconds=time.perf_counter() - start,
+    )
+    logging.info(
+        f"Validated {path}: {report.samples} samples in {report.series} series "
+        f"of {report.families} families ({report.bytes / 1e6:.1f} MB) in "
+        f"{report.seconds:.2f}s"
+    )
+    return report
+
+
+def _read_line(path: str, line_number: int) -> str:
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if number == line_number:
+                return line
+    return ""
+
+
+def validate_families(
+    families: Iterable[OpenMetricsFamily], allow_non_finite: bool = False
+) -> ValidationReport:
+    """Run the same checks on the series before they are written anywhere.
+
+    For the native block writer and the time-sharded promtool path, which
+    never write one complete file. Errors name the series and sample index
+    instead of a line.
+
+    Raises:
+        OpenMetricsValidationError: At the first invalid series.
+    """
+    start = time.perf_counter()
+    names = set()
+    keys = set()
+    samples = 0
+    family_count = 0
+    for family in families:
+        family_count += 1
+        if _METRIC_NAME.fullmatch(family.metric_name) is None:
+            raise OpenMetricsValidationError(
+                f"invalid metric name {family.metric_name!r}"
+            )
+        if family.metric_name in names:
+            raise OpenMetricsValidationError(
+                f"family {family.metric_name!r} appears twice"
+            )
+        names.add(family.metric_name)
+        for series in family.series:
+            key = series_key(family.metric_name, series.labels)
+            try:
+                parse_series(key)
+            except OpenMetricsValidationError as e:
+                raise OpenMetricsValidationError(f"series {key}: {e}") from None
+            if key in keys:
+                raise OpenMetricsValidationError(f"series {key} appears twice")
+            keys.add(key)
+            timestamps = np.asarray(series.timestamps)
+            values = np.asarray(series.values, dtype=np.float64)
+            if len(timestamps) != len(values):
+                raise OpenMetricsValidationError(
+                    f"series {key} has {len(timestamps)} timestamps but "
+                    f"{len(values)} values"
+                )
+            if not allow_non_finite:
+                bad = np.flatnonzero(~np.isfinite(values))
+                if len(bad):
+                    raise OpenMetricsValidationError(
+                        f"series {key} sample {bad[0]} at {timestamps[bad[0]]} "
+                        f"is {values[bad[0]]} ({len(bad)} non-finite values)"
+                    )
+            steps = np.diff(timestamps)
+            bad = np.flatnonzero(steps <= 0)
+            if len(bad):
+                index = bad[0] + 1
+                kind = "duplicate" if steps[bad[0]] == 0 else "out of order"
+                raise OpenMetricsValidationError(
+                    f"series {key} sample {index} has a {kind} timestamp "
+                    f"{timestamps[index]} after {timestamps[index - 1]}"
+                )
+            samples += len(values)
+
+    report = ValidationReport(
+        families=family_count,
+        series=len(keys),
+        samples=samples,
+        bytes=0,
+        seconds=time.perf_counter() - start,
+    )
+    logging.info(
+        f"Validated {report.samples} samples in {report.series} series of "
+        f"{report.families} families in {report.seconds:.2f}s"
+    )
+    return report
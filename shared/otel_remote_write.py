@@ -0,0 +1,46 @@
+"""OpenTelemetry Prometheus remote-write exporter helpers.
+
+Kept out of features/steps/ so that behave only imports the OpenTelemetry SDK
+when a step actually exports metrics.
+"""
+
+import logging
+import threading
+from typing import Dict
+
+from opentelemetry.exporter.prometheus_remote_write import (
+    PrometheusRemoteWriteMetricsExporter,
+)
+from opentelemetry.sdk.metrics.export import MetricExportResult
+
+from shared.remote_write_client import RemoteWriteError, get_client
+
+
+class DebugRemoteWriteExporter(PrometheusRemoteWriteMetricsExporter):
+    """Subclass that posts over a pooled keep-alive client and logs failures."""
+
+    def _send_message(self, message: bytes, headers: Dict) -> MetricExportResult:
+        try:
+            get_client(self.endpoint, self.headers).send(message, headers)
+        except RemoteWriteError as e:
+            logging.error(f"Remote write failed: {e}")
+            return MetricExportResult.FAILURE
+        return MetricExportResult.SUCCESS
+
+
+_exporters: Dict[tuple, DebugRemoteWriteExporter] = {}
+_exporters_lock = threading.Lock()
+
+
+def get_exporter(
+    endpoint: str, headers: Dict[str, str] = None
+) -> DebugRemoteWriteExporter:
+    """The long-lived exporter for ``endpoint``, shared by steps and scenarios."""
+    key = (endpoint, tuple(sorted((headers or {}).items())))
+    with _exporters_lock:
+        exporter = _exporters.get(key)
+        if exporter is None:
+            exporter = _exporters[key] = DebugRemoteWriteExporter(
+                endpoint=endpoint, headers=headers
+            )
+        return exporter
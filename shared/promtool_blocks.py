@@ -0,0 +1,333 @@
+"""Shared promtool block creation from time-sharded OpenMetrics files.
+
+Backs the promtool-stream block writer of the behave backfill step and of the
+backfill pipeline.
+
+`promtool tsdb create-blocks-from openmetrics` memory-maps its input and reads
+it twice (once for the time range, once per block), so it cannot consume a
+named pipe. Instead the samples are cut into shards aligned to multiples of
+the block duration. Each shard is written to its own OpenMetrics file and
+handed to promtool while the next shard is being written, and the file is
+deleted as soon as promtool is done with it. With ``workers`` promtool
+processes at most 2 * workers + 1 shards are on disk at a time, generation
+overlaps block creation, and block creation itself runs in parallel.
+
+Because shards start on block boundaries, the blocks promtool cuts from one
+shard never overlap those of another. This is checked: every shard's blocks
+must stay inside the shard and hold all of its samples, and the merged
+blocks must not overlap.
+"""
+
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.openmetrics import (
+    OpenMetricsFamily,
+    OpenMetricsSeries,
+    write_openmetrics_file,
+)
+from shared.tsdb_blocks import DEFAULT_BLOCK_DURATION, read_meta
+
+DEFAULT_SHARD_DURATION = timedelta(days=2)
+# promtool is single threaded per shard, so run one per core
+DEFAULT_PROMTOOL_WORKERS = os.cpu_count() or 1
+
+
+class PromtoolError(Exception):
+    """promtool failed to create blocks from a shard."""
+
+
+class ShardStats(NamedTuple):
+    shards: int
+    samples: int
+    max_shard_bytes: int
+    write_seconds: float
+    promtool_seconds: float
+    seconds: float
+
+
+def time_shards(
+    families: Sequence[OpenMetricsFamily], shard_duration: timedelta
+) -> Iterator[Tuple[int, List[OpenMetricsFamily]]]:
+    """Split ``families`` into shards of ``shard_duration`` aligned to its multiples.
+
+    Yields (shard start in epoch seconds, families holding only that range's
+    samples). Series without samples in a shard are left out of it, and so
+    are families without series. Timestamps must be ascending per series.
+    """
+    width = int(shard_duration.total_seconds())
+    starts = [
+        int(series.timestamps[0])
+        for family in families
+        for series in family.series
+        if len(series.timestamps)
+    ]
+    stops = [
+        int(series.timestamps[-1])
+        for family in families
+        for series in family.series
+        if len(series.timestamps)
+    ]
+    if not starts:
+        return
+    for shard_start in range(min(starts) // width * width, max(stops) + 1, width):
+        shard_stop = shard_start + width
+        shard_families = []
+        for family in families:
+            shard_series = []
+            for series in family.series:
+                lo, hi = np.searchsorted(series.timestamps, [shard_start, shard_stop])
+                if hi > lo:
+                    shard_series.append(
+                        OpenMetricsSeries(
+                            series.labels,
+                            series.timestamps[lo:hi],
+                            series.values[lo:hi],
+                        )
+                    )
+            if shard_series:
+                shard_families.append(family._replace(series=shard_series))
+        if shard_families:
+            yield shard_start, shard_families
+
+
+def run_promtool(
+    promtool: str,
+    openmetrics_file: str,
+    block_dir: str,
+    block_duration: timedelta = DEFAULT_BLOCK_DURATION,
+):
+    """Run `promtool tsdb create-blocks-from openmetrics` on one file."""
+    hours = int(block_duration.total_seconds() // 3600)
+    result = subprocess.run(
+        [
+            promtool,
+            "tsdb",
+            "create-blocks-from",
+            f"--max-block-duration={hours}h",
+            "openmetrics",
+            openmetrics_file,
+            block_dir,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise PromtoolError(
+            f"promtool exited with {result.returncode} for {openmetrics_file}: "
+            f"{result.stderr.strip()}"
+        )
+
+
+class ShardValidationError(PromtoolError):
+    """The blocks built from the shards overlap, or miss samples of a shard."""
+
+
+def _shard_blocks(shard_block_dir: str) -> List[Tuple[str, dict]]:
+    return [
+        (ulid, read_meta(os.path.join(shard_block_dir, ulid)))
+        for ulid in sorted(os.listdir(shard_block_dir))
+        if os.path.isfile(os.path.join(shard_block_dir, ulid, "meta.json"))
+    ]
+
+
+def validate_shard_blocks(
+    shard_start: int, shard_stop: int, samples: int, blocks: List[Tuple[str, dict]]
+):
+    """Check that a shard's blocks stay inside it and hold all of its samples.
+
+    Args:
+        shard_start (int): Start of the shard in epoch seconds (inclusive).
+        shard_stop (int): End of the shard in epoch seconds (exclusive).
+        samples (int): Samples written to the shard's OpenMetrics file.
+        blocks: (ulid, meta.json) of each block promtool built from it.
+
+    Raises:
+        ShardValidationError: If a block reaches outside the shard (and could
+            overlap a neighbour's) or the blocks lack samples (a gap).
+    """
+    for ulid, meta in blocks:
+        # maxTime is exclusive, one past the last sample
+        if meta["minTime"] < shard_start * 1000 or meta["maxTime"] > shard_stop * 1000:
+            raise ShardValidationError(
+                f"Block {ulid} [{meta['minTime']}, {meta['maxTime']}) reaches "
+                f"outside its shard [{shard_start * 1000}, {shard_stop * 1000})"
+            )
+    block_samples = sum(meta["stats"]["numSamples"] for _, meta in blocks)
+    if block_samples != samples:
+        raise ShardValidationError(
+            f"Shard {shard_start} has {samples} samples but its {len(blocks)} "
+            f"blocks hold {block_samples}"
+        )
+
+
+def validate_blocks(block_dir: str):
+    """Check that no two blocks in ``block_dir`` overlap in time."""
+    blocks = sorted(_shard_blocks(block_dir), key=lambda block: block[1]["minTime"])
+    for (prev_ulid, prev), (ulid, meta) in zip(blocks, blocks[1:]):
+        if meta["minTime"] < prev["maxTime"]:
+            raise ShardValidationError(
+                f"Blocks {prev_ulid} and {ulid} overlap: "
+                f"[{prev['minTime']}, {prev['maxTime']}) and "
+                f"[{meta['minTime']}, {meta['maxTime']})"
+            )
+
+
+def create_blocks_streamed(
+    promtool: str,
+    families: Sequence[OpenMetricsFamily],
+    block_dir: str,
+    shard_duration: timedelta = DEFAULT_SHARD_DURATION,
+    block_duration: timedelta = DEFAULT_BLOCK_DURATION,
+    work_dir: Optional[str] = None,
+    workers: int = DEFAULT_PROMTOOL_WORKERS,
+) -> ShardStats:
+    """Build blocks in ``block_dir`` with promtool, one time shard per run.
+
+    A writer thread renders the shards to OpenMetrics files in ``work_dir``
+    (a temporary directory by default) while ``workers`` promtool processes
+    turn earlier shards into blocks, each into a directory of its own. The
+    queue between them holds ``workers`` shards. Every shard's blocks are
+    validated against the shard and moved into ``block_dir``, and finally
+    all blocks are checked for overlaps.
+
+    Args:
+        promtool (str): Path to the promtool binary.
+        families: Metric families to backfill.
+        block_dir (str): Directory the blocks are created in.
+        shard_duration (timedelta): Time range per OpenMetrics file; a
+            multiple of block_duration.
+        block_duration (timedelta): Passed to promtool as --max-block-duration.
+        work_dir (str): Where the shard files are written.
+        workers (int): promtool processes run at the same time.
+
+    Returns:
+        ShardStats: Shard count, samples, largest shard file and timings.
+
+    Raises:
+        PromtoolError: If promtool fails on a shard.
+        ShardValidationError: If the blocks overlap or miss samples.
+    """
+    if shard_duration % block_duration:
+        raise ValueError(
+            f"shard duration {shard_duration} is not a multiple of the block "
+            f"duration {block_duration}"
+        )
+    width = int(shard_duration.total_seconds())
+    os.makedirs(block_dir, exist_ok=True)
+    shard_dir = tempfile.mkdtemp(prefix="openmetrics-shards-", dir=work_dir)
+    shards = queue.Queue(maxsize=workers)
+    stop = threading.Event()
+    lock = threading.Lock()
+    # Filled in by the writer and promtool threads
+    state = {
+        "samples": 0,
+        "max_bytes": 0,
+        "write_seconds": 0.0,
+        "promtool_seconds": 0.0,
+        "shards": 0,
+        "errors": [],
+    }
+
+    def write_shards():
+        try:
+            for shard_start, shard_families in time_shards(families, shard_duration):
+                if stop.is_set():
+                    return
+                start = time.perf_counter()
+                path = os.path.join(shard_dir, f"{shard_start}.txt")
+                samples = write_openmetrics_file(path, shard_families)
+                state["samples"] += samples
+                state["max_bytes"] = max(state["max_bytes"], os.path.getsize(path))
+                state["write_seconds"] += time.perf_counter() - start
+                # Blocks while all promtool processes are still busy
+                while not stop.is_set():
+                    try:
+                        shards.put((shard_start, path, samples), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as e:
+            with lock:
+                state["errors"].append(e)
+            stop.set()
+        finally:
+            for _ in range(workers):
+                shards.put(None)
+
+    def build_shards():
+        while True:
+            shard = shards.get()
+            if shard is None:
+                return
+            shard_start, path, samples = shard
+            if stop.is_set():
+                os.remove(path)
+                continue
+            shard_block_dir = os.path.join(shard_dir, f"blocks-{shard_start}")
+            start = time.perf_counter()
+            try:
+                run_promtool(promtool, path, shard_block_dir, block_duration)
+                blocks = _shard_blocks(shard_block_dir)
+                validate_shard_blocks(shard_start, shard_start + width, samples, blocks)
+                for ulid, _ in blocks:
+                    os.rename(
+                        os.path.join(shard_block_dir, ulid),
+                        os.path.join(block_dir, ulid),
+                    )
+            except Exception as e:
+                with lock:
+                    state["errors"].append(e)
+                stop.set()
+                continue
+            finally:
+                os.remove(path)
+                shutil.rmtree(shard_block_dir, ignore_errors=True)
+            with lock:
+                state["promtool_seconds"] += time.perf_counter() - start
+                state["shards"] += 1
+            logging.info(f"promtool built {len(blocks)} blocks for shard {shard_start}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=write_shards, name="openmetrics-shards")]
+    threads += [
+        threading.Thread(target=build_shards, name=f"promtool-{i}")
+        for i in range(workers)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    if state["errors"]:
+        raise state["errors"][0]
+    validate_blocks(block_dir)
+
+    stats = ShardStats(
+        shards=state["shards"],
+        samples=state["samples"],
+        max_shard_bytes=state["max_bytes"],
+        write_seconds=state["write_seconds"],
+        promtool_seconds=state["promtool_seconds"],
+        seconds=time.perf_counter() - start,
+    )
+    logging.info(
+        f"Created blocks from {stats.samples} samples in {stats.shards} shards in "
+        f"{stats.seconds:.1f}s with {workers} promtool processes (writing "
+        f"{stats.write_seconds:.1f}s, promtool {stats.promtool_seconds:.1f}s); "
+        f"largest shard {stats.max_shard_bytes / 1e6:.1f} MB"
+    )
+    return stats
@@ -0,0 +1,251 @@
+"""Shared chunked, concurrent remote write of many series.
+
+Sends the backlogs of the behave metrics steps (batch_remote_write_all).
+
+The ingest endpoint rejects oversized bodies and drops a whole request on a
+single 400, so backlogs are split into chunks of at most max_samples samples
+and max_bytes compressed bytes. Series short enough to fit in one chunk are
+packed together; longer series are cut into consecutive time slices, and a
+chunk that compresses to more than max_bytes is halved until it fits.
+
+Samples of one series must arrive in time order (the TSDB head rejects
+samples older than the newest one it has), so the chunks of a series form a
+chain that is sent in order. Chains are sent concurrently over a bounded
+thread pool. A failing chunk is retried on its own, after the server's
+Retry-After or else a full-jitter exponential backoff; if it still fails,
+the rest of its chain is skipped.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from shared.remote_write import RemoteWriteSeries, build_write_request
+from shared.remote_write_client import RemoteWriteError
+from shared.retry import (
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_RETRIES,
+    call_with_retries,
+)
+
+DEFAULT_MAX_SAMPLES = 10_000
+DEFAULT_MAX_BYTES = 1024**2
+
+
+class Chunk(NamedTuple):
+    """One request: (series index, start, stop) sample ranges and the body."""
+
+    parts: Tuple[Tuple[int, int, int], ...]
+    samples: int
+    body: bytes
+
+
+class ChunkResult(NamedTuple):
+    parts: Tuple[Tuple[int, int, int], ...]
+    samples: int
+    size_bytes: int
+    seconds: float
+    attempts: int
+    error: Optional[str] = None
+
+
+class RemoteWriteSummary(NamedTuple):
+    sent: List[ChunkResult]
+    failed: List[ChunkResult]
+    skipped: List[Chunk]
+    seconds: float
+
+    @property
+    def samples(self) -> int:
+        return sum(result.samples for result in self.sent)
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(result.size_bytes for result in self.sent)
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.samples / max(self.seconds, 1e-9)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.size_bytes / max(self.seconds, 1e-9)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.skipped
+
+
+def _encode(series: Sequence[RemoteWriteSeries], parts) -> bytes:
+    return build_write_request(
+        [
+            series[index]._replace(
+                timestamps=series[index].timestamps[start:stop],
+                values=series[index].values[start:stop],
+            )
+            for index, start, stop in parts
+        ]
+    )
+
+
+def _bounded_chains(
+    series: Sequence[RemoteWriteSeries], parts: list, max_bytes: int
+) -> List[List[Chunk]]:
+    """Encode ``parts`` as one chunk, halving it while the body is too large."""
+    body = _encode(series, parts)
+    samples = sum(stop - start for _, start, stop in parts)
+    if len(body) <= max_bytes or samples <= 1:
+        if len(body) > max_bytes:
+            logging.warning(f"A single sample takes {len(body)} bytes > {max_bytes}")
+        return [[Chunk(tuple(parts), samples, body)]]
+    if len(parts) > 1:
+        middle = len(parts) // 2
+        return _bounded_chains(series, parts[:middle], max_bytes) + _bounded_chains(
+            series, parts[middle:], max_bytes
+        )
+    # One series: both halves go into the same chain, oldest first
+    index, start, stop = parts[0]
+    middle = (start + stop) // 2
+    return [
+        [
+            chunk
+            for half in ([(index, start, middle)], [(index, middle, stop)])
+            for chain in _bounded_chains(series, half, max_bytes)
+            for chunk in chain
+        ]
+    ]
+
+
+def plan_chunks(
+    series: Sequence[RemoteWriteSeries],
+    max_samples: int = DEFAULT_MAX_SAMPLES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> List[List[Chunk]]:
+    """Split ``series`` into chains of chunks that respect both limits.
+
+    Returns:
+        List[List[Chunk]]: Chains; the chunks of a chain must be sent in
+        order, different chains are independent.
+    """
+    chains = []
+    packed, packed_samples = [], 0
+    for index, s in enumerate(series):
+        count = len(s.values)
+        if count == 0:
+            continue
+        if count > max_samples:
+            chains.append(
+                [
+                    chunk
+                    for start in range(0, count, max_samples)
+                    for chain in _bounded_chains(
+                        series,
+                        [(index, start, min(start + max_samples, count))],
+                        max_bytes,
+                    )
+                    for chunk in chain
+                ]
+            )
+            continue
+        if packed_samples + count > max_samples:
+            chains += _bounded_chains(series, packed, max_bytes)
+            packed, packed_samples = [], 0
+        packed.append((index, 0, count))
+        packed_samples += count
+    if packed:
+        chains += _bounded_chains(series, packed, max_bytes)
+    return chains
+
+
+def send_chunk(
+    send: Callable[[bytes], None],
+    chunk: Chunk,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> ChunkResult:
+    """Send one chunk, retrying retryable failures up to ``retries`` times."""
+    start = time.perf_counter()
+    attempts, error = call_with_retries(
+        lambda: send(chunk.body),
+        RemoteWriteError,
+        f"Remote write of {chunk.samples} samples",
+        retries=retries,
+        backoff=backoff,
+        sleep=sleep,
+    )
+    return ChunkResult(
+        chunk.parts,
+        chunk.samples,
+        len(chunk.body),
+        time.perf_counter() - start,
+        attempts,
+        None if error is None else str(error),
+    )
+
+
+def send_series(
+    series: Sequence[RemoteWriteSeries],
+    send: Callable[[bytes], None],
+    max_samples: int = DEFAULT_MAX_SAMPLES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+) -> RemoteWriteSummary:
+    """Remote write ``series`` in bounded chunks over a thread pool and log a summary.
+
+    Args:
+        series: Series with millisecond timestamps, ascending.
+        send: Posts one compressed WriteRequest, e.g. a RemoteWriteClient;
+            raises RemoteWriteError on failure.
+        max_samples (int): Samples per request.
+        max_bytes (int): Compressed bytes per request.
+        max_workers (int): Requests in flight at the same time.
+        retries (int): Retries per chunk after the first attempt.
+        backoff (float): Base of the jittered exponential backoff in seconds.
+
+    Returns:
+        RemoteWriteSummary: Sent, failed and skipped chunks and throughput.
+    """
+    start = time.perf_counter()
+    chains = plan_chunks(series, max_samples, max_bytes)
+    lock = threading.Lock()
+    sent, failed, skipped = [], [], []
+
+    def run(chain: List[Chunk]):
+        for position, chunk in enumerate(chain):
+            result = send_chunk(send, chunk, retries=retries, backoff=backoff)
+            with lock:
+                if result.error is None:
+                    sent.append(result)
+                    continue
+                failed.append(result)
+                # Later samples of the series would make these ones too old
+                skipped.extend(chain[position + 1 :])
+            logging.error(
+                f"Giving up on {result.samples} samples after {result.attempts} "
+                f"attempts, skipping {len(chain) - position - 1} later chunks of "
+                f"the same series: {result.error}"
+            )
+            return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(run, chains))
+    summary = RemoteWriteSummary(sent, failed, skipped, time.perf_counter() - start)
+    log_summary(summary)
+    return summary
+
+
+def log_summary(summary: RemoteWriteSummary):
+    retried = sum(1 for result in summary.sent if result.attempts > 1)
+    logging.info(
+        f"Remote wrote {summary.samples} samples in {len(summary.sent)} requests "
+        f"({summary.size_bytes / 1e6:.2f} MB) in {summary.seconds:.1f}s: "
+        f"{summary.samples_per_second:.0f} samples/s, "
+        f"{summary.bytes_per_second / 1e6:.2f} MB/s; {retried} needed retries, "
+        f"{len(summary.failed)} failed, {len(summary.skipped)} skipped"
+    )
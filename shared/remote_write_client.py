@@ -0,0 +1,267 @@
+"""Shared long-lived keep-alive HTTP client for remote-write endpoints.
+
+Carries every remote write of the behave steps, of the OpenTelemetry exporter
+and of scripts/push_live_metrics.py.
+
+A bare requests.post opens a new TCP connection and does a new TLS handshake
+for every live-mode tick and every series. get_client returns one client per
+endpoint for the whole process. Its connection pool (a urllib3 PoolManager,
+which is thread-safe) is shared by a requests.Session per thread, so steps,
+scenarios and worker threads all reuse the same keep-alive connections.
+
+Every connection the pool opens is timed (TCP connect plus TLS handshake) and
+counted against the requests sent. ConnectionStats then gives the reuse ratio
+and the mean handshake time. On 429 and 5xx responses a Retry-After header,
+in seconds or as an HTTP date, replaces the jittered backoff before the next
+attempt.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from shared.remote_write import REMOTE_WRITE_HEADERS
+from shared.retry import (
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_RETRIES,
+    call_with_retries,
+    retry_delay,
+)
+
+# Connections kept open per endpoint; more than the remote write workers
+DEFAULT_POOL_SIZE = 16
+
+
+class RemoteWriteError(Exception):
+    """A remote write request failed; ``retryable`` says whether trying again can help.
+
+    ``retry_after`` is the delay in seconds the server asked for, if any.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        retryable: bool = True,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class ConnectionStats:
+    """Requests sent and connections opened by one client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.handshake_seconds = 0.0
+        self.retry_after_waits = 0
+
+    def connected(self, seconds: float):
+        with self._lock:
+            self.connections += 1
+            self.handshake_seconds += seconds
+
+    def requested(self):
+        with self._lock:
+            self.requests += 1
+
+    def waited(self):
+        with self._lock:
+            self.retry_after_waits += 1
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of requests sent over an already open connection."""
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.connections / self.requests)
+
+    @property
+    def mean_handshake_seconds(self) -> float:
+        return self.handshake_seconds / self.connections if self.connections else 0.0
+
+
+def _timed_connection(base, stats: ConnectionStats):
+    class TimedConnection(base):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            stats.connected(time.perf_counter() - start)
+
+    return TimedConnection
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools report every new connection to ``stats``."""
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type(
+                "TimedHTTPConnectionPool",
+                (HTTPConnectionPool,),
+                {"ConnectionCls": _timed_connection(HTTPConnection, self.stats)},
+            ),
+            "https": type(
+                "TimedHTTPSConnectionPool",
+                (HTTPSConnectionPool,),
+                {"ConnectionCls": _timed_connection(HTTPSConnection, self.stats)},
+            ),
+        }
+
+
+class RemoteWriteClient:
+    """POST compressed WriteRequests to one endpoint over pooled connections.
+
+    Calling the client sends one request and raises RemoteWriteError on
+    failure, so it can be passed as ``send`` to send_series. send() also
+    retries.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        headers: Dict[str, str] = None,
+        timeout: float = 30,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        self.endpoint = endpoint
+        self.headers = {**REMOTE_WRITE_HEADERS, **(headers or {})}
+        self.timeout = timeout
+        self.stats = ConnectionStats()
+        self._adapter = _CountingAdapter(
+            self.stats, pool_connections=1, pool_maxsize=pool_size
+        )
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            # Every thread's session shares the adapter and its connection pool
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def __call__(self, body: bytes, headers: Dict[str, str] = None):
+        self.stats.requested()
+        try:
+            response = self._session().post(
+                self.endpoint, data=body, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise RemoteWriteError(f"POST {self.endpoint} failed: {e}") from e
+        if response.status_code >= 400:
+            # Client errors other than throttling will not go away on a retry
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise RemoteWriteError(
+                f"POST {self.endpoint} returned {response.status_code}: "
+                f"{response.text[:1000]}",
+                retryable=retryable,
+                status_code=response.status_code,
+                retry_after=(
+                    parse_retry_after(response.headers.get("Retry-After"))
+                    if retryable
+                    else None
+                ),
+            )
+
+    def send(
+        self,
+        body: bytes,
+        headers: Dict[str, str] = None,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> int:
+        """Send ``body``, retrying retryable failures; returns the attempts made.
+
+        Raises:
+            RemoteWriteError: The last error, once retries are used up or the
+                error is not retryable.
+        """
+        attempts, error = call_with_retries(
+            lambda: self(body, headers),
+            RemoteWriteError,
+            "Remote write",
+            retries=retries,
+            backoff=backoff,
+            sleep=sleep,
+            delay=self._retry_delay,
+        )
+        if error is not None:
+            raise error
+        return attempts
+
+    def _retry_delay(self, error: RemoteWriteError, attempt: int, backoff: float):
+        if error.retry_after is not None:
+            self.stats.waited()
+        return retry_delay(error, attempt, backoff)
+
+    def log_stats(self):
+        stats = self.stats
+        logging.info(
+            f"Remote write connections to {self.endpoint}: {stats.requests} "
+            f"requests over {stats.connections} connections (reuse "
+            f"{stats.reuse_ratio:.0%}), mean handshake "
+            f"{stats.mean_handshake_seconds * 1000:.1f} ms, "
+            f"{stats.retry_after_waits} Retry-After waits"
+        )
+
+
+_clients: Dict[tuple, RemoteWriteClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(endpoint: str, headers: Dict[str, str] = None) -> RemoteWriteClient:
+    """The process-wide client for ``endpoint`` with these headers."""
+    key = (endpoint, tuple(sorted((headers or {}).items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = RemoteWriteClient(endpoint, headers)
+        return client
+
+
+def log_connection_stats():
+    """Log the connection metrics of every client created so far."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        client.log_stats()
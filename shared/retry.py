@@ -0,0 +1,74 @@
+"""Shared retry policy for block uploads and remote writes.
+
+Holds the retry defaults and the one retry loop that block uploads and remote
+writes share.
+
+A failed call is retried when its exception is ``retryable`` (exceptions
+without the attribute are). The delay before the next attempt is the
+server's ``retry_after`` when the exception carries one, capped at
+MAX_BACKOFF_SECONDS, and otherwise a full-jitter exponential backoff.
+"""
+
+import logging
+import random
+import time
+from typing import Callable, Optional, Tuple, Type
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+def backoff_delay(attempt: int, base: float, cap: float = MAX_BACKOFF_SECONDS) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def retry_delay(
+    error: Exception, attempt: int, backoff: float = DEFAULT_BACKOFF_SECONDS
+) -> float:
+    """The server's Retry-After (capped), else full-jitter exponential backoff."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return min(retry_after, MAX_BACKOFF_SECONDS)
+    return backoff_delay(attempt, backoff)
+
+
+def call_with_retries(
+    call: Callable[[], None],
+    errors: Type[Exception],
+    description: str,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    sleep: Callable[[float], None] = time.sleep,
+    delay: Callable[[Exception, int, float], float] = retry_delay,
+) -> Tuple[int, Optional[Exception]]:
+    """Call ``call()``, retrying retryable ``errors`` up to ``retries`` times.
+
+    Args:
+        call: The attempt; it fails by raising one of ``errors``.
+        errors: Exception type(s) that count as a failed attempt.
+        description (str): What is being attempted, for the retry warning.
+        retries (int): Attempts after the first.
+        backoff (float): Base of the jittered exponential backoff in seconds.
+        sleep: Sleep function.
+        delay: Seconds to wait given the error, the attempt index and backoff.
+
+    Returns:
+        tuple: ``(attempts, error)``; ``error`` is None on success, else the
+        last error, once retries are used up or the error is not retryable.
+    """
+    for attempt in range(retries + 1):
+        try:
+            call()
+            return attempt + 1, None
+        except errors as e:
+            if not getattr(e, "retryable", True) or attempt == retries:
+                return attempt + 1, e
+            wait = delay(e, attempt, backoff)
+            logging.warning(
+                f"{description} failed (attempt {attempt + 1}), "
+                f"retrying in {wait:.1f}s: {e}"
+            )
+            sleep(wait)
@@ -0,0 +1,143 @@
+"""Shared signal components for synthetic time series.
+
+``linear_ramp`` and ``sine_wave`` are the trend and seasonality kernels; they
+broadcast over rows, so features/steps/time_series_generator.py applies them
+to a whole N×T batch. The deterministic components built from them for
+scripts/push_live_metrics.py, scripts/test_historical_scenarios.py and
+shared/backfill_pipeline.py are memoized in an LRU cache keyed by (kind,
+length, step, parameters), so repeated scenarios and parameter sweeps only
+recompute the component that actually changed. Cached arrays are read-only;
+combine them into a new array (e.g. `trend + seasonality`) instead of
+modifying them in place.
+
+``seasonality`` uses the exact period. The scripts used to round the number of
+samples per day down to an integer, so at granularities that do not divide
+1440 minutes (e.g. 7 or 11) the seasonal values differ slightly from earlier
+runs; for granularities that divide a day they are unchanged.
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+COMPONENT_CACHE_SIZE = 128
+
+
+def linear_ramp(positions, start_value, end_value, length) -> np.ndarray:
+    """``np.linspace(start_value, end_value, length)`` evaluated at ``positions``.
+
+    Element for element the same as ``np.linspace`` (``k * step + start`` with
+    the last point pinned to ``end_value``). Positions outside the ramp are
+    extrapolated; the caller masks them.
+    """
+    divisions = np.maximum(length - 1, 1)
+    ramp_step = np.where(length > 1, (end_value - start_value) / divisions, 0.0)
+    ramp = positions * ramp_step + start_value
+    return np.where((positions == length - 1) & (length > 1), end_value, ramp)
+
+
+def sine_wave(
+    positions, period_steps, amplitude, y_offset=0.0, phase=0.0
+) -> np.ndarray:
+    """``amplitude * sin(2π * positions / period_steps + phase) + y_offset``.
+
+    Same values as darts' sine_timeseries with a value_frequency of
+    ``1 / period_steps``.
+    """
+    # value_frequency = number of full periods per time unit (1 step)
+    frequency = 1.0 / period_steps
+    return amplitude * np.sin(2 * np.pi * frequency * positions + phase) + y_offset
+
+
+def _linear(length: int, step_seconds: float, start_value: float, end_value: float):
+    return linear_ramp(np.arange(length), start_value, end_value, length)
+
+
+def _sine(
+    length: int,
+    step_seconds: float,
+    period_seconds: float,
+    amplitude: float,
+    y_offset: float,
+    phase: float,
+):
+    return sine_wave(
+        np.arange(length), period_seconds / step_seconds, amplitude, y_offset, phase
+    )
+
+
+_BUILDERS = {
+    "linear": _linear,
+    "sine": _sine,
+}
+
+
+@lru_cache(maxsize=COMPONENT_CACHE_SIZE)
+def _cached_component(kind: str, length: int, step_seconds: float, params: tuple):
+    values = _BUILDERS[kind](length, step_seconds, *params)
+    values.flags.writeable = False
+    return values
+
+
+def linear_trend(
+    length: int, step: timedelta, start_value: float, end_value: float
+) -> np.ndarray:
+    """Evenly spaced ramp from start_value to end_value, both inclusive.
+
+    Matches darts' linear_timeseries values.
+    """
+    return _cached_component(
+        "linear", length, step.total_seconds(), (float(start_value), float(end_value))
+    )
+
+
+def seasonality(
+    length: int,
+    step: timedelta,
+    amplitude: float,
+    period: timedelta = timedelta(days=1),
+    y_offset: float = 0.0,
+    phase: float = 0.0,
+) -> np.ndarray:
+    """Sine wave `amplitude * sin(2*pi*i*step/period + phase) + y_offset`.
+
+    Matches darts' sine_timeseries values for a frequency of step/period. The
+    scripts used to pass ``1 / int(24 * 60 / granularity_minutes)``; the period
+    is now exact, so granularities that do not divide a day give slightly
+    different values than before.
+    """
+    return _cached_component(
+        "sine",
+        length,
+        step.total_seconds(),
+        (period.total_seconds(), float(amplitude), float(y_offset), float(phase)),
+    )
+
+
+def gaussian_noise(length: int, mean: float = 0.0, std: float = 1.0) -> np.ndarray:
+    """Gaussian noise from the global np.random state, never cached."""
+    return np.random.normal(mean, std, length)
+
+
+def time_points(start_time: datetime, length: int, step: timedelta) -> List[datetime]:
+    """Evenly spaced datetimes starting at start_time."""
+    # Imported here so features/steps/ can use the kernels without loading pandas
+    import pandas as pd
+
+    return list(
+        pd.date_range(
+            start=pd.Timestamp(start_time), periods=length, freq=step
+        ).to_pydatetime()
+    )
+
+
+def component_cache_info():
+    """Hit/miss statistics of the component cache (functools CacheInfo)."""
+    return _cached_component.cache_info()
+
+
+def clear_component_cache():
+    """Drop all cached components and reset the statistics."""
+    _cached_component.cache_clear()
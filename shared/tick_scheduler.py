@@ -0,0 +1,116 @@
+"""Shared drift-free tick scheduler for live ingestion.
+
+Paces the live phases of the behave metrics, common and anomaly steps; the
+tick-scheduler benchmark in scripts/benchmarks.py checks it.
+
+Live steps used to push and then time.sleep(60), so every request's latency
+was added to the next tick and a 10 minute live phase ended tens of seconds
+late, with samples crossing the backend's minute boundaries. Here every tick
+has an absolute deadline on the monotonic clock, start + index * interval, so
+a slow tick only delays itself. The first tick fires at once; with
+``align=True`` it waits for ``offset`` seconds into a wall-clock interval
+instead, up to one full interval, so the ticks of every run fall at the same
+second of the minute. How late each tick fired is recorded.
+"""
+
+import logging
+import time
+from typing import Callable, List, NamedTuple
+
+# Ticks land mid-minute, so a late request does not push a sample into the
+# next minute
+DEFAULT_TICK_OFFSET_SECONDS = 30.0
+
+
+class TickReport(NamedTuple):
+    index: int
+    # Wall-clock time (epoch seconds) the tick was scheduled for
+    scheduled: float
+    lateness_seconds: float
+    seconds: float
+
+
+def seconds_until_aligned(
+    interval: float,
+    offset: float = DEFAULT_TICK_OFFSET_SECONDS,
+    now: float = None,
+) -> float:
+    """Seconds from ``now`` until the wall clock is ``offset`` into an interval."""
+    now = time.time() if now is None else now
+    return (offset - now) % interval
+
+
+def run_ticks(
+    count: int,
+    on_tick: Callable[[int, float], None],
+    interval: float = 60.0,
+    offset: float = DEFAULT_TICK_OFFSET_SECONDS,
+    align: bool = False,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+    wall_clock: Callable[[], float] = time.time,
+) -> List[TickReport]:
+    """Call ``on_tick(index, scheduled)`` ``count`` times, ``interval`` apart.
+
+    Returns one interval after the last tick, like the sleep it replaces.
+
+    Args:
+        count (int): Number of ticks.
+        on_tick: Called with the tick index and the wall-clock time in epoch
+            seconds the tick was scheduled for.
+        interval (float): Seconds between ticks.
+        offset (float): Seconds into an interval the ticks are aligned to.
+        align (bool): Wait for the aligned wall-clock time, up to one
+            ``interval``, before the first tick; otherwise the first tick
+            fires at once.
+        clock: Monotonic clock the deadlines are measured on.
+        sleep: Sleep function.
+        wall_clock: Clock in epoch seconds the ticks are aligned to.
+
+    Returns:
+        List[TickReport]: Lateness and duration of every tick.
+    """
+    wall_start = wall_clock()
+    start = clock()
+    if align:
+        delay = seconds_until_aligned(interval, offset, wall_start)
+        wall_start += delay
+        start += delay
+        logging.info(
+            f"Waiting {delay:.1f}s for the first of {count} ticks, {offset:g}s "
+            f"into the {interval:g}s wall-clock interval"
+        )
+    reports = []
+    for index in range(count):
+        deadline = start + index * interval
+        remaining = deadline - clock()
+        if remaining > 0:
+            sleep(remaining)
+        fired = clock()
+        lateness = fired - deadline
+        if lateness > interval:
+            logging.warning(
+                f"Tick {index + 1}/{count} fired {lateness:.1f}s late, "
+                f"more than one interval"
+            )
+        on_tick(index, wall_start + index * interval)
+        reports.append(
+            TickReport(index, wall_start + index * interval, lateness, clock() - fired)
+        )
+    remaining = start + count * interval - clock()
+    if remaining > 0:
+        sleep(remaining)
+    log_ticks(reports)
+    return reports
+
+
+def log_ticks(reports: List[TickReport]):
+    if not reports:
+        return
+    lateness = [report.lateness_seconds for report in reports]
+    seconds = [report.seconds for report in reports]
+    logging.info(
+        f"Fired {len(reports)} ticks: lateness mean "
+        f"{sum(lateness) / len(reports):.3f}s, max {max(lateness):.3f}s; tick "
+        f"duration mean {sum(seconds) / len(reports):.3f}s, max {max(seconds):.3f}s"
+    )
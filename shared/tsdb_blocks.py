@@ -0,0 +1,826 @@
+"""Shared Prometheus TSDB block writer and reader.
+
+Backs the native block writer of the behave backfill step and of the backfill
+pipeline; read_meta also serves the shard validation in promtool_blocks.
+
+Writes persistent blocks straight from NumPy arrays, replacing the
+OpenMetrics text file + `promtool tsdb create-blocks-from` round trip. A block
+is a directory named by its ULID:
+
+    <ulid>/
+      chunks/000001   XOR (Gorilla) encoded chunks of up to 120 samples
+      index           index format v2: symbols, series, label indices,
+                      postings, offset tables and TOC
+      tombstones      empty tombstone file
+      meta.json       time range (maxTime exclusive), stats, compaction level 1
+
+Blocks are cut at multiples of the block duration like promtool does, so a
+range spanning several block windows produces several blocks. read_block
+decodes a block back into series for round-trip checks.
+"""
+
+import json
+import os
+import secrets
+import shutil
+import struct
+import time
+from datetime import timedelta
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+MAGIC_INDEX = 0xBAAAD700
+MAGIC_CHUNKS = 0x85BD40DD
+MAGIC_TOMBSTONES = 0x0130BA30
+INDEX_VERSION_2 = 2
+CHUNKS_FORMAT_V1 = 1
+TOMBSTONES_FORMAT_V1 = 1
+ENCODING_XOR = 1
+
+SAMPLES_PER_CHUNK = 120
+SEGMENT_MAX_SIZE = 512 * 1024 * 1024
+SERIES_ALIGNMENT = 16
+# Same as the --max-block-duration utils/backfill.sh passes to promtool
+DEFAULT_BLOCK_DURATION = timedelta(hours=12)
+
+_CHUNKS_HEADER_SIZE = 8
+_TOC_SIZE = 6 * 8 + 4
+_ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+class BlockSeries(NamedTuple):
+    """One series: labels including ``__name__``, ms timestamps and values."""
+
+    labels: Dict[str, str]
+    timestamps: np.ndarray
+    values: np.ndarray
+
+
+class ChunkMeta(NamedTuple):
+    """One encoded XOR chunk and the timestamps (ms) of its first and last sample.
+
+    ``checksum`` is the CRC32C of the encoding byte and data when already known.
+    """
+
+    min_time: int
+    max_time: int
+    data: bytes
+    checksum: Optional[int] = None
+
+
+def _make_crc32c_table() -> List[int]:
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = _make_crc32c_table()
+# Records are checksummed in 64-byte lanes that NumPy steps through together
+_CRC32C_LANE = 64
+# Shorter single buffers are faster with the plain table loop
+_CRC32C_MIN_BATCH = 8192
+
+
+def _crc32c_update(crc: int, data: bytes) -> int:
+    table = _CRC32C_TABLE
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc
+
+
+@lru_cache(maxsize=None)
+def _crc32c_lane_shift() -> Tuple[List[int], ...]:
+    """Byte tables for advancing a CRC register over one lane of zero bytes.
+
+    The register update is linear, so update(crc, lane) equals
+    update(crc, zeros) ^ update(0, lane); these tables give the first term.
+    """
+    zeros = bytes(_CRC32C_LANE)
+    return tuple(
+        [_crc32c_update(byte << (8 * k), zeros) for byte in range(256)]
+        for k in range(4)
+    )
+
+
+def crc32c(data: bytes) -> int:
+    """CRC32 with the Castagnoli polynomial, as used by every TSDB checksum."""
+    if len(data) < _CRC32C_MIN_BATCH:
+        return _crc32c_update(0xFFFFFFFF, data) ^ 0xFFFFFFFF
+    return crc32c_many([data])[0]
+
+
+def crc32c_many(records: List[bytes]) -> List[int]:
+    """crc32c of every record.
+
+    The whole 64-byte lanes of all records are checksummed together in one
+    NumPy pass, then each record folds its lanes and remaining bytes in.
+    """
+    lane = _CRC32C_LANE
+    lane_counts = [len(record) // lane for record in records]
+    data = np.frombuffer(
+        b"".join(
+            memoryview(record)[: count * lane]
+            for record, count in zip(records, lane_counts)
+        ),
+        dtype=np.uint8,
+    )
+    table = np.array(_CRC32C_TABLE, dtype=np.uint32)
+    lane_crcs = np.zeros(len(data) // lane, dtype=np.uint32)
+    for column in data.reshape(-1, lane).T:
+        lane_crcs = table[(lane_crcs ^ column) & 0xFF] ^ (lane_crcs >> 8)
+    lane_crcs = lane_crcs.tolist()
+
+    shift0, shift1, shift2, shift3 = _crc32c_lane_shift()
+    result = []
+    position = 0
+    for record, count in zip(records, lane_counts):
+        crc = 0xFFFFFFFF
+        for lane_crc in lane_crcs[position : position + count]:
+            crc = (
+                shift0[crc & 0xFF]
+                ^ shift1[(crc >> 8) & 0xFF]
+                ^ shift2[(crc >> 16) & 0xFF]
+                ^ shift3[crc >> 24]
+                ^ lane_crc
+            )
+        position += count
+        crc = _crc32c_update(crc, memoryview(record)[count * lane :])
+        result.append(crc ^ 0xFFFFFFFF)
+    return result
+
+
+def new_ulid(timestamp_ms: Optional[int] = None) -> str:
+    """ULID string: 48-bit millisecond timestamp + 80 random bits, Crockford base32."""
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms << 80) | secrets.randbits(80)
+    chars = []
+    for _ in range(26):
+        value, digit = divmod(value, 32)
+        chars.append(_ULID_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def _uvarint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _varint(value: int) -> bytes:
+    # Zig-zag, like Go's binary.PutVarint
+    return _uvarint(((value << 1) ^ (value >> 63)) & 0xFFFFFFFFFFFFFFFF)
+
+
+def _uvarint_str(text: str) -> bytes:
+    data = text.encode()
+    return _uvarint(len(data)) + data
+
+
+def _read_uvarint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value, pos = _read_uvarint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _read_uvarint_str(data: bytes, pos: int) -> Tuple[str, int]:
+    length, pos = _read_uvarint(data, pos)
+    return data[pos : pos + length].decode(), pos + length
+
+
+def _bit_range(value: int, nbits: int) -> bool:
+    return -((1 << (nbits - 1)) - 1) <= value <= 1 << (nbits - 1)
+
+
+def encode_xor_chunk(timestamps: List[int], values: List[float]) -> bytes:
+    """Encode samples into a Prometheus XOR chunk (timestamps in ms).
+
+    Layout: 2-byte sample count, varint t0, raw 64-bit v0, uvarint t1 - t0, then
+    a bit stream of delta-of-delta timestamps and XOR-compressed values.
+    """
+    count = len(timestamps)
+    head = bytearray(struct.pack(">H", count))
+    if count == 0:
+        return bytes(head)
+    value_bits = np.asarray(values, dtype=np.float64).view(np.uint64).tolist()
+    head += _varint(timestamps[0])
+    head += struct.pack(">Q", value_bits[0])
+    if count == 1:
+        return bytes(head)
+
+    t_delta = timestamps[1] - timestamps[0]
+    head += _uvarint(t_delta)
+
+    # The remaining stream is built in one big int and converted at the end
+    acc = 0
+    nbits = 0
+    leading = 0xFF
+    trailing = 0
+    previous_t = timestamps[1]
+    previous_v = value_bits[0]
+    for i in range(1, count):
+        if i > 1:
+            t = timestamps[i]
+            delta = t - previous_t
+            dod = delta - t_delta
+            previous_t, t_delta = t, delta
+            if dod == 0:
+                acc <<= 1
+                nbits += 1
+            elif _bit_range(dod, 14):
+                acc = (acc << 16) | (0b10 << 14) | (dod & 0x3FFF)
+                nbits += 16
+            elif _bit_range(dod, 17):
+                acc = (acc << 20) | (0b110 << 17) | (dod & 0x1FFFF)
+                nbits += 20
+            elif _bit_range(dod, 20):
+                acc = (acc << 24) | (0b1110 << 20) | (dod & 0xFFFFF)
+                nbits += 24
+            else:
+                acc = (acc << 68) | (0b1111 << 64) | (dod & 0xFFFFFFFFFFFFFFFF)
+                nbits += 68
+
+        v = value_bits[i]
+        xor = v ^ previous_v
+        previous_v = v
+        if xor == 0:
+            acc <<= 1
+            nbits += 1
+            continue
+        new_leading = 64 - xor.bit_length()
+        new_trailing = (xor & -xor).bit_length() - 1
+        if new_leading >= 32:
+            new_leading = 31
+        if leading != 0xFF and new_leading >= leading and new_trailing >= trailing:
+            significant = 64 - leading - trailing
+            acc = (acc << (2 + significant)) | (0b10 << significant) | (xor >> trailing)
+            nbits += 2 + significant
+        else:
+            leading, trailing = new_leading, new_trailing
+            significant = 64 - leading - trailing
+            acc = (
+                (((acc << 2 | 0b11) << 5 | leading) << 6 | (significant & 0x3F))
+                << significant
+            ) | (xor >> trailing)
+            nbits += 13 + significant
+
+    padding = -nbits % 8
+    head += (acc << padding).to_bytes((nbits + padding) // 8, "big")
+    return bytes(head)
+
+
+# Delta-of-delta bit widths by the number of leading 1 bits of the prefix
+_DOD_WIDTHS = {1: 14, 2: 17, 3: 20, 4: 64}
+
+
+def decode_xor_chunk(data: bytes) -> Tuple[List[int], List[float]]:
+    """Decode a Prometheus XOR chunk into (timestamps in ms, values)."""
+    count = struct.unpack_from(">H", data)[0]
+    if count == 0:
+        return [], []
+    t, pos = _read_varint(data, 2)
+    v = struct.unpack_from(">Q", data, pos)[0]
+    pos += 8
+    timestamps = [t]
+    value_bits = [v]
+    if count > 1:
+        t_delta, pos = _read_uvarint(data, pos)
+        # A '0'/'1' string makes each read a short slice instead of a shift of
+        # the whole stream
+        bits = format(int.from_bytes(data[pos:], "big"), f"0{(len(data) - pos) * 8}b")
+        bit = 0
+        leading = trailing = 0
+        for i in range(1, count):
+            if i == 1:
+                t += t_delta
+            else:
+                if bits[bit] == "0":
+                    bit += 1
+                else:
+                    prefix = bits.find("0", bit, bit + 4)
+                    prefix = 4 if prefix < 0 else prefix - bit
+                    bit += prefix + 1 if prefix < 4 else 4
+                    width = _DOD_WIDTHS[prefix]
+                    dod = int(bits[bit : bit + width], 2)
+                    bit += width
+                    if width == 64:
+                        dod -= (dod >> 63) << 64
+                    elif dod > 1 << (width - 1):
+                        dod -= 1 << width
+                    t_delta += dod
+                t += t_delta
+            timestamps.append(t)
+
+            if bits[bit] == "1":
+                if bits[bit + 1] == "1":
+                    leading = int(bits[bit + 2 : bit + 7], 2)
+                    significant = int(bits[bit + 7 : bit + 13], 2) or 64
+                    trailing = 64 - leading - significant
+                    bit += 13
+                else:
+                    significant = 64 - leading - trailing
+                    bit += 2
+                v ^= int(bits[bit : bit + significant], 2) << trailing
+                bit += significant
+            else:
+                bit += 1
+            value_bits.append(v)
+
+    values = np.array(value_bits, dtype=np.uint64).view(np.float64).tolist()
+    return timestamps, values
+
+
+_XOR_PREFIX = bytes([ENCODING_XOR])
+
+
+def _fill_checksums(chunks: List[ChunkMeta], records: List[bytes]) -> List[int]:
+    """Checksums of ``chunks``, computing the missing ones in a single batch."""
+    missing = [i for i, chunk in enumerate(chunks) if chunk.checksum is None]
+    checksums = [chunk.checksum for chunk in chunks]
+    for i, checksum in zip(missing, crc32c_many([records[i] for i in missing])):
+        checksums[i] = checksum
+    return checksums
+
+
+class _ChunkWriter:
+    """Appends chunks to numbered segment files under ``chunks/``."""
+
+    def __init__(self, chunks_dir: str):
+        self.chunks_dir = chunks_dir
+        self.sequence = -1
+        self.file = None
+        self.position = 0
+        os.makedirs(chunks_dir)
+
+    def _cut_segment(self):
+        if self.file is not None:
+            self.file.close()
+        self.sequence += 1
+        path = os.path.join(self.chunks_dir, f"{self.sequence + 1:06d}")
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(">IB3x", MAGIC_CHUNKS, CHUNKS_FORMAT_V1))
+        self.position = _CHUNKS_HEADER_SIZE
+
+    def write_all(self, chunks: List[ChunkMeta]) -> List[int]:
+        """Write XOR chunks and return their references (segment << 32 | offset)."""
+        records = [_XOR_PREFIX + chunk.data for chunk in chunks]
+        checksums = _fill_checksums(chunks, records)
+        refs = []
+        for chunk, record, checksum in zip(chunks, records, checksums):
+            encoded = _uvarint(len(chunk.data)) + record + struct.pack(">I", checksum)
+            if self.file is None or self.position + len(encoded) > SEGMENT_MAX_SIZE:
+                self._cut_segment()
+            refs.append((self.sequence << 32) | self.position)
+            self.file.write(encoded)
+            self.position += len(encoded)
+        return refs
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class _IndexWriter:
+    """Builds an index v2 file in memory, section by section."""
+
+    def __init__(self):
+        self.buf = bytearray(struct.pack(">IB", MAGIC_INDEX, INDEX_VERSION_2))
+        self.toc = {}
+
+    def pad(self, alignment: int):
+        self.buf += bytes(-len(self.buf) % alignment)
+
+    def add_table(self, content: bytes):
+        """Write ``len <4b> | content | CRC32(content) <4b>``."""
+        self.buf += struct.pack(">I", len(content))
+        self.buf += content
+        self.buf += struct.pack(">I", crc32c(content))
+
+
+def _write_index(path: str, series_entries: List[Tuple[list, list]]):
+    """Write the index for ``[(sorted label pairs, [(mint, maxt, ref), ...])]``.
+
+    Series must already be sorted by label set.
+    """
+    symbols = sorted(
+        {text for labels, _ in series_entries for pair in labels for text in pair}
+    )
+    symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    writer = _IndexWriter()
+    writer.toc["symbols"] = len(writer.buf)
+    writer.add_table(
+        struct.pack(">I", len(symbols)) + b"".join(_uvarint_str(s) for s in symbols)
+    )
+
+    # Series, each aligned to 16 bytes; the series reference is offset / 16
+    writer.pad(SERIES_ALIGNMENT)
+    writer.toc["series"] = len(writer.buf)
+    postings: Dict[Tuple[str, str], List[int]] = {("", ""): []}
+    for labels, chunk_metas in series_entries:
+        writer.pad(SERIES_ALIGNMENT)
+        series_ref = len(writer.buf) // SERIES_ALIGNMENT
+        content = bytearray(_uvarint(len(labels)))
+        for name, value in labels:
+            content += _uvarint(symbol_index[name]) + _uvarint(symbol_index[value])
+            postings.setdefault((name, value), []).append(series_ref)
+        postings[("", "")].append(series_ref)
+
+        content += _uvarint(len(chunk_metas))
+        previous_maxt = previous_ref = None
+        for mint, maxt, ref in chunk_metas:
+            if previous_maxt is None:
+                content += _varint(mint) + _uvarint(maxt - mint) + _uvarint(ref)
+            else:
+                content += _uvarint(mint - previous_maxt) + _uvarint(maxt - mint)
+                content += _varint(ref - previous_ref)
+            previous_maxt, previous_ref = maxt, ref
+        writer.buf += _uvarint(len(content)) + content
+        writer.buf += struct.pack(">I", crc32c(bytes(content)))
+
+    # Label indices: one per label name listing its values' symbol references
+    label_values: Dict[str, List[str]] = {}
+    for name, value in sorted(k for k in postings if k != ("", "")):
+        label_values.setdefault(name, []).append(value)
+    writer.toc["label_indices"] = len(writer.buf)
+    label_index_offsets = []
+    for name, values in label_values.items():
+        writer.pad(4)
+        label_index_offsets.append((name, len(writer.buf)))
+        writer.add_table(
+            struct.pack(
+                f">II{len(values)}I", 1, len(values), *(symbol_index[v] for v in values)
+            )
+        )
+
+    writer.toc["label_indices_table"] = len(writer.buf)
+    writer.add_table(
+        struct.pack(">I", len(label_index_offsets))
+        + b"".join(
+            _uvarint(1) + _uvarint_str(name) + _uvarint(offset)
+            for name, offset in label_index_offsets
+        )
+    )
+
+    # Postings lists, the all-series list ("" = "") first, each aligned to 4 bytes
+    writer.toc["postings"] = len(writer.buf)
+    postings_offsets = []
+    for key in sorted(postings):
+        refs = postings[key]
+        writer.pad(4)
+        postings_offsets.append((key, len(writer.buf)))
+        writer.add_table(struct.pack(f">I{len(refs)}I", len(refs), *refs))
+
+    writer.toc["postings_table"] = len(writer.buf)
+    writer.add_table(
+        struct.pack(">I", len(postings_offsets))
+        + b"".join(
+            _uvarint(2) + _uvarint_str(name) + _uvarint_str(value) + _uvarint(offset)
+            for (name, value), offset in postings_offsets
+        )
+    )
+
+    toc = struct.pack(
+        ">6Q",
+        writer.toc["symbols"],
+        writer.toc["series"],
+        writer.toc["label_indices"],
+        writer.toc["label_indices_table"],
+        writer.toc["postings"],
+        writer.toc["postings_table"],
+    )
+    writer.buf += toc + struct.pack(">I", crc32c(toc))
+
+    with open(path, "wb") as f:
+        f.write(writer.buf)
+
+
+def _write_tombstones(path: str):
+    with open(path, "wb") as f:
+        f.write(struct.pack(">IB", MAGIC_TOMBSTONES, TOMBSTONES_FORMAT_V1))
+        f.write(struct.pack(">I", crc32c(b"")))
+
+
+def write_block(output_dir: str, series: List[BlockSeries]) -> Optional[str]:
+    """Write all samples of ``series`` into one block under ``output_dir``.
+
+    Returns:
+        str: The block ULID, or None if there were no samples.
+    """
+    # Series with the same label set are merged, like promtool does for a
+    # series that appears in several places of the text file
+    grouped: Dict[tuple, List[BlockSeries]] = {}
+    for s in series:
+        # Empty label values mean "label not set" in Prometheus
+        labels = tuple(
+            sorted((str(k), str(v)) for k, v in s.labels.items() if str(v) != "")
+        )
+        if len(s.timestamps):
+            grouped.setdefault(labels, []).append(s)
+
+    prepared = []
+    for labels, parts in grouped.items():
+        timestamps = np.concatenate(
+            [np.asarray(p.timestamps, dtype=np.int64) for p in parts]
+        )
+        values = np.concatenate([np.asarray(p.values, dtype=np.float64) for p in parts])
+        if len(parts) > 1:
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[order]
+        if np.any(np.diff(timestamps) <= 0):
+            raise ValueError(
+                f"Timestamps of {dict(labels)} must be strictly increasing"
+            )
+        prepared.append((list(labels), timestamps, values))
+    if not prepared:
+        return None
+    return write_block_chunks(
+        output_dir,
+        [
+            (dict(labels), _encode_chunks(timestamps, values))
+            for labels, timestamps, values in prepared
+        ],
+    )
+
+
+def _encode_chunks(timestamps: np.ndarray, values: np.ndarray) -> List[ChunkMeta]:
+    ts_list = timestamps.tolist()
+    return [
+        ChunkMeta(
+            ts_list[start],
+            ts_list[min(start + SAMPLES_PER_CHUNK, len(ts_list)) - 1],
+            encode_xor_chunk(
+                ts_list[start : start + SAMPLES_PER_CHUNK],
+                values[start : start + SAMPLES_PER_CHUNK],
+            ),
+        )
+        for start in range(0, len(ts_list), SAMPLES_PER_CHUNK)
+    ]
+
+
+def write_block_chunks(
+    output_dir: str, series: List[Tuple[Dict[str, str], List[ChunkMeta]]]
+) -> Optional[str]:
+    """Write already encoded XOR chunks as one block under ``output_dir``.
+
+    ``series`` holds (labels, chunks in time order) pairs with distinct label
+    sets. This is the copy path used when blocks are rewritten rather than
+    regenerated.
+
+    Returns:
+        str: The block ULID, or None if there were no chunks.
+    """
+    series = sorted(
+        (
+            (sorted((k, v) for k, v in labels.items() if v != ""), chunks)
+            for labels, chunks in series
+            if chunks
+        ),
+        key=lambda entry: entry[0],
+    )
+    if not series:
+        return None
+
+    ulid = new_ulid()
+    tmp_dir = os.path.join(output_dir, f"{ulid}.tmp-for-creation")
+    os.makedirs(tmp_dir)
+    try:
+        chunk_writer = _ChunkWriter(os.path.join(tmp_dir, "chunks"))
+        series_entries = []
+        num_samples = num_chunks = 0
+        try:
+            refs = iter(
+                chunk_writer.write_all(
+                    [chunk for _, chunks in series for chunk in chunks]
+                )
+            )
+        finally:
+            chunk_writer.close()
+        for labels, chunks in series:
+            series_entries.append(
+                (labels, [(c.min_time, c.max_time, next(refs)) for c in chunks])
+            )
+            num_samples += sum(struct.unpack_from(">H", c.data)[0] for c in chunks)
+            num_chunks += len(chunks)
+
+        _write_index(os.path.join(tmp_dir, "index"), series_entries)
+        _write_tombstones(os.path.join(tmp_dir, "tombstones"))
+
+        meta = {
+            "ulid": ulid,
+            "minTime": min(chunks[0].min_time for _, chunks in series),
+            "maxTime": max(chunks[-1].max_time for _, chunks in series) + 1,
+            "stats": {
+                "numSamples": num_samples,
+                "numSeries": len(series_entries),
+                "numChunks": num_chunks,
+            },
+            "compaction": {"level": 1, "sources": [ulid]},
+            "version": 1,
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent="\t")
+
+        os.rename(tmp_dir, os.path.join(output_dir, ulid))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return ulid
+
+
+def write_blocks(
+    output_dir: str,
+    series: List[BlockSeries],
+    block_duration: timedelta = DEFAULT_BLOCK_DURATION,
+) -> List[str]:
+    """Cut ``series`` at multiples of ``block_duration`` and write one block per window.
+
+    Equivalent to `promtool tsdb create-blocks-from --max-block-duration`;
+    windows without samples produce no block.
+
+    Returns:
+        List[str]: ULIDs of the written blocks in time order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    duration_ms = int(block_duration / timedelta(milliseconds=1))
+    series = [
+        BlockSeries(s.labels, np.asarray(s.timestamps, dtype=np.int64), s.values)
+        for s in series
+    ]
+    non_empty = [s.timestamps for s in series if len(s.timestamps)]
+    if not non_empty:
+        return []
+    min_time = min(int(ts[0]) for ts in non_empty)
+    max_time = max(int(ts[-1]) for ts in non_empty)
+
+    ulids = []
+    window_start = min_time - min_time % duration_ms
+    while window_start <= max_time:
+        window_end = window_start + duration_ms
+        window_series = []
+        for s in series:
+            lo, hi = np.searchsorted(s.timestamps, [window_start, window_end])
+            if hi > lo:
+                window_series.append(
+                    BlockSeries(
+                        s.labels, s.timestamps[lo:hi], np.asarray(s.values)[lo:hi]
+                    )
+                )
+        ulid = write_block(output_dir, window_series)
+        if ulid is not None:
+            ulids.append(ulid)
+        window_start = window_end
+    return ulids
+
+
+def _read_table(data: bytes, offset: int) -> bytes:
+    length = struct.unpack_from(">I", data, offset)[0]
+    content = data[offset + 4 : offset + 4 + length]
+    (checksum,) = struct.unpack_from(">I", data, offset + 4 + length)
+    if crc32c(content) != checksum:
+        raise ValueError(f"Index table at offset {offset} failed its CRC check")
+    return content
+
+
+def read_meta(block_dir: str) -> dict:
+    with open(os.path.join(block_dir, "meta.json")) as f:
+        return json.load(f)
+
+
+def read_block_chunks(
+    block_dir: str, verify: bool = True
+) -> List[Tuple[Dict[str, str], List[ChunkMeta]]]:
+    """Read every series of a block as still encoded chunks.
+
+    Index CRCs are always checked; chunk CRCs only with ``verify`` (see
+    verify_chunks to check many blocks' chunks in one batch).
+    """
+    with open(os.path.join(block_dir, "index"), "rb") as f:
+        index = f.read()
+    magic, version = struct.unpack_from(">IB", index)
+    if magic != MAGIC_INDEX or version != INDEX_VERSION_2:
+        raise ValueError(f"Unsupported index: magic {magic:#x} version {version}")
+    toc = index[-_TOC_SIZE:]
+    if crc32c(toc[:-4]) != struct.unpack(">I", toc[-4:])[0]:
+        raise ValueError("Index TOC failed its CRC check")
+    symbols_offset, _, _, _, _, postings_table_offset = struct.unpack(">6Q", toc[:-4])
+
+    content = _read_table(index, symbols_offset)
+    (count,) = struct.unpack_from(">I", content)
+    symbols, pos = [], 4
+    for _ in range(count):
+        symbol, pos = _read_uvarint_str(content, pos)
+        symbols.append(symbol)
+
+    content = _read_table(index, postings_table_offset)
+    (count,) = struct.unpack_from(">I", content)
+    postings_offsets, pos = {}, 4
+    for _ in range(count):
+        _, pos = _read_uvarint(content, pos)
+        name, pos = _read_uvarint_str(content, pos)
+        value, pos = _read_uvarint_str(content, pos)
+        offset, pos = _read_uvarint(content, pos)
+        postings_offsets[(name, value)] = offset
+    content = _read_table(index, postings_offsets[("", "")])
+    (count,) = struct.unpack_from(">I", content)
+    series_refs = struct.unpack_from(f">{count}I", content, 4)
+
+    segments = {}
+    chunks_dir = os.path.join(block_dir, "chunks")
+    for name in sorted(os.listdir(chunks_dir)):
+        with open(os.path.join(chunks_dir, name), "rb") as f:
+            segment = f.read()
+        if struct.unpack_from(">I", segment)[0] != MAGIC_CHUNKS:
+            raise ValueError(f"Chunk segment {name} has a bad magic number")
+        segments[int(name) - 1] = segment
+
+    result = []
+    for series_ref in series_refs:
+        offset = series_ref * SERIES_ALIGNMENT
+        length, pos = _read_uvarint(index, offset)
+        content = index[pos : pos + length]
+        if crc32c(content) != struct.unpack_from(">I", index, pos + length)[0]:
+            raise ValueError(f"Series {series_ref} failed its CRC check")
+
+        label_count, pos = _read_uvarint(content, 0)
+        labels = {}
+        for _ in range(label_count):
+            name_ref, pos = _read_uvarint(content, pos)
+            value_ref, pos = _read_uvarint(content, pos)
+            labels[symbols[name_ref]] = symbols[value_ref]
+
+        chunk_count, pos = _read_uvarint(content, pos)
+        chunks = []
+        maxt = ref = 0
+        for i in range(chunk_count):
+            if i == 0:
+                mint, pos = _read_varint(content, pos)
+                span, pos = _read_uvarint(content, pos)
+                ref, pos = _read_uvarint(content, pos)
+            else:
+                gap, pos = _read_uvarint(content, pos)
+                span, pos = _read_uvarint(content, pos)
+                ref_delta, pos = _read_varint(content, pos)
+                mint = maxt + gap
+                ref += ref_delta
+            maxt = mint + span
+
+            segment = segments[ref >> 32]
+            data_length, chunk_pos = _read_uvarint(segment, ref & 0xFFFFFFFF)
+            record = segment[chunk_pos : chunk_pos + 1 + data_length]
+            if record[0] != ENCODING_XOR:
+                raise ValueError(f"Chunk {ref} of {labels} is not XOR encoded")
+            checksum = struct.unpack_from(">I", segment, chunk_pos + 1 + data_length)[0]
+            chunks.append(ChunkMeta(mint, maxt, record[1:], checksum))
+        result.append((labels, chunks))
+
+    if verify:
+        verify_chunks([chunk for _, chunks in result for chunk in chunks])
+    return result
+
+
+def verify_chunks(chunks: List[ChunkMeta]):
+    """Raise ValueError unless every chunk matches its stored checksum."""
+    records = [_XOR_PREFIX + chunk.data for chunk in chunks]
+    if crc32c_many(records) != [chunk.checksum for chunk in chunks]:
+        raise ValueError("Chunks failed their CRC check")
+
+
+def read_block(block_dir: str) -> List[BlockSeries]:
+    """Decode every series of a block (checking all CRCs) for round-trip checks."""
+    result = []
+    for labels, chunks in read_block_chunks(block_dir):
+        timestamps, values = [], []
+        for chunk in chunks:
+            chunk_ts, chunk_values = decode_xor_chunk(chunk.data)
+            if chunk_ts[0] != chunk.min_time or chunk_ts[-1] != chunk.max_time:
+                raise ValueError(f"A chunk of {labels} does not match its index entry")
+            timestamps += chunk_ts
+            values += chunk_values
+        result.append(
+            BlockSeries(
+                labels,
+                np.array(timestamps, dtype=np.int64),
+                np.array(values, dtype=np.float64),
+            )
+        )
+    return result
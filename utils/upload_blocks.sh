@@ -0,0 +1,18 @@
+#!/bin/bash
+
+ADDRESS=$1
+ID=$2
+KEY=$3
+UTILS_DIR=$4
+DATA_BLOCK_DIR=$5
+
+# Upload all blocks concurrently, retrying failed ones
+# (BLOCK_UPLOAD_BACKEND=http uses the upload API instead of mimirtool)
+"${PYTHON:-python3}" "$UTILS_DIR"/../scripts/upload_blocks.py \
+  --address="$ADDRESS" --id="$ID" --key="$KEY" \
+  --block-dir="$UTILS_DIR$DATA_BLOCK_DIR" \
+  --mimirtool="$UTILS_DIR"/mimirtool \
+  --backend="${BLOCK_UPLOAD_BACKEND:-mimirtool}" || exit 1
+
+# Cleanup generated blocks finally
+/bin/rm -rf "$UTILS_DIR$DATA_BLOCK_DIR"*